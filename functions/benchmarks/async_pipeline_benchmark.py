@@ -0,0 +1,148 @@
+"""Latency of the sync and async /submitQuiz pipelines, one request at a time.
+
+Requests go through know_map_api with the in-memory Firestore stand-in
+(every round trip delayed by --latency-ms) and locally minted ID tokens.
+Each request is sent serially, matching the one-request-per-instance
+concurrency of the deployed function. Scenarios:
+
+    warm        token and quiz answer key both cached
+    cold-quiz   quiz cache cleared before every request
+    cold-auth   token cache cleared before every request; verification
+                sleeps --auth-latency-ms to stand in for the public-key fetch
+    cold        both caches cleared
+    legacy      cold quiz cache, questions stored in the legacy subcollection
+
+Usage (from the functions/ directory):
+    python -m benchmarks.async_pipeline_benchmark --latency-ms 2 5 10
+    python -m benchmarks.async_pipeline_benchmark --compare benchmarks/results/async-<earlier>.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('FIREBASE_AUTH_EMULATOR_HOST', 'localhost:9099')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_admin  # noqa: E402
+from firebase_admin import auth  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.grading_benchmark import make_quiz  # noqa: E402
+from benchmarks.load_harness import build_app  # noqa: E402
+from benchmarks.memory_firestore import MemoryAsyncFirestore, MemoryFirestore  # noqa: E402
+from benchmarks.reporting import compare_results, print_comparison, summarize, write_results  # noqa: E402
+from benchmarks.token_cache_check import PROJECT_ID, make_signer, mint_token  # noqa: E402
+
+SCENARIOS = ['warm', 'cold-quiz', 'cold-auth', 'cold', 'legacy']
+
+
+def seed_quiz(db, quiz_id, num_questions, legacy):
+    questions = make_quiz(num_questions)
+    quiz_ref = db.collection('quizzes').document(quiz_id)
+    quiz_ref.set({
+        'title': f'Pipeline benchmark quiz ({quiz_id})',
+        'difficulty': 'medium',
+        'questions': [] if legacy else questions,
+        'updatedAt': time.time()
+    })
+    if legacy:
+        for index, question in enumerate(questions):
+            quiz_ref.collection('questions').document(f'q{index:04d}').set(question)
+
+
+def with_auth_latency(verify_id_token, delay):
+    def delayed(*args, **kwargs):
+        time.sleep(delay)
+        return verify_id_token(*args, **kwargs)
+    return delayed
+
+
+def run_scenario(client, scenario, token, num_questions, requests, seed=0):
+    quiz_id = 'legacy-quiz' if scenario == 'legacy' else 'embedded-quiz'
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(requests):
+        if scenario in ('cold-quiz', 'cold', 'legacy'):
+            main.invalidate_quiz_cache()
+        if scenario in ('cold-auth', 'cold'):
+            main.evict_token_cache()
+        body = {
+            'quizId': quiz_id,
+            'answers': {str(i): rng.randrange(4) for i in range(num_questions)},
+            'timeSpent': rng.randint(30, 900)
+        }
+        started = time.perf_counter()
+        response = client.post('/submitQuiz', json=body, headers={'Authorization': f'Bearer {token}'})
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f'{scenario}: /submitQuiz returned {response.status_code}: {response.get_data(True)}')
+    return latencies
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, nargs='+', default=[2.0, 5.0, 10.0],
+                        help='simulated Firestore round trips to test')
+    parser.add_argument('--auth-latency-ms', type=float, default=20.0,
+                        help='simulated token verification on a cache miss')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/async-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed median slowdown')
+    args = parser.parse_args()
+
+    main.get_logger().setLevel(logging.WARNING)
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(options={'projectId': PROJECT_ID})
+    auth.verify_id_token = with_auth_latency(auth.verify_id_token, args.auth_latency_ms / 1000)
+
+    token = mint_token(make_signer(), 'pipeline-user')
+    client = build_app().test_client()
+    results = []
+    for latency_ms in args.latency_ms:
+        db = MemoryFirestore(latency=latency_ms / 1000)
+        seed_quiz(db, 'embedded-quiz', args.questions, legacy=False)
+        seed_quiz(db, 'legacy-quiz', args.questions, legacy=True)
+        main.db = db
+        main.async_db = MemoryAsyncFirestore(db)
+
+        for scenario in args.scenarios:
+            for pipeline in ('sync', 'async'):
+                main.SUBMIT_PIPELINE = pipeline
+                run_scenario(client, scenario, token, args.questions, args.warmup)
+                latencies = run_scenario(client, scenario, token, args.questions, args.requests, seed=1)
+                results.append({
+                    'name': f'submitQuiz[{pipeline}]',
+                    'params': {'scenario': scenario, 'latencyMs': latency_ms, 'questions': args.questions},
+                    'stats': summarize(latencies)
+                })
+
+    print(f"{'scenario':<10} {'rtt ms':>7} {'sync p50':>9} {'async p50':>10} {'sync p95':>9} {'async p95':>10} "
+          f"{'change':>7}")
+    for sync_entry, async_entry in zip(results[::2], results[1::2]):
+        params = sync_entry['params']
+        sync_stats, async_stats = sync_entry['stats'], async_entry['stats']
+        print(f"{params['scenario']:<10} {params['latencyMs']:>7g} {sync_stats['median'] * 1000:>9.2f} "
+              f"{async_stats['median'] * 1000:>10.2f} {sync_stats['p95'] * 1000:>9.2f} "
+              f"{async_stats['p95'] * 1000:>10.2f} {async_stats['median'] / sync_stats['median'] - 1:>+7.1%}")
+
+    path = write_results('async', results, args.output, {'authLatencyMs': args.auth_latency_ms})
+    print(f'Results written to {path}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous:
+            rows = compare_results(json.load(previous), {'benchmarks': results}, 'median', args.threshold)
+        print_comparison(rows, 'median')
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main_benchmark()
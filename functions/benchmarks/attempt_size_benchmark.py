@@ -0,0 +1,118 @@
+"""Stored size of one submission in the v2 and v3 (compact) attempt formats.
+
+Sizes follow Firestore's documented storage-size rules (string = UTF-8
+bytes + 1, number/timestamp = 8, boolean/null = 1, document = name + fields
++ 32), which is also what the 1 MiB document limit is measured against.
+Each submission writes a quiz-attempts document and, while
+WRITE_LEGACY_REPORTS is on, a reports document. v3 also writes one
+quiz-snapshots document per quiz version, shown amortized over --attempts.
+
+Usage (from the functions/ directory):
+    python -m benchmarks.attempt_size_benchmark --sizes 10 50 200 --attempts 100
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from benchmarks.grading_benchmark import make_answers, make_quiz  # noqa: E402
+
+FIRESTORE_MAX_DOCUMENT_BYTES = 1024 * 1024
+
+
+def value_size(value):
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, dict):
+        return sum(value_size(key) + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    raise TypeError(f'Unsupported Firestore value: {type(value).__name__}')
+
+
+def document_size(collection, data, doc_id='x' * 20):
+    name_size = value_size(collection) + value_size(doc_id) + 16
+    return name_size + value_size(data) + 32
+
+
+def make_review_quiz(num_questions, text_length):
+    """make_quiz with question and option text padded to a realistic length"""
+    questions = make_quiz(num_questions)
+    for question in questions:
+        question['question'] = question['question'].ljust(text_length, '.')
+        question['options'] = [option.ljust(text_length // 3, '.') for option in question['options']]
+    return questions
+
+
+def measure(num_questions, text_length, attempts):
+    questions = make_review_quiz(num_questions, text_length)
+    plan = main.compile_quiz(questions)
+    snapshot_id, snapshot = main.build_quiz_snapshot('bench-quiz', 'Benchmark quiz', plan)
+    quiz_key = {
+        'title': 'Benchmark quiz', 'difficulty': 'medium', 'plan': plan,
+        'snapshotId': snapshot_id, 'snapshot': snapshot
+    }
+    submission = {'answers': make_answers(num_questions), 'timeSpent': 300, 'deviceType': 'desktop'}
+    user_info = {'uid': 'u' * 28, 'email': 'student@example.com'}
+
+    sizes = {}
+    for version in ('2.0', '3.0'):
+        main.ATTEMPT_REPORT_VERSION = version
+        _, attempt_data, legacy_report_data = main.build_submission_records(
+            user_info, 'bench-quiz', quiz_key, submission, datetime.utcnow()
+        )
+        sizes[version] = {
+            'attempt': document_size('quiz-attempts', attempt_data),
+            'report': document_size('reports', legacy_report_data)
+        }
+
+    snapshot_size = document_size('quiz-snapshots', snapshot, doc_id=snapshot_id)
+    v2_total = sizes['2.0']['attempt'] + sizes['2.0']['report']
+    v3_total = sizes['3.0']['attempt'] + sizes['3.0']['report'] + snapshot_size / attempts
+    return {
+        'questions': num_questions,
+        'v2AttemptBytes': sizes['2.0']['attempt'],
+        'v2ReportBytes': sizes['2.0']['report'],
+        'v3AttemptBytes': sizes['3.0']['attempt'],
+        'v3ReportBytes': sizes['3.0']['report'],
+        'snapshotBytes': snapshot_size,
+        'bytesPerSubmissionV2': v2_total,
+        'bytesPerSubmissionV3': round(v3_total),
+        'reduction': round(1 - v3_total / v2_total, 3),
+        'v2AttemptLimitQuestions': FIRESTORE_MAX_DOCUMENT_BYTES * num_questions // sizes['2.0']['attempt'],
+        'v3AttemptLimitQuestions': FIRESTORE_MAX_DOCUMENT_BYTES * num_questions // sizes['3.0']['attempt']
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--text-length', type=int, default=120, help='characters per question text')
+    parser.add_argument('--attempts', type=int, default=100, help='attempts sharing one quiz snapshot')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = [measure(size, args.text_length, args.attempts) for size in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'questions':>9} {'v2 attempt':>11} {'v2 report':>10} {'v3 attempt':>11} {'v3 report':>10} "
+          f"{'snapshot':>9} {'per submit v2':>14} {'v3':>8} {'saved':>6}")
+    for row in results:
+        print(f"{row['questions']:>9} {row['v2AttemptBytes']:>11} {row['v2ReportBytes']:>10} "
+              f"{row['v3AttemptBytes']:>11} {row['v3ReportBytes']:>10} {row['snapshotBytes']:>9} "
+              f"{row['bytesPerSubmissionV2']:>14} {row['bytesPerSubmissionV3']:>8} {row['reduction']:>6.1%}")
+    print(f"Questions per attempt before the 1 MiB limit: v2 ~{results[-1]['v2AttemptLimitQuestions']}, "
+          f"v3 ~{results[-1]['v3AttemptLimitQuestions']}")
+
+
+if __name__ == '__main__':
+    main_benchmark()
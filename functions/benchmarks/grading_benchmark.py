@@ -0,0 +1,167 @@
+"""Synthetic quizzes and the grading code that compile_quiz replaced.
+
+benchmarks/test_micro.py times legacy_analyze_quiz_performance against
+compile_quiz + grade_compiled_quiz (and checks they produce the same
+report); the tests and load tools build their quizzes with make_quiz.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import classify_topic_performance, get_logger  # noqa: E402
+
+
+def legacy_analyze_quiz_performance(user_answers, quiz_questions):
+    """Per-request field probing implementation that compile_quiz replaced"""
+    try:
+        # Get logger for detailed logging
+        logger = get_logger()
+        logger.info(f"Analyzing quiz performance with {len(quiz_questions)} questions")
+        logger.info(f"User answers: {user_answers}")
+        
+        # Topic tracking
+        topic_stats = {}
+        total_score = 0
+        total_questions = len(quiz_questions)
+        
+        # Question breakdown tracking for detailed review
+        question_breakdown = []
+        
+        # Process each question
+        for i, question in enumerate(quiz_questions):
+            # Log the question structure for debugging
+            logger.info(f"Processing question {i}: {question.get('question', 'Unknown question')}")
+            
+            # Get the user's answer for this question (could be indexed by position or question ID)
+            # Try different formats for backward compatibility
+            user_answer = None
+            if str(i) in user_answers:
+                user_answer = user_answers.get(str(i))
+                logger.info(f"Found user answer using numeric index {i}: {user_answer}")
+            elif question.get('id') and question.get('id') in user_answers:
+                user_answer = user_answers.get(question.get('id'))
+                logger.info(f"Found user answer using question id {question.get('id')}: {user_answer}")
+            
+            # Check multiple fields for the correct answer (for compatibility)
+            correct_answer = None
+            if 'correct' in question:
+                correct_answer = question.get('correct')
+                logger.info(f"Found correct answer in 'correct' field: {correct_answer}")
+            elif 'correctAnswer' in question:
+                correct_answer = question.get('correctAnswer')
+                logger.info(f"Found correct answer in 'correctAnswer' field: {correct_answer}")
+            else:
+                logger.warning(f"No correct answer field found in question {i}")
+            
+            # Get topics - could be a single topic string or an array of topics
+            topics_value = None
+            if 'topics' in question:
+                topics_value = question.get('topics')
+                logger.info(f"Found topics in 'topics' field: {topics_value}")
+            elif 'topic' in question:
+                topics_value = question.get('topic')
+                logger.info(f"Found topics in 'topic' field: {topics_value}")
+            else:
+                topics_value = ['General']
+                logger.info("No topics field found, using default 'General'")
+                
+            topics = topics_value if isinstance(topics_value, list) else [topics_value]
+            
+            # Determine if answer is correct - Convert to same type first
+            is_correct = False
+            if user_answer is not None and correct_answer is not None:
+                # Try to convert both to integers for comparison (handles string vs int issues)
+                try:
+                    user_answer_int = int(user_answer) if not isinstance(user_answer, bool) else user_answer
+                    correct_answer_int = int(correct_answer) if not isinstance(correct_answer, bool) else correct_answer
+                    is_correct = user_answer_int == correct_answer_int
+                    logger.info(f"Comparing answer values (as int): {user_answer_int} == {correct_answer_int} => {is_correct}")
+                except (ValueError, TypeError):
+                    # If conversion fails, compare as strings
+                    is_correct = str(user_answer).lower() == str(correct_answer).lower()
+                    logger.info(f"Comparing answer values (as string): {user_answer} == {correct_answer} => {is_correct}")
+            
+            if is_correct:
+                total_score += 1
+                logger.info(f"Question {i}: CORRECT ✅")
+            
+            # Track performance per topic
+            for topic in topics:
+                if topic not in topic_stats:
+                    topic_stats[topic] = {'correct': 0, 'total': 0}
+                
+                topic_stats[topic]['total'] += 1
+                if is_correct:
+                    topic_stats[topic]['correct'] += 1
+            
+            # Build question breakdown for detailed review
+            question_breakdown.append({
+                'questionId': question.get('id', f'q_{i}'),
+                'questionText': question.get('question', question.get('text', 'Unknown question')),
+                'topic': topics[0] if topics else 'General',  # Use first topic for display
+                'userAnswer': user_answer,
+                'correctAnswer': correct_answer,
+                'isCorrect': is_correct,
+                'options': question.get('options', [])  # Include full options array
+            })
+        
+        # Classify topics
+        classified_topics = {}
+        for topic, stats in topic_stats.items():
+            classification = classify_topic_performance(
+                stats['correct'], 
+                stats['total']
+            )
+            classified_topics[topic] = {
+                'classification': classification,
+                'correct': stats['correct'],
+                'total': stats['total'],
+                'percentage': round((stats['correct'] / stats['total']) * 100, 1)
+            }
+        
+        # Overall performance
+        overall_percentage = round((total_score / total_questions) * 100, 1)
+        
+        return {
+            'totalScore': total_score,
+            'totalQuestions': total_questions,
+            'overallPercentage': overall_percentage,
+            'classifiedTopics': classified_topics,
+            'questionBreakdown': question_breakdown,
+            'detailedAnswers': []  # Could be expanded for detailed answer analysis
+        }
+        
+    except Exception as e:
+        logger = get_logger()
+        logger.error(f"Error in legacy_analyze_quiz_performance: {str(e)}")
+        raise
+
+
+def make_quiz(num_questions, num_topics=20, seed=7):
+    """Build a synthetic quiz mixing the question formats seen in Firestore"""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(num_questions):
+        question = {
+            'id': f'q{i + 1}',
+            'question': f'Synthetic question {i + 1}?',
+            'options': [f'Option {n}' for n in range(4)],
+        }
+        # Mix legacy field names with the current ones
+        if i % 3 == 0:
+            question['correctAnswer'] = str(rng.randrange(4))
+        else:
+            question['correct'] = rng.randrange(4)
+        if i % 5 == 0:
+            question['topics'] = [f'topic-{rng.randrange(num_topics)}', f'topic-{rng.randrange(num_topics)}']
+        else:
+            question['topic'] = f'topic-{rng.randrange(num_topics)}'
+        questions.append(question)
+    return questions
+
+
+def make_answers(num_questions, seed=11):
+    rng = random.Random(seed)
+    return {str(i): rng.randrange(4) for i in range(num_questions)}
@@ -0,0 +1,75 @@
+"""Bulk question import benchmark against the Firestore emulator.
+
+Generates a synthetic upload and streams it through import_questions, the
+same code path /importQuestions uses, then reports throughput and commits.
+
+Usage (from the functions/ directory, with the emulator running):
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=demo-know-map \\
+        python -m benchmarks.import_benchmark --questions 50000 --format jsonl
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def make_upload(num_questions, upload_format):
+    questions = (
+        {
+            'question': f'Synthetic import question {i + 1}?',
+            'options': [f'Option {n}' for n in range(4)],
+            'correct': i % 4,
+            'topic': f'topic-{i % 250}'
+        }
+        for i in range(num_questions)
+    )
+    if upload_format == 'jsonl':
+        body = '\n'.join(json.dumps(question) for question in questions)
+    else:
+        body = json.dumps({'title': 'Import benchmark', 'topic': 'General', 'questions': list(questions)})
+    return body.encode('utf-8')
+
+
+def main_benchmark(num_questions, upload_format):
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        sys.exit('FIRESTORE_EMULATOR_HOST is not set; refusing to write to a real project')
+
+    db = main.get_firestore_client()
+    upload = make_upload(num_questions, upload_format)
+    job_ref = db.collection('import-jobs').document()
+    job = {'status': 'running', 'received': 0, 'imported': 0, 'skipped': 0,
+           'warnings': 0, 'committedThrough': -1, 'processedThrough': -1, 'errors': []}
+
+    stream = io.BytesIO(upload)
+    metadata = {}
+    records = (main.iter_jsonl_questions(stream) if upload_format == 'jsonl'
+               else main.iter_json_questions(stream, metadata))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    job = main.import_questions(db, records, job_ref, job, 'import-benchmark', metadata=metadata)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    commits = sum(metric['count'] for (name, _), metric in main._span_metrics.items() if name == 'commit')
+    print(f'{upload_format} upload: {len(upload) / 1e6:.1f} MB, {num_questions} questions')
+    print(f"  imported {job['imported']}, skipped {job['skipped']}, status {job['status']}")
+    print(f'  {elapsed:.1f} s, {job["imported"] / elapsed:.0f} questions/s, {commits} commits')
+    print(f'  peak traced memory during import: {peak / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--format', choices=['json', 'jsonl'], default='jsonl')
+    args = parser.parse_args()
+    main_benchmark(args.questions, args.format)
@@ -0,0 +1,207 @@
+"""Local load test for /submitQuiz through know_map_api.
+
+Requests go through a Flask test client into the real entry point, so
+routing, token verification, the quiz cache, grading and the WriteBatch
+commit are all exercised. Firestore is the in-memory stand-in from
+benchmarks.memory_firestore (add --latency-ms to model round trips) or, with
+--emulator, the Firestore emulator. ID tokens are minted locally and verified
+in auth-emulator mode, which skips signature checks and makes no network
+calls. --pipeline picks the sync or async /submitQuiz handler.
+
+Reports client-side throughput and latency percentiles plus the server span
+timings, and writes them to benchmarks/results/load-*.json (or --output).
+
+Usage (from the functions/ directory):
+    python -m benchmarks.load_harness --requests 2000 --concurrency 8
+    python -m benchmarks.load_harness --latency-ms 5 --compare benchmarks/results/load-<earlier>.json
+    python -m benchmarks.load_harness --latency-ms 5 --pipeline sync
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=demo-know-map \\
+        python -m benchmarks.load_harness --emulator --requests 500
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault('FIREBASE_AUTH_EMULATOR_HOST', 'localhost:9099')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_admin  # noqa: E402
+from flask import Flask, make_response, request  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.grading_benchmark import make_quiz  # noqa: E402
+from benchmarks.memory_firestore import MemoryAsyncFirestore, MemoryFirestore  # noqa: E402
+from benchmarks.reporting import compare_results, print_comparison, summarize, write_results  # noqa: E402
+from benchmarks.token_cache_check import PROJECT_ID, make_signer, mint_token  # noqa: E402
+
+
+def build_app():
+    """A Flask app that hands every request to the Cloud Function entry point"""
+    app = Flask(__name__)
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'OPTIONS'])
+    @app.route('/<path:path>', methods=['GET', 'POST', 'OPTIONS'])
+    def entry_point(path):
+        return make_response(main.know_map_api(request))
+
+    return app
+
+
+def seed_quizzes(db, num_quizzes, num_questions, num_topics):
+    quiz_ids = []
+    for i in range(num_quizzes):
+        quiz_ref = db.collection('quizzes').document(f'load-quiz-{i}')
+        quiz_ref.set({
+            'title': f'Load test quiz {i}',
+            'difficulty': 'medium',
+            'questions': make_quiz(num_questions, num_topics=num_topics, seed=i),
+            'updatedAt': time.time()
+        })
+        quiz_ids.append(quiz_ref.id)
+    return quiz_ids
+
+
+def run_load(app, tokens, quiz_ids, num_questions, total_requests, concurrency, route='/submitQuiz'):
+    """Send total_requests submissions from `concurrency` threads; returns (latencies, statuses, seconds)"""
+    counter = itertools.count()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        local_latencies, local_statuses = [], {}
+        while next(counter) < total_requests:
+            body = {
+                'quizId': rng.choice(quiz_ids),
+                'answers': {str(i): rng.randrange(4) for i in range(num_questions)},
+                'timeSpent': rng.randint(30, 900)
+            }
+            headers = {'Authorization': f'Bearer {rng.choice(tokens)}'}
+            started = time.perf_counter()
+            response = client.post(route, json=body, headers=headers)
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def server_span_summary(route='/submitQuiz'):
+    """Median and p95 (ms) of each server span recorded for the route"""
+    spans = {}
+    with main._metrics_lock:
+        metrics = {name: sorted(metric['samples']) for (name, span_route), metric in main._span_metrics.items()
+                   if span_route == route}
+    for name, samples in metrics.items():
+        spans[name] = {
+            'count': len(samples),
+            'medianMs': round(main.get_quantile(samples, 0.5) * 1000, 3),
+            'p95Ms': round(main.get_quantile(samples, 0.95) * 1000, 3)
+        }
+    return spans
+
+
+def reset_server_metrics():
+    with main._metrics_lock:
+        main._span_metrics.clear()
+        main._request_counts.clear()
+
+
+def main_harness():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--quizzes', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--topics', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated Firestore round trip (in-memory only)')
+    parser.add_argument('--emulator', action='store_true', help='use the Firestore emulator instead of memory')
+    parser.add_argument('--pipeline', choices=['async', 'sync'], default=main.SUBMIT_PIPELINE)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/load-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed median slowdown')
+    args = parser.parse_args()
+
+    main.get_logger().setLevel(logging.WARNING)
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(options={'projectId': os.environ.get('GCLOUD_PROJECT', PROJECT_ID)})
+
+    if args.emulator:
+        if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+            sys.exit('FIRESTORE_EMULATOR_HOST is not set; refusing to write to a real project')
+        db = main.get_firestore_client()
+        backend = 'emulator'
+    else:
+        db = MemoryFirestore(latency=args.latency_ms / 1000)
+        main.db = db
+        main.async_db = MemoryAsyncFirestore(db)
+        backend = 'memory'
+    main.SUBMIT_PIPELINE = args.pipeline
+
+    signer = make_signer()
+    tokens = [mint_token(signer, f'load-user-{i}') for i in range(args.users)]
+    quiz_ids = seed_quizzes(db, args.quizzes, args.questions, args.topics)
+    app = build_app()
+
+    if args.warmup:
+        run_load(app, tokens, quiz_ids, args.questions, args.warmup, args.concurrency)
+    reset_server_metrics()
+
+    latencies, statuses, seconds = run_load(app, tokens, quiz_ids, args.questions, args.requests, args.concurrency)
+    stats = summarize(latencies)
+    throughput = len(latencies) / seconds
+    params = {
+        'backend': backend, 'concurrency': args.concurrency, 'questions': args.questions,
+        'topics': args.topics, 'latencyMs': args.latency_ms, 'pipeline': args.pipeline
+    }
+    entry = {
+        'name': 'submitQuiz',
+        'params': params,
+        'stats': stats,
+        'throughput': throughput,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'serverSpans': server_span_summary()
+    }
+    if backend == 'memory':
+        entry['firestore'] = {'reads': db.reads, 'writes': db.writes, 'commits': db.commits}
+
+    print(f"{len(latencies)} requests in {seconds:.2f}s from {args.concurrency} threads ({backend}, {args.pipeline}): "
+          f"{throughput:.1f} req/s")
+    print(f"latency ms  p50 {stats['median'] * 1000:.2f}  p90 {stats['p90'] * 1000:.2f}  "
+          f"p95 {stats['p95'] * 1000:.2f}  p99 {stats['p99'] * 1000:.2f}  max {stats['max'] * 1000:.2f}")
+    print(f"statuses {entry['statuses']}")
+    for name, span in sorted(entry['serverSpans'].items()):
+        print(f"  span {name:<14} p50 {span['medianMs']:>8.3f} ms  p95 {span['p95Ms']:>8.3f} ms")
+
+    path = write_results('load', [entry], args.output)
+    print(f'Results written to {path}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous:
+            rows = compare_results(json.load(previous), {'benchmarks': [entry]}, 'median', args.threshold)
+        print_comparison(rows, 'median')
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main_harness()
@@ -0,0 +1,90 @@
+"""CPU cost of submission logging, before and after structured sampled logging.
+
+"legacy" replays the per-question f-string logging of the old
+analyze_quiz_performance plus the per-step handle_submit_quiz log lines,
+formatted the way logging.basicConfig did. "structured" is the current
+path: a compiled plan, sampled detail (off by default) and one JSON summary
+record. Both write to os.devnull so formatting and handler cost are included.
+
+Usage (from the functions/ directory):
+    python -m benchmarks.logging_benchmark --questions 200 --submissions 500
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from benchmarks.grading_benchmark import legacy_analyze_quiz_performance, make_answers, make_quiz  # noqa: E402
+
+
+def legacy_submission(logger, answers, questions):
+    # The log lines handle_submit_quiz used to emit around grading
+    logger.info("--- CANARY LOG: handle_submit_quiz function entered ---")
+    logger.info(f"Processing quiz submission for user: {'student-1'}")
+    logger.info(f"Attempting to fetch quiz with ID: {'bench-quiz'}")
+    logger.info(f"Quiz document found with ID: {'bench-quiz'}")
+    logger.info(f"Found {len(questions)} questions in main document")
+    logger.info(f"First question structure: {questions[0]}")
+    legacy_analyze_quiz_performance(answers, questions)
+    logger.info(f"Quiz attempt recorded: {'attempt-id'}, Legacy report: {'report-id'}")
+
+
+def structured_submission(answers, plan):
+    main.begin_request_log('/submitQuiz')
+    main.annotate_request(userId='student-1', quizId='bench-quiz', quizCacheHit=True)
+    main.log_detail("First question structure", question=plan['display'][0])
+    analysis = main.analyze_quiz_performance(answers, plan=plan)
+    main.log_request_summary(
+        "Quiz attempt recorded",
+        status=200,
+        attemptId='attempt-id',
+        questionCount=analysis['totalQuestions'],
+        score=analysis['totalScore'],
+        timings={'authMs': 0.1, 'quizFetchMs': 0.1, 'gradeMs': 0.1, 'commitMs': 0.1}
+    )
+
+
+def measure(fn, submissions):
+    started = time.process_time()
+    for _ in range(submissions):
+        fn()
+    return (time.process_time() - started) / submissions
+
+
+def main_benchmark(num_questions, submissions, sample_rate):
+    logger = main.get_logger()
+    logger.setLevel(logging.INFO)
+    handler = logger.handlers[0]
+    structured_formatter = handler.formatter
+    with open(os.devnull, 'w') as devnull:
+        handler.setStream(devnull)
+
+        questions = make_quiz(num_questions)
+        answers = make_answers(num_questions)
+        plan = main.compile_quiz(questions)
+
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        legacy = measure(lambda: legacy_submission(logger, answers, questions), submissions)
+
+        handler.setFormatter(structured_formatter)
+        main.LOG_DETAIL_SAMPLE_RATE = sample_rate
+        structured = measure(lambda: structured_submission(answers, plan), submissions)
+
+    print(f'{num_questions} questions, {submissions} submissions, detail sample rate {sample_rate}')
+    print(f'  legacy logging:     {legacy * 1000:8.3f} ms CPU per submission '
+          f'(~{5 * num_questions + 7} log lines)')
+    print(f'  structured logging: {structured * 1000:8.3f} ms CPU per submission (1 summary line)')
+    print(f'  saved:              {(legacy - structured) * 1000:8.3f} ms ({legacy / structured:.1f}x)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--submissions', type=int, default=200)
+    parser.add_argument('--sample-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    main_benchmark(args.questions, args.submissions, args.sample_rate)
@@ -0,0 +1,470 @@
+"""In-memory stand-in for the slice of the Firestore client that main.py uses.
+
+Collections, documents and subcollections; get (with field_paths), set (with
+merge), update, create and delete; get_all; WriteBatch; and queries with where('==' and
+range operators), order_by, select, limit, start_after, stream and count().
+Increment, ArrayUnion, ArrayRemove, SERVER_TIMESTAMP and DELETE_FIELD
+transforms are applied, and snapshots carry an update_time. Every RPC can be delayed by `latency` seconds to
+model network round trips, and reads/writes/commits are counted.
+MemoryAsyncFirestore exposes the same storage through the AsyncClient calls
+used by the async /submitQuiz pipeline. It is meant for the offline load
+harness, not as an emulator: there are no transactions, listeners or index
+checks.
+"""
+import asyncio
+import copy
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1 import transforms
+
+AUTO_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def auto_id():
+    return ''.join(random.choice(AUTO_ID_ALPHABET) for _ in range(20))
+
+
+def split_field_path(field_path):
+    return [part.strip('`') for part in str(field_path).split('.')]
+
+
+def get_field(data, field_path):
+    value = data
+    for part in split_field_path(field_path):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def project(data, field_paths):
+    """Keep only the given (possibly dotted) field paths of a document"""
+    projected = {}
+    for field_path in field_paths:
+        parts = split_field_path(field_path)
+        value = get_field(data, field_path)
+        if value is None and get_field(data, parts[0]) is None:
+            continue
+        target = projected
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = copy.deepcopy(value)
+    return projected
+
+
+def apply_value(target, key, value):
+    if isinstance(value, transforms.Increment):
+        current = target.get(key)
+        target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        current = list(target.get(key)) if isinstance(target.get(key), list) else []
+        target[key] = current + [item for item in value.values if item not in current]
+    elif isinstance(value, transforms.ArrayRemove):
+        current = target.get(key) if isinstance(target.get(key), list) else []
+        target[key] = [item for item in current if item not in value.values]
+    elif value is transforms.SERVER_TIMESTAMP:
+        target[key] = datetime.now(timezone.utc)
+    elif value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    else:
+        target[key] = copy.deepcopy(value)
+
+
+def merge_into(target, data):
+    """set(..., merge=True): nested maps merge, every other value replaces"""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            existing = target.get(key)
+            if not isinstance(existing, dict):
+                existing = target[key] = {}
+            merge_into(existing, value)
+        else:
+            apply_value(target, key, value)
+
+
+def resolve_transforms(data):
+    """A plain set(): transforms inside the new document are resolved against nothing"""
+    resolved = {}
+    merge_into(resolved, data)
+    return resolved
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return get_field(self._data or {}, field_path)
+
+
+class MemoryDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def collection(self, name):
+        return MemoryCollectionReference(self._client, f'{self.path}/{name}')
+
+    def get(self, field_paths=None, transaction=None):
+        self._client.rpc()
+        return self.read(field_paths)
+
+    def read(self, field_paths=None):
+        """get() without the simulated round trip"""
+        client = self._client
+        with client.lock:
+            client.reads += 1
+            data = client.documents.get(self.path)
+            data = copy.deepcopy(data) if data is not None else None
+            update_time = client.update_times.get(self.path)
+        if data is not None and field_paths is not None:
+            data = project(data, field_paths)
+        return MemorySnapshot(self, data, update_time)
+
+    def set(self, data, merge=False):
+        self._client.commit_writes([('set', self, data, merge)])
+
+    def update(self, data):
+        self._client.commit_writes([('update', self, data, False)])
+
+    def create(self, data):
+        self._client.commit_writes([('create', self, data, False)])
+
+    def delete(self):
+        self._client.commit_writes([('delete', self, None, False)])
+
+
+class MemoryAggregation:
+    def __init__(self, value):
+        self.alias = 'count'
+        self.value = value
+
+
+class MemoryCountQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self):
+        return [[MemoryAggregation(len(self._query.matching_documents()))]]
+
+
+class MemoryQuery:
+    OPERATORS = {
+        '==': lambda value, expected: value == expected,
+        '!=': lambda value, expected: value != expected,
+        '<': lambda value, expected: value is not None and value < expected,
+        '<=': lambda value, expected: value is not None and value <= expected,
+        '>': lambda value, expected: value is not None and value > expected,
+        '>=': lambda value, expected: value is not None and value >= expected,
+        'in': lambda value, expected: value in expected,
+        'array_contains': lambda value, expected: isinstance(value, list) and expected in value
+    }
+
+    def __init__(self, collection, filters=(), orders=(), fields=None, limit_count=None, cursor=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._fields = fields
+        self._limit = limit_count
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = {
+            'filters': self._filters, 'orders': self._orders, 'fields': self._fields,
+            'limit_count': self._limit, 'cursor': self._cursor, **changes
+        }
+        return MemoryQuery(self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((str(field_path), direction),))
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, document_fields):
+        if isinstance(document_fields, MemorySnapshot):
+            document_fields = {**(document_fields.to_dict() or {}), '__name__': document_fields.id}
+        return self._copy(cursor=document_fields)
+
+    def count(self, alias=None):
+        return MemoryCountQuery(self)
+
+    def sort_key(self, doc_id, data):
+        return tuple(doc_id if field == '__name__' else get_field(data, field) for field, _ in self._orders)
+
+    def matching_documents(self):
+        client = self._collection._client
+        prefix = self._collection.path + '/'
+        with client.lock:
+            rows = [
+                (path[len(prefix):], copy.deepcopy(data)) for path, data in client.documents.items()
+                if path.startswith(prefix) and '/' not in path[len(prefix):]
+                and all(self.OPERATORS[op](get_field(data, field), expected) for field, op, expected in self._filters)
+            ]
+        orders = self._orders or (('__name__', 'ASCENDING'),)
+        for field, direction in reversed(orders):
+            rows.sort(
+                key=lambda row: (lambda value: (value is not None, value))(
+                    row[0] if field == '__name__' else get_field(row[1], field)),
+                reverse=direction == 'DESCENDING'
+            )
+        if self._cursor is not None and self._orders:
+            descending = self._orders[0][1] == 'DESCENDING'
+            after = tuple(
+                self._cursor.get(field) if isinstance(self._cursor, dict) else None for field, _ in self._orders
+            )
+            after = tuple(value.id if isinstance(value, MemoryDocumentReference) else value for value in after)
+            rows = [
+                row for row in rows
+                if (self.sort_key(*row) < after if descending else self.sort_key(*row) > after)
+            ]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def stream(self, transaction=None):
+        self._collection._client.rpc()
+        yield from self.fetch()
+
+    def fetch(self):
+        """Matching snapshots without the simulated round trip"""
+        client = self._collection._client
+        rows = self.matching_documents()
+        with client.lock:
+            client.reads += max(1, len(rows))
+        snapshots = []
+        for doc_id, data in rows:
+            if self._fields is not None:
+                data = project(data, self._fields)
+            reference = self._collection.document(doc_id)
+            snapshots.append(MemorySnapshot(reference, data, client.update_times.get(reference.path)))
+        return snapshots
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+        super().__init__(self)
+
+    def document(self, document_id=None):
+        return MemoryDocumentReference(self._client, f'{self.path}/{document_id or auto_id()}')
+
+    def add(self, data):
+        reference = self.document()
+        reference.set(data)
+        return None, reference
+
+
+class MemoryWriteBatch:
+    MAX_WRITES = 500
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference, data, False))
+
+    def create(self, reference, data):
+        self._writes.append(('create', reference, data, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        if len(self._writes) > self.MAX_WRITES:
+            raise ValueError(f'A WriteBatch allows at most {self.MAX_WRITES} writes, got {len(self._writes)}')
+        self._client.commit_writes(self._writes)
+        self._writes = []
+
+
+class MemoryFirestore:
+    """Thread-safe in-memory client; pass latency=0.005 to add 5 ms per RPC"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = {}
+        self.update_times = {}
+        self.lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def rpc(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, name):
+        return MemoryCollectionReference(self, name)
+
+    def document(self, path):
+        return MemoryDocumentReference(self, path)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self.rpc()
+        for reference in references:
+            yield MemoryDocumentReference(self, reference.path).read(field_paths)
+
+    def commit_writes(self, writes):
+        """Apply writes atomically (all or nothing), like a committed WriteBatch"""
+        self.rpc()
+        self.apply_writes(writes)
+
+    def apply_writes(self, writes):
+        with self.lock:
+            staged = {}
+            for kind, reference, data, merge in writes:
+                current = staged.get(reference.path, self.documents.get(reference.path))
+                if kind == 'delete':
+                    staged[reference.path] = None
+                elif kind == 'create':
+                    if current is not None:
+                        raise ValueError(f'Document already exists: {reference.path}')
+                    staged[reference.path] = resolve_transforms(data)
+                elif kind == 'update':
+                    if current is None:
+                        raise ValueError(f'No document to update: {reference.path}')
+                    updated = copy.deepcopy(current)
+                    for field_path, value in data.items():
+                        parts = split_field_path(field_path)
+                        target = updated
+                        for part in parts[:-1]:
+                            target = target.setdefault(part, {})
+                        apply_value(target, parts[-1], value)
+                    staged[reference.path] = updated
+                elif merge and current is not None:
+                    updated = copy.deepcopy(current)
+                    merge_into(updated, data)
+                    staged[reference.path] = updated
+                else:
+                    staged[reference.path] = resolve_transforms(data)
+            update_time = datetime.now(timezone.utc)
+            for path, data in staged.items():
+                if data is None:
+                    self.documents.pop(path, None)
+                    self.update_times.pop(path, None)
+                else:
+                    self.documents[path] = data
+                    self.update_times[path] = update_time
+            self.writes += len(writes)
+            self.commits += 1
+
+
+class MemoryAsyncDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self._reference = MemoryDocumentReference(client.sync, path)
+        self.path = path
+        self.id = self._reference.id
+
+    def collection(self, name):
+        return MemoryAsyncCollectionReference(self._client, f'{self.path}/{name}')
+
+    async def get(self, field_paths=None, transaction=None):
+        await self._client.rpc()
+        return self._reference.read(field_paths)
+
+
+class MemoryAsyncQuery:
+    def __init__(self, client, query):
+        self._client = client
+        self._query = query
+
+    def where(self, *args, **kwargs):
+        return MemoryAsyncQuery(self._client, self._query.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return MemoryAsyncQuery(self._client, self._query.order_by(*args, **kwargs))
+
+    def select(self, field_paths):
+        return MemoryAsyncQuery(self._client, self._query.select(field_paths))
+
+    def limit(self, count):
+        return MemoryAsyncQuery(self._client, self._query.limit(count))
+
+    def start_after(self, document_fields):
+        return MemoryAsyncQuery(self._client, self._query.start_after(document_fields))
+
+    async def get(self, transaction=None):
+        await self._client.rpc()
+        return self._query.fetch()
+
+    async def stream(self, transaction=None):
+        for snapshot in await self.get():
+            yield snapshot
+
+
+class MemoryAsyncCollectionReference(MemoryAsyncQuery):
+    def __init__(self, client, path):
+        super().__init__(client, MemoryCollectionReference(client.sync, path))
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        return MemoryAsyncDocumentReference(self._client, f'{self.path}/{document_id or auto_id()}')
+
+
+class MemoryAsyncWriteBatch(MemoryWriteBatch):
+    async def commit(self):
+        if len(self._writes) > self.MAX_WRITES:
+            raise ValueError(f'A WriteBatch allows at most {self.MAX_WRITES} writes, got {len(self._writes)}')
+        await self._client.rpc()
+        self._client.sync.apply_writes(self._writes)
+        self._writes = []
+
+
+class MemoryAsyncFirestore:
+    """AsyncClient view of a MemoryFirestore; round trips await asyncio.sleep"""
+
+    def __init__(self, client):
+        self.sync = client
+
+    async def rpc(self):
+        if self.sync.latency:
+            await asyncio.sleep(self.sync.latency)
+
+    def collection(self, name):
+        return MemoryAsyncCollectionReference(self, name)
+
+    def document(self, path):
+        return MemoryAsyncDocumentReference(self, path)
+
+    def batch(self):
+        return MemoryAsyncWriteBatch(self)
@@ -0,0 +1,123 @@
+"""Topic index load time, memory and lookup latency at question-bank scale.
+
+Builds the topic-index-shards documents for a synthetic bank (--questions
+ids over --topics topics with a skewed, Zipf-like topic distribution) in the
+in-memory Firestore stand-in, then times a full load_topic_index, an idle
+incremental refresh, and pick_topic_questions / pick_topic_quizzes for the
+largest and a typical topic. Most of the full-load time here is the
+stand-in deep-copying every shard; against Firestore it is the transfer
+and decoding of the shard documents instead.
+
+Usage (from the functions/ directory):
+    python -m benchmarks.recommendation_benchmark --questions 300000 --topics 5000
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from benchmarks.memory_firestore import MemoryFirestore  # noqa: E402
+from benchmarks.reporting import summarize  # noqa: E402
+
+
+def seed_index(db, num_questions, num_topics, num_quizzes, seed=0):
+    rng = random.Random(seed)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(num_topics)))
+    topics = [f'topic-{i}' for i in range(num_topics)]
+    entries = [(f'job-{i // 1000:05d}-{i:07d}', rng.choices(topics, cum_weights=weights))
+               for i in range(num_questions)]
+    for ref, data, merge in main.build_topic_index_writes(db, entries, absolute=True):
+        ref.set(data, merge=merge)
+    for i in range(num_quizzes):
+        db.collection('quizzes').document(f'quiz-{i}').set({
+            'title': f'Quiz {i}',
+            'questions': [{'topic': topic} for topic in rng.choices(topics, cum_weights=weights, k=20)]
+        })
+    return topics
+
+
+def time_calls(fn, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=300000)
+    parser.add_argument('--topics', type=int, default=5000)
+    parser.add_argument('--quizzes', type=int, default=500)
+    parser.add_argument('--per-topic', type=int, default=main.RECOMMENDATION_QUESTIONS, help='ids per lookup')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    main.get_logger().setLevel(logging.WARNING)
+    db = MemoryFirestore()
+    topics = seed_index(db, args.questions, args.topics, args.quizzes)
+    shard_sizes = [len(json.dumps(doc['questions'])) for path, doc in db.documents.items()
+                   if path.startswith('topic-index-shards/')]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    main.load_topic_index(db, full=True)
+    full_load = time.perf_counter() - started
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    reads = db.reads
+    started = time.perf_counter()
+    main.load_topic_index(db)
+    idle_refresh = time.perf_counter() - started
+    idle_reads = db.reads - reads
+
+    rng = random.Random(1)
+    largest, typical = topics[0], topics[len(topics) // 2]
+    results = {
+        'questions': args.questions,
+        'topics': args.topics,
+        'largestShardBytes': max(shard_sizes),
+        'fullLoadSeconds': round(full_load, 3),
+        'indexMegabytes': round(index_bytes / 2 ** 20, 1),
+        'idleRefreshSeconds': round(idle_refresh, 4),
+        'idleRefreshReads': idle_reads,
+        'lookups': {}
+    }
+    for label, topic in (('largest', largest), ('typical', typical)):
+        questions = time_calls(lambda: main.pick_topic_questions(topic, rng.randrange(1 << 32), args.per_topic),
+                               args.calls)
+        quizzes = time_calls(lambda: main.pick_topic_quizzes(topic, main.RECOMMENDATION_QUIZZES), args.calls)
+        results['lookups'][label] = {
+            'topic': topic,
+            'topicQuestions': sum(len(ids) for ids in main._topic_index['questions'].get(topic, {}).values()),
+            'questionsMedianUs': round(questions['median'] * 1e6, 2),
+            'questionsP99Us': round(questions['p99'] * 1e6, 2),
+            'quizzesMedianUs': round(quizzes['median'] * 1e6, 2)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.questions} questions over {args.topics} topics, {args.quizzes} quizzes")
+    print(f"largest shard ~{results['largestShardBytes'] / 1024:.0f} KiB; full load {full_load * 1000:.0f} ms, "
+          f"~{results['indexMegabytes']} MiB in memory; idle refresh {idle_refresh * 1000:.2f} ms, "
+          f"{idle_reads} reads")
+    for label, lookup in results['lookups'].items():
+        print(f"{label:<8} {lookup['topic']:<12} {lookup['topicQuestions']:>7} ids  "
+              f"pick questions p50 {lookup['questionsMedianUs']:.1f} us p99 {lookup['questionsP99Us']:.1f} us  "
+              f"pick quizzes p50 {lookup['quizzesMedianUs']:.1f} us")
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,131 @@
+"""Shared result handling for the load and pipeline benchmark scripts.
+
+These time whole requests issued from several threads (per-request latency
+samples, throughput, Firestore op counts), which pytest-benchmark's
+single-callable timer does not model; the function-level micro-benchmarks
+in test_micro.py use pytest-benchmark and its own JSON/compare options.
+
+Results are written as JSON with the environment they were measured in, one
+entry per benchmark (name, params, stats), so two runs can be compared with
+compare_results or `python -m benchmarks.reporting OLD.json NEW.json`.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpuCount': os.cpu_count(),
+        'gitRevision': get_git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+
+
+def percentile(sorted_samples, quantile):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(quantile * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples):
+    """Timing statistics (seconds) for a list of per-operation samples"""
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return {
+        'rounds': len(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': mean,
+        'median': statistics.median(ordered),
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'p90': percentile(ordered, 0.90),
+        'p95': percentile(ordered, 0.95),
+        'p99': percentile(ordered, 0.99),
+        'ops': 1 / mean if mean else 0.0
+    }
+
+
+def write_results(kind, benchmarks, path=None, extra=None):
+    """Write a results document and return its path (default: benchmarks/results/)"""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        path = os.path.join(RESULTS_DIR, f'{kind}-{stamp}.json')
+    document = {'kind': kind, 'environment': environment_info(), 'benchmarks': benchmarks, **(extra or {})}
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(document, output, indent=2)
+    return path
+
+
+def benchmark_key(entry):
+    return entry['name'], json.dumps(entry.get('params', {}), sort_keys=True)
+
+
+def compare_results(old, new, metric='median', threshold=0.10):
+    """Return rows (name, params, old, new, change, regressed) for benchmarks in both runs.
+
+    `metric` is a key of the stats dict; a row regresses when it is more than
+    `threshold` slower (for `ops`, lower) than before.
+    """
+    previous = {benchmark_key(entry): entry for entry in old['benchmarks']}
+    rows = []
+    for entry in new['benchmarks']:
+        before = previous.get(benchmark_key(entry))
+        if before is None or not before['stats'].get(metric):
+            continue
+        old_value, new_value = before['stats'][metric], entry['stats'][metric]
+        change = new_value / old_value - 1
+        slower = -change if metric == 'ops' else change
+        rows.append((entry['name'], entry.get('params', {}), old_value, new_value, change, slower > threshold))
+    return rows
+
+
+def print_comparison(rows, metric):
+    for name, params, old_value, new_value, change, regressed in rows:
+        label = name + (' ' + ' '.join(f'{key}={value}' for key, value in params.items()) if params else '')
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{label:<60} {old_value:>12.6g} -> {new_value:>12.6g} {metric} ({change:+.1%}){flag}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='median')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before flagging')
+    args = parser.parse_args()
+
+    with open(args.old, encoding='utf-8') as old_file, open(args.new, encoding='utf-8') as new_file:
+        rows = compare_results(json.load(old_file), json.load(new_file), args.metric, args.threshold)
+    print_comparison(rows, args.metric)
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
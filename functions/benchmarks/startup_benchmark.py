@@ -0,0 +1,133 @@
+"""Cold-start profile for functions/main.py.
+
+Each sample runs in a fresh interpreter and records:
+  * the cumulative import time of `main` from `python -X importtime`
+  * the latency of the first /health request after import
+  * with FIRESTORE_EMULATOR_HOST set, the first Firestore round trip
+
+Pass --baseline REV to profile main.py from another git revision (for
+example the commit before a change) next to the working tree copy.
+
+Usage (from the functions/ directory):
+    python -m benchmarks.startup_benchmark --runs 10
+    python -m benchmarks.startup_benchmark --baseline HEAD~1 --top 10
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints one JSON line of timings
+PROBE = r'''
+import json, os, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import flask
+app = flask.Flask('startup-benchmark')
+with app.test_request_context('/health', method='GET'):
+    before_request = time.perf_counter()
+    main.know_map_api(flask.request)
+    health_done = time.perf_counter()
+result = {
+    'importMs': (imported - started) * 1000,
+    'firstHealthMs': (health_done - before_request) * 1000
+}
+if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+    before_firestore = time.perf_counter()
+    main.get_firestore_client().collection('quizzes').document('_warmup').get()
+    result['firstFirestoreMs'] = (time.perf_counter() - before_firestore) * 1000
+print(json.dumps(result))
+'''
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_probe(source_dir):
+    env = dict(os.environ, PYTHONPATH=source_dir)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=source_dir, env=env, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # -X importtime reports to stderr; keep main and its direct imports
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if name == 'main':
+            timings['mainImportUs'] = int(cumulative)
+        elif len(indent) == 3:
+            modules.append((name, int(cumulative)))
+    timings['directImports'] = modules
+    return timings
+
+
+def profile(source_dir, runs):
+    samples = [run_probe(source_dir) for _ in range(runs)]
+    summary = {}
+    for key in ('mainImportUs', 'importMs', 'firstHealthMs', 'firstFirestoreMs'):
+        values = [sample[key] for sample in samples if key in sample]
+        if values:
+            summary[key] = round(statistics.median(values), 2)
+
+    # Direct imports of main as seen by the last sample
+    summary['directImports'] = sorted(samples[-1]['directImports'], key=lambda item: -item[1])
+    return summary
+
+
+def checkout_revision(revision, target_dir):
+    source = subprocess.run(
+        ['git', 'show', f'{revision}:functions/main.py'],
+        cwd=FUNCTIONS_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    with open(os.path.join(target_dir, 'main.py'), 'w') as handle:
+        handle.write(source)
+
+
+def print_summary(label, summary, top):
+    print(f'[{label}]')
+    print(f"  import main (importtime): {summary.get('mainImportUs', 0) / 1000:.1f} ms")
+    print(f"  import main (wall):       {summary.get('importMs', 0):.1f} ms")
+    print(f"  first /health request:    {summary.get('firstHealthMs', 0):.2f} ms")
+    if 'firstFirestoreMs' in summary:
+        print(f"  first Firestore read:     {summary['firstFirestoreMs']:.1f} ms")
+    print('  heaviest direct imports of main:')
+    for name, cumulative in summary['directImports'][:top]:
+        print(f'    {cumulative / 1000:8.1f} ms  {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8)
+    parser.add_argument('--baseline', help='git revision to compare against')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            checkout_revision(args.baseline, baseline_dir)
+            results['baseline'] = profile(baseline_dir, args.runs)
+        print_summary(f'baseline {args.baseline}', results['baseline'], args.top)
+
+    results['current'] = profile(FUNCTIONS_DIR, args.runs)
+    print_summary('working tree', results['current'], args.top)
+
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
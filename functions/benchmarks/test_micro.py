@@ -0,0 +1,113 @@
+"""Micro-benchmarks for grading and topic classification (pytest-benchmark).
+
+Times analyze_quiz_performance (from a precompiled plan, compiling from the
+raw questions, and the per-request implementation compile_quiz replaced),
+compile_quiz and classify_topic_performance over synthetic quizzes across a
+grid of question counts and topic cardinalities. The default test run only
+collects tests/, so these run when asked for.
+
+Usage (from the functions/ directory):
+    python -m pytest benchmarks/test_micro.py --benchmark-json benchmarks/results/micro.json
+    python -m pytest benchmarks/test_micro.py -k "analyze_with_plan or compile_quiz"
+
+To flag regressions, save a baseline and compare later runs against it
+(exits non-zero when a median slows down by more than 10%):
+    python -m pytest benchmarks/test_micro.py --benchmark-storage benchmarks/results --benchmark-autosave
+    python -m pytest benchmarks/test_micro.py --benchmark-storage benchmarks/results \\
+        --benchmark-compare --benchmark-compare-fail median:10%
+"""
+import functools
+import logging
+import random
+
+import pytest
+
+import main
+from benchmarks.grading_benchmark import legacy_analyze_quiz_performance, make_answers, make_quiz
+
+# 50/500/5000 questions: the sizes the compiled-vs-legacy grading speed-up is reported at
+SIZES = [50, 500, 5000]
+TOPIC_COUNTS = [1, 20, 500]
+
+GRID = [(size, num_topics) for size in SIZES for num_topics in TOPIC_COUNTS]
+grid = pytest.mark.parametrize('size, num_topics', GRID,
+                               ids=[f'questions={size},topics={num_topics}' for size, num_topics in GRID])
+
+
+@pytest.fixture(autouse=True, scope='module')
+def quiet_logger():
+    # Keep log output out of the measurement; the f-strings are still built
+    logger = main.get_logger()
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    yield
+    logger.setLevel(level)
+
+
+@functools.lru_cache(maxsize=None)
+def get_quiz(size, num_topics):
+    questions = make_quiz(size, num_topics=num_topics)
+    return questions, make_answers(size), main.compile_quiz(questions)
+
+
+def make_topic_scores(num_topics, seed=3):
+    rng = random.Random(seed)
+    scores = []
+    for _ in range(num_topics):
+        total = rng.randint(1, 20)
+        scores.append((rng.randint(0, total), total))
+    return scores
+
+
+def grading_group(benchmark, size, num_topics):
+    benchmark.group = f'grading questions={size} topics={num_topics}'
+
+
+@grid
+def test_analyze_with_plan(benchmark, size, num_topics):
+    questions, answers, plan = get_quiz(size, num_topics)
+    grading_group(benchmark, size, num_topics)
+
+    result = benchmark(main.analyze_quiz_performance, answers, plan=plan)
+
+    assert result['totalQuestions'] == size
+
+
+@grid
+def test_analyze_from_questions(benchmark, size, num_topics):
+    questions, answers, plan = get_quiz(size, num_topics)
+    grading_group(benchmark, size, num_topics)
+
+    result = benchmark(main.analyze_quiz_performance, answers, questions)
+
+    assert result == main.analyze_quiz_performance(answers, plan=plan)
+
+
+@grid
+def test_analyze_legacy(benchmark, size, num_topics):
+    questions, answers, plan = get_quiz(size, num_topics)
+    grading_group(benchmark, size, num_topics)
+
+    result = benchmark(legacy_analyze_quiz_performance, answers, questions)
+
+    # The compiled plan must produce the same report as the code it replaced
+    assert result == main.analyze_quiz_performance(answers, plan=plan)
+
+
+@grid
+def test_compile_quiz(benchmark, size, num_topics):
+    questions, answers, plan = get_quiz(size, num_topics)
+    benchmark.group = 'compile_quiz'
+
+    assert benchmark(main.compile_quiz, questions) == plan
+
+
+@pytest.mark.parametrize('num_topics', TOPIC_COUNTS)
+def test_classify_topic_performance(benchmark, num_topics):
+    scores = make_topic_scores(num_topics)
+    benchmark.group = 'classify_topic_performance'
+
+    def classify_all():
+        return [main.classify_topic_performance(correct, total) for correct, total in scores]
+
+    assert len(benchmark(classify_all)) == num_topics
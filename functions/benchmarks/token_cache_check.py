@@ -0,0 +1,120 @@
+"""Offline timing for the verified-ID-token cache, with real signature checks.
+
+Mints Firebase-shaped ID tokens signed with a throwaway RSA key and serves
+that key's public half in place of Google's securetoken certificates, so
+verify_firebase_token runs the full RS256 verification without any network
+access. Prints the per-call cost with and without the cache. The cache's
+behaviour is covered by tests/test_token_cache.py.
+
+The load harness and pipeline benchmark reuse make_signer/mint_token in
+auth-emulator mode instead, where signatures are not checked.
+
+Usage (from the functions/ directory):
+    python -m benchmarks.token_cache_check
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_admin  # noqa: E402
+import google.oauth2.id_token  # noqa: E402
+from firebase_admin import credentials  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from google.auth import crypt, jwt  # noqa: E402
+
+import main  # noqa: E402
+
+PROJECT_ID = 'demo-know-map'
+KEY_ID = 'test-key'
+
+
+def make_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_signer(key=None):
+    pem = (key or make_key()).private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    return crypt.RSASigner.from_string(pem, key_id=KEY_ID)
+
+
+def get_public_certs(key):
+    """The {key id: public key PEM} mapping Google's certificate endpoint would serve"""
+    pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return {KEY_ID: pem.decode('utf-8')}
+
+
+def make_credential(key):
+    """Service-account credentials around `key`, so the Admin SDK needs no default credentials"""
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    return credentials.Certificate({
+        'type': 'service_account',
+        'project_id': PROJECT_ID,
+        'private_key': pem.decode('utf-8'),
+        'client_email': f'tests@{PROJECT_ID}.iam.gserviceaccount.com',
+        'token_uri': 'https://oauth2.googleapis.com/token'
+    })
+
+
+def fetch_local_certs(key):
+    """A stand-in for google.oauth2.id_token._fetch_certs that trusts only `key`"""
+    certs = get_public_certs(key)
+    return lambda request, certs_url: certs
+
+
+def mint_token(signer, uid, lifetime=3600):
+    now = int(time.time())
+    payload = {
+        'iss': f'https://securetoken.google.com/{PROJECT_ID}',
+        'aud': PROJECT_ID,
+        'auth_time': now,
+        'user_id': uid,
+        'sub': uid,
+        'iat': now,
+        'exp': now + lifetime,
+        'email': f'{uid}@example.com'
+    }
+    return jwt.encode(signer, payload).decode('utf-8')
+
+
+def main_check(iterations):
+    if os.environ.get('FIREBASE_AUTH_EMULATOR_HOST'):
+        sys.exit('Unset FIREBASE_AUTH_EMULATOR_HOST: emulator mode skips the signature check being timed')
+    key = make_key()
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(make_credential(key), options={'projectId': PROJECT_ID})
+    google.oauth2.id_token._fetch_certs = fetch_local_certs(key)
+    main.evict_token_cache()
+
+    token = mint_token(make_signer(key), 'student-1')
+    if not main.verify_firebase_token(token):
+        sys.exit('FAILED: the locally signed token did not verify')
+
+    uncached = min(timeit.repeat(lambda: main.verify_firebase_token(token, use_cache=False),
+                                 number=iterations, repeat=3)) / iterations
+    main.verify_firebase_token(token)
+    cached = min(timeit.repeat(lambda: main.verify_firebase_token(token),
+                               number=iterations, repeat=3)) / iterations
+    print(f'verify_id_token: {uncached * 1e6:.1f} us/call uncached (RS256 verified, certificate fetch '
+          f'excluded), {cached * 1e6:.1f} us/call cached')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    main_check(parser.parse_args().iterations)
@@ -1,44 +1,761 @@
+import asyncio
+import base64
+import codecs
+import contextvars
+import hashlib
 import json
 import logging
-from datetime import datetime
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
 from firebase_functions import https_fn
 
+# firebase_admin.firestore (google-cloud-firestore + gRPC) and firebase_admin.auth
+# are imported on first use, so routes such as /health never pay for them.
+# Run benchmarks/startup_benchmark.py to see the import-time profile.
+
 # Global variables for lazy initialization
 db = None
+async_db = None
 logger = None
+firestore_module = None
+_firestore_init_lock = threading.Lock()
+
+# /submitQuiz pipeline: "sync" uses the blocking client; "async" runs the
+# handler on a shared asyncio loop with the Firestore AsyncClient so
+# independent reads overlap. Async only wins on cold caches (it adds ~1 ms of
+# loop hand-off to the warm path), so it is opt-in. The loop runs on one
+# daemon thread for the instance's lifetime, because the AsyncClient's gRPC
+# channel is bound to its loop.
+SUBMIT_PIPELINE = os.environ.get('SUBMIT_PIPELINE', 'sync').lower()
+_async_loop = None
+_async_loop_lock = threading.Lock()
+
+# Logging: records are written to stdout as JSON lines, which Cloud Logging
+# ingests as structured entries. Per-question detail is only emitted for a
+# sampled fraction of requests; every submission gets one summary record.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_DETAIL_SAMPLE_RATE = float(os.environ.get('LOG_DETAIL_SAMPLE_RATE', '0.0'))
+# Per-request log state lives in a ContextVar so it follows a request onto
+# the asyncio loop thread (see run_async)
+_request_log = contextvars.ContextVar('request_log', default=None)
+
+# Per-instance latency metrics, exposed on /metrics in Prometheus text format.
+# Quantiles are computed over the most recent METRICS_RESERVOIR_SIZE samples.
+METRICS_RESERVOIR_SIZE = int(os.environ.get('METRICS_RESERVOIR_SIZE', '2048'))
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+KNOWN_ROUTES = ('/', '/health', '/metrics', '/submitQuiz', '/submitQuizBatch', '/importQuestions',
+                '/admin/stats', '/admin/users', '/attempts', '/recommendations', '/leaderboard',
+                '/leaderboard/me')
+INSTANCE_STARTED_AT = time.time()
+
+_metrics_lock = threading.Lock()
+_span_metrics = {}
+_request_counts = {}
+_cold_start_pending = True
+
+# Optional warm-up when an instance starts: "background" opens the Firestore
+# channel on a thread while the first request is served, "eager" does it
+# during module import (best combined with min instances).
+FIRESTORE_WARMUP = os.environ.get('FIRESTORE_WARMUP', 'off').lower()
+
+# Answer-key cache shared by requests served from the same warm instance.
+# Entries are keyed by quiz id and remember the quiz version they were built
+# from, so an edit that bumps `updatedAt` is picked up on the next submission.
+QUIZ_CACHE_MAX_ENTRIES = int(os.environ.get('QUIZ_CACHE_MAX_ENTRIES', '128'))
+QUIZ_CACHE_TTL_SECONDS = float(os.environ.get('QUIZ_CACHE_TTL_SECONDS', '300'))
+QUIZ_VERSION_FIELDS = ['updatedAt', 'version']
+
+_quiz_cache = OrderedDict()
+_quiz_cache_lock = threading.Lock()
+quiz_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+# Dual-write submissions to the legacy `reports` collection. Turn off once
+# every client reads `quiz-attempts`.
+WRITE_LEGACY_REPORTS = os.environ.get('WRITE_LEGACY_REPORTS', 'true').lower() in ('1', 'true', 'yes')
+
+# Attempt storage format. 3.0 stores per-question answers and a correctness
+# mask plus the id of an immutable, content-hashed `quiz-snapshots` document
+# holding the question text and options; 2.0 embeds the full
+# questionBreakdown in every attempt (and report). Readers accept both.
+ATTEMPT_REPORT_VERSION = os.environ.get('ATTEMPT_REPORT_VERSION', '3.0')
+QUIZ_SNAPSHOT_CACHE_MAX_ENTRIES = int(os.environ.get('QUIZ_SNAPSHOT_CACHE_MAX_ENTRIES', '256'))
+
+_quiz_snapshot_cache = OrderedDict()
+_persisted_snapshot_ids = set()
+_quiz_snapshot_lock = threading.Lock()
+
+# Verified ID token cache: decoded claims keyed by a SHA-256 of the token and
+# kept until the token's `exp`, so repeat requests skip JWT verification.
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', '1024'))
+TOKEN_CACHE_EXPIRY_SKEW_SECONDS = 30
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+token_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+# Batch submission limits (Firestore allows 500 writes per WriteBatch)
+FIRESTORE_MAX_BATCH_WRITES = 500
+MAX_BATCH_SUBMISSIONS = int(os.environ.get('MAX_BATCH_SUBMISSIONS', '200'))
+
+# Recommendation index: topic -> question ids for the `questions` bank, split
+# over TOPIC_INDEX_SHARDS `topic-index-shards` documents by a hash of the
+# question id, so even a huge topic is spread out and no shard nears the 1 MiB
+# document limit (64 shards hold about 2M ids). Imports add their questions
+# to the shards in the same WriteBatch; scripts/build_topic_index.py rebuilds
+# them. Each instance loads the shards once and afterwards re-reads only the
+# shards whose updatedAt moved, at most every TOPIC_INDEX_REFRESH_SECONDS.
+# Quizzes are indexed straight from the (small) `quizzes` collection the same
+# way; their updatedAt comes from client clocks, hence the skew allowance.
+# A full reload every TOPIC_INDEX_FULL_REFRESH_SECONDS drops deleted entries.
+TOPIC_INDEX_SHARDS = 64
+TOPIC_INDEX_REFRESH_SECONDS = float(os.environ.get('TOPIC_INDEX_REFRESH_SECONDS', '60'))
+TOPIC_INDEX_FULL_REFRESH_SECONDS = float(os.environ.get('TOPIC_INDEX_FULL_REFRESH_SECONDS', '3600'))
+TOPIC_INDEX_QUIZ_CLOCK_SKEW_SECONDS = 300
+RECOMMENDATION_TOPICS = 3
+RECOMMENDATION_MAX_TOPICS = 10
+RECOMMENDATION_QUESTIONS = 5
+RECOMMENDATION_MAX_QUESTIONS = 50
+RECOMMENDATION_QUIZZES = 3
+RECOMMENDATION_MAX_PROGRESS_DOCS = 500
+TOPIC_PROGRESS_FIELDS = ['topic', 'correct', 'total', 'attempts', 'lastSeenAt', 'lastQuizId']
+RECOMMENDED_QUESTION_FIELDS = ['question', 'options', 'topic']
+
+_topic_index = {
+    'questions': {}, 'shards': {}, 'quizzes': {}, 'quizzesByTopic': {},
+    'shardWatermark': None, 'quizWatermark': None, 'checkedAt': None, 'loadedAt': None
+}
+_topic_index_lock = threading.Lock()
+_topic_index_refresh_lock = threading.Lock()
+
+# Bulk question import: one WriteBatch holds a chunk of questions, their
+# topic-index-shards updates and the job progress update. Imports that run
+# past the time budget stop cleanly and can be resumed by re-sending the same
+# upload with its jobId.
+IMPORT_MIN_BATCH_QUESTIONS = 50
+IMPORT_MAX_BATCH_QUESTIONS = FIRESTORE_MAX_BATCH_WRITES - 1 - TOPIC_INDEX_SHARDS
+IMPORT_COMMIT_RETRIES = 5
+IMPORT_TIME_BUDGET_SECONDS = float(os.environ.get('IMPORT_TIME_BUDGET_SECONDS', '45'))
+IMPORT_MAX_REPORTED_ERRORS = 50
+IMPORT_READ_CHUNK_BYTES = 64 * 1024
+
+# Admin analytics: in the same WriteBatch as the attempt, every submission
+# increments one randomly chosen replica of the `admin-stats-shards` counters,
+# so hot quizzes are spread over ADMIN_STATS_SHARDS replicas. Per-quiz and per-topic counters
+# are split by key hash over ADMIN_STATS_PARTITIONS documents per replica
+# (global totals live in partition 0), which keeps each document to a fraction
+# of all quizzes and topics, well under the 1 MiB limit. /admin/stats sums
+# every shard document and keeps the result for ADMIN_STATS_CACHE_TTL_SECONDS.
+ADMIN_STATS_SHARDS = int(os.environ.get('ADMIN_STATS_SHARDS', '16'))
+ADMIN_STATS_PARTITIONS = int(os.environ.get('ADMIN_STATS_PARTITIONS', '8'))
+ADMIN_STATS_CACHE_TTL_SECONDS = float(os.environ.get('ADMIN_STATS_CACHE_TTL_SECONDS', '30'))
+ADMIN_USERS_PAGE_SIZE = 50
+ADMIN_USERS_MAX_PAGE_SIZE = 200
+ADMIN_USER_FIELDS = ['email', 'displayName', 'isAdmin', 'createdAt', 'lastLoginAt', 'stats']
+MASTERY_COUNTER_FIELDS = {
+    'Mastered': 'mastered',
+    'Needs Revision': 'needsRevision',
+    'Learn from Scratch': 'learnFromScratch'
+}
+
+_admin_stats_cache = {'data': None, 'expiresAt': 0.0}
+_admin_stats_lock = threading.Lock()
+
+# Attempt history: list pages carry only the fields a history row shows, the
+# full questionBreakdown is served by /attempts/{id}
+ATTEMPTS_PAGE_SIZE = 20
+ATTEMPTS_MAX_PAGE_SIZE = 100
+ATTEMPT_SUMMARY_FIELDS = [
+    'quizId', 'quizTitle', 'completedAt', 'score', 'totalQuestions', 'percentage',
+    'isPerfectScore', 'xpEarned', 'reportVersion'
+]
+REPORT_SUMMARY_FIELDS = [
+    'quizId', 'quizTitle', 'submittedAt', 'analysis.totalScore', 'analysis.totalQuestions',
+    'analysis.overallPercentage', 'reportVersion'
+]
+
+# Leaderboards: the top LEADERBOARD_SIZE users by XP (and per quiz, by best
+# score) are stored as snapshot documents in `leaderboards` and rebuilt with
+# one bounded query once older than LEADERBOARD_REFRESH_SECONDS. A user's own
+# rank is estimated from an XP histogram (users between ~50 geometrically
+# growing XP thresholds) stored the same way and rebuilt with count()
+# aggregations every LEADERBOARD_HISTOGRAM_REFRESH_SECONDS, so submissions do
+# no leaderboard work and ranking never scans `users`. All snapshots are
+# cached per instance for LEADERBOARD_CACHE_TTL_SECONDS and served with ETags.
+LEADERBOARD_SIZE = 100
+LEADERBOARD_BUCKET_XP = 10
+LEADERBOARD_BUCKET_GROWTH = 1.25
+LEADERBOARD_REFRESH_SECONDS = float(os.environ.get('LEADERBOARD_REFRESH_SECONDS', '300'))
+LEADERBOARD_HISTOGRAM_REFRESH_SECONDS = float(os.environ.get('LEADERBOARD_HISTOGRAM_REFRESH_SECONDS', '900'))
+LEADERBOARD_CACHE_TTL_SECONDS = float(os.environ.get('LEADERBOARD_CACHE_TTL_SECONDS', '60'))
+LEADERBOARD_CACHE_MAX_ENTRIES = 256
+LEADERBOARD_MAX_AGE_SECONDS = 60
+LEADERBOARD_USER_FIELDS = ['stats.totalXP', 'stats.totalQuizzesTaken']
+# A quiz board reads this many times LEADERBOARD_SIZE top attempts, then keeps
+# each user's best one
+QUIZ_LEADERBOARD_SCAN_FACTOR = 3
+
+_leaderboard_cache = OrderedDict()
+_leaderboard_lock = threading.Lock()
+
+def get_firestore_module():
+    """Import firebase_admin.firestore on first use"""
+    global firestore_module
+    if firestore_module is None:
+        from firebase_admin import firestore
+        firestore_module = firestore
+    return firestore_module
+
+def initialize_firebase_app():
+    """Initialize the default Firebase app once (call with _firestore_init_lock held)"""
+    if not firebase_admin._apps:
+        # This will automatically use the project configured in the environment.
+        firebase_admin.initialize_app()
+        project_id = firebase_admin.get_app().project_id
+        get_logger().info(f"✅ Initialized Firebase App for project: {project_id}")
 
 def get_firestore_client():
     """Get Firestore client with lazy initialization"""
     global db
     if db is None:
-        if not firebase_admin._apps:
-            # This will automatically use the project configured in the environment.
-            firebase_admin.initialize_app()
-            project_id = firebase_admin.get_app().project_id
-            get_logger().info(f"✅ Initialized Firebase App for project: {project_id}")
-        db = firestore.client()
+        with _firestore_init_lock:
+            if db is None:
+                initialize_firebase_app()
+                db = get_firestore_module().client()
     return db
 
+def get_async_firestore_client():
+    """Get the Firestore AsyncClient used by the async pipeline (lazy)"""
+    global async_db
+    if async_db is None:
+        with _firestore_init_lock:
+            if async_db is None:
+                initialize_firebase_app()
+                from firebase_admin import firestore_async
+                async_db = firestore_async.client()
+    return async_db
+
+def get_async_loop():
+    """Return the instance's asyncio loop, starting its daemon thread on first use"""
+    global _async_loop
+    if _async_loop is None:
+        with _async_loop_lock:
+            if _async_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-pipeline', daemon=True).start()
+                _async_loop = loop
+    return _async_loop
+
+def run_async(coroutine):
+    """Run a coroutine on the instance loop and block until it finishes.
+
+    The caller's request log context is carried over, so spans and
+    annotations recorded by the coroutine land in the same summary record.
+    """
+    request_log = _request_log.get()
+
+    async def with_request_log():
+        _request_log.set(request_log)
+        return await coroutine
+
+    return asyncio.run_coroutine_threadsafe(with_request_log(), get_async_loop()).result()
+
+def warm_up_firestore():
+    """Create the Firestore client and open its channel with one small read"""
+    try:
+        started = time.monotonic()
+        client = get_firestore_client()
+        client.collection('quizzes').document('_warmup').get()
+        get_logger().info(f"Firestore warm-up finished in {(time.monotonic() - started) * 1000:.0f} ms")
+    except Exception as e:
+        get_logger().warning(f"Firestore warm-up failed: {str(e)}")
+
+class StructuredFormatter(logging.Formatter):
+    """Render log records as single-line JSON for Cloud Logging"""
+
+    def format(self, record):
+        entry = {
+            'severity': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
 def get_logger():
     """Get logger with lazy initialization"""
     global logger
     if logger is None:
-        logging.basicConfig(level=logging.INFO)
         logger = logging.getLogger(__name__)
+        if not logger.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(StructuredFormatter())
+            logger.addHandler(handler)
+            logger.propagate = False
+        logger.setLevel(LOG_LEVEL)
     return logger
 
-def verify_firebase_token(id_token):
-    """Verify Firebase ID token and return user info"""
+def begin_request_log(route, cold_start=False):
+    """Start per-request log context and decide whether detail is sampled"""
+    _request_log.set({
+        'sampled': LOG_DETAIL_SAMPLE_RATE > 0 and random.random() < LOG_DETAIL_SAMPLE_RATE,
+        'fields': {'route': route, 'coldStart': cold_start},
+        'timings': {},
+        'started': time.perf_counter()
+    })
+
+def annotate_request(**fields):
+    """Attach fields to the current request's summary record"""
+    request_log = _request_log.get()
+    if request_log is not None:
+        request_log['fields'].update(fields)
+
+def log_detail(message, *args, **fields):
+    """Log verbose detail for sampled requests only; args are formatted lazily"""
+    request_log = _request_log.get()
+    if request_log is not None and request_log['sampled']:
+        get_logger().info(message, *args, extra={'fields': {'sampled': True, **fields}})
+
+def log_request_summary(message, level=logging.INFO, **fields):
+    """Emit the single summary record for the current request"""
+    log = get_logger()
+    if log.isEnabledFor(level):
+        request_log = _request_log.get() or {}
+        summary = dict(request_log.get('fields') or {})
+        timings = dict(request_log.get('timings') or {})
+        started = request_log.get('started')
+        if started is not None:
+            timings['totalMs'] = round((time.perf_counter() - started) * 1000, 2)
+        summary['timings'] = timings
+        summary.update(fields)
+        log.log(level, message, extra={'fields': summary})
+
+def record_span(name, seconds):
+    """Record one span duration for the current route and request summary"""
+    request_log = _request_log.get()
+    route = request_log['fields'].get('route', 'none') if request_log is not None else 'none'
+    with _metrics_lock:
+        metric = _span_metrics.get((name, route))
+        if metric is None:
+            metric = {'count': 0, 'sum': 0.0, 'samples': deque(maxlen=METRICS_RESERVOIR_SIZE)}
+            _span_metrics[(name, route)] = metric
+        metric['count'] += 1
+        metric['sum'] += seconds
+        metric['samples'].append(seconds)
+
+    timings = request_log['timings'] if request_log is not None else None
+    if timings is not None:
+        key = f'{name}Ms'
+        timings[key] = round(timings.get(key, 0) + seconds * 1000, 2)
+
+@contextmanager
+def timed_span(name):
+    """Time a block of work as a named span (see record_span)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+def consume_cold_start():
+    """Return True for the first request served by this instance only"""
+    global _cold_start_pending
+    with _metrics_lock:
+        cold_start, _cold_start_pending = _cold_start_pending, False
+    return cold_start
+
+def record_request(route, status, cold_start):
+    """Count a finished request by route and status"""
+    with _metrics_lock:
+        key = (route, str(status), cold_start)
+        _request_counts[key] = _request_counts.get(key, 0) + 1
+
+def get_quantile(sorted_samples, quantile):
+    """Nearest-rank quantile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(quantile * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+def render_prometheus_metrics():
+    """Render instance metrics in the Prometheus text exposition format"""
+    with _metrics_lock:
+        spans = {key: (metric['count'], metric['sum'], sorted(metric['samples']))
+                 for key, metric in _span_metrics.items()}
+        request_counts = dict(_request_counts)
+
+    lines = [
+        '# HELP knowmap_span_duration_seconds Duration of instrumented request steps.',
+        '# TYPE knowmap_span_duration_seconds summary'
+    ]
+    for (name, route), (count, total, samples) in sorted(spans.items()):
+        labels = f'span="{name}",route="{route}"'
+        for quantile in METRICS_QUANTILES:
+            lines.append(f'knowmap_span_duration_seconds{{{labels},quantile="{quantile}"}} '
+                         f'{get_quantile(samples, quantile):.6f}')
+        lines.append(f'knowmap_span_duration_seconds_sum{{{labels}}} {total:.6f}')
+        lines.append(f'knowmap_span_duration_seconds_count{{{labels}}} {count}')
+
+    lines += [
+        '# HELP knowmap_requests_total Requests handled by this instance.',
+        '# TYPE knowmap_requests_total counter'
+    ]
+    for (route, status, cold_start), count in sorted(request_counts.items()):
+        lines.append(f'knowmap_requests_total{{route="{route}",status="{status}",'
+                     f'cold_start="{str(cold_start).lower()}"}} {count}')
+
+    lines += [
+        '# HELP knowmap_cache_lookups_total Instance cache lookups by result.',
+        '# TYPE knowmap_cache_lookups_total counter'
+    ]
+    cache_stats = {'quiz': get_quiz_cache_stats(), 'token': get_token_cache_stats()}
+    for cache, stats in cache_stats.items():
+        lines.append(f'knowmap_cache_lookups_total{{cache="{cache}",result="hit"}} {stats["hits"]}')
+        lines.append(f'knowmap_cache_lookups_total{{cache="{cache}",result="miss"}} {stats["misses"]}')
+    lines += [
+        '# HELP knowmap_cache_hit_ratio Instance cache hit ratio since start.',
+        '# TYPE knowmap_cache_hit_ratio gauge'
+    ]
+    for cache, stats in cache_stats.items():
+        lines.append(f'knowmap_cache_hit_ratio{{cache="{cache}"}} {stats["hitRatio"]}')
+    lines += [
+        '# HELP knowmap_cache_entries Entries currently held by instance caches.',
+        '# TYPE knowmap_cache_entries gauge'
+    ]
+    for cache, stats in cache_stats.items():
+        lines.append(f'knowmap_cache_entries{{cache="{cache}"}} {stats["size"]}')
+
+    lines += [
+        '# HELP knowmap_instance_start_time_seconds Unix time this instance loaded main.py.',
+        '# TYPE knowmap_instance_start_time_seconds gauge',
+        f'knowmap_instance_start_time_seconds {INSTANCE_STARTED_AT:.3f}',
+        '# HELP knowmap_instance_uptime_seconds Seconds since this instance loaded main.py.',
+        '# TYPE knowmap_instance_uptime_seconds gauge',
+        f'knowmap_instance_uptime_seconds {time.time() - INSTANCE_STARTED_AT:.3f}'
+    ]
+    return '\n'.join(lines) + '\n'
+
+def get_token_cache_key(id_token):
+    """Hash a token so raw credentials are never kept in memory as dict keys"""
+    return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+def verify_firebase_token(id_token, use_cache=True, check_revoked=False):
+    """Verify Firebase ID token and return user info
+
+    Verified claims are cached until the token expires. Revocation-sensitive
+    routes should pass use_cache=False (check_revoked=True always bypasses
+    the cache, since revocation can only be seen on a live check).
+    """
+    use_cache = use_cache and not check_revoked
+    cache_key = get_token_cache_key(id_token) if use_cache else None
+
+    if use_cache:
+        with _token_cache_lock:
+            entry = _token_cache.get(cache_key)
+            if entry is not None:
+                if entry['expiresAt'] > time.time():
+                    token_cache_stats['hits'] += 1
+                    _token_cache.move_to_end(cache_key)
+                    return dict(entry['claims'])
+                del _token_cache[cache_key]
+            token_cache_stats['misses'] += 1
+
     try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token
+        from firebase_admin import auth
+        decoded_token = auth.verify_id_token(id_token, check_revoked=check_revoked)
     except Exception as e:
         logger = get_logger()
         logger.error(f"Token verification failed: {str(e)}")
         return None
 
+    expires_at = decoded_token.get('exp', 0) - TOKEN_CACHE_EXPIRY_SKEW_SECONDS
+    if use_cache and expires_at > time.time():
+        with _token_cache_lock:
+            _token_cache[cache_key] = {'claims': dict(decoded_token), 'expiresAt': expires_at}
+            _token_cache.move_to_end(cache_key)
+            while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+                _token_cache.popitem(last=False)
+                token_cache_stats['evictions'] += 1
+    return decoded_token
+
+def evict_token_cache(id_token=None, uid=None):
+    """Drop cached claims for one token, every token of a uid, or everything"""
+    with _token_cache_lock:
+        if id_token is not None:
+            _token_cache.pop(get_token_cache_key(id_token), None)
+        elif uid is not None:
+            for cache_key in [key for key, entry in _token_cache.items() if entry['claims'].get('uid') == uid]:
+                del _token_cache[cache_key]
+        else:
+            _token_cache.clear()
+
+def get_token_cache_stats():
+    """Return hit/miss counters and the current size of the token cache"""
+    with _token_cache_lock:
+        lookups = token_cache_stats['hits'] + token_cache_stats['misses']
+        return {
+            **token_cache_stats,
+            'size': len(_token_cache),
+            'maxEntries': TOKEN_CACHE_MAX_ENTRIES,
+            'hitRatio': round(token_cache_stats['hits'] / lookups, 3) if lookups else 0.0
+        }
+
+def get_quiz_version(quiz_data, update_time=None):
+    """Return the version marker of a quiz document.
+
+    Prefers the updatedAt/version fields; quizzes created before those were
+    written fall back to the snapshot's update_time, which Firestore returns
+    even for field-masked gets. Edits to a legacy questions subcollection do
+    not touch update_time, so those show up once QUIZ_CACHE_TTL_SECONDS ends.
+    """
+    for field in QUIZ_VERSION_FIELDS:
+        value = quiz_data.get(field)
+        if value is not None:
+            return value
+    return update_time
+
+def normalize_quiz_questions(quiz_questions):
+    """Strip question dicts down to the fields used for grading and review"""
+    normalized = []
+    for question in quiz_questions:
+        entry = {key: question[key] for key in (
+            'id', 'question', 'text', 'options', 'correct', 'correctAnswer', 'topics', 'topic'
+        ) if key in question}
+        normalized.append(entry)
+    return normalized
+
+def build_quiz_answer_key(quiz_id, quiz_data, quiz_questions, update_time=None):
+    """Compile a quiz document and its questions into a cacheable answer key"""
+    title = quiz_data.get('title', 'Unknown Quiz')
+    plan = compile_quiz(quiz_questions)
+    snapshot_id, snapshot = build_quiz_snapshot(quiz_id, title, plan)
+    return {
+        'quizId': quiz_id,
+        'version': get_quiz_version(quiz_data, update_time),
+        'title': title,
+        'difficulty': quiz_data.get('difficulty', 'medium'),
+        'questions': normalize_quiz_questions(quiz_questions),
+        'plan': plan,
+        'snapshotId': snapshot_id,
+        'snapshot': snapshot,
+        'cachedAt': time.monotonic()
+    }
+
+def load_quiz_answer_key(db, quiz_id):
+    """Read a quiz and its questions from Firestore (no caching)"""
+    quiz_ref = db.collection('quizzes').document(quiz_id)
+    quiz_doc = quiz_ref.get()
+
+    if not quiz_doc.exists:
+        return None
+
+    quiz_data = quiz_doc.to_dict()
+
+    # Try to get questions from the main document first (this is the new approach)
+    quiz_questions = list(quiz_data.get('questions', []))
+    log_detail("Found %d questions in main document", len(quiz_questions), quizId=quiz_id)
+
+    # If no questions in main document, try the subcollection (old approach)
+    if not quiz_questions:
+        log_detail("No questions in main document, trying subcollection", quizId=quiz_id)
+        questions_docs = quiz_ref.collection('questions').get()
+        for doc in questions_docs:
+            quiz_questions.append(doc.to_dict())
+        log_detail("Found %d questions in subcollection", len(quiz_questions), quizId=quiz_id)
+
+    return build_quiz_answer_key(quiz_id, quiz_data, quiz_questions, quiz_doc.update_time)
+
+async def async_load_quiz_answer_key(db, quiz_id):
+    """AsyncClient version of load_quiz_answer_key"""
+    quiz_ref = db.collection('quizzes').document(quiz_id)
+    quiz_doc = await quiz_ref.get()
+
+    if not quiz_doc.exists:
+        return None
+
+    quiz_data = quiz_doc.to_dict()
+    quiz_questions = list(quiz_data.get('questions', []))
+    # Only legacy quizzes keep their questions in the subcollection
+    if not quiz_questions:
+        quiz_questions = [doc.to_dict() for doc in await quiz_ref.collection('questions').get()]
+        log_detail("Found %d questions in subcollection", len(quiz_questions), quizId=quiz_id)
+
+    return build_quiz_answer_key(quiz_id, quiz_data, quiz_questions, quiz_doc.update_time)
+
+def get_cached_quiz_entry(quiz_id):
+    """Return the cached answer key if it is younger than QUIZ_CACHE_TTL_SECONDS"""
+    with _quiz_cache_lock:
+        entry = _quiz_cache.get(quiz_id)
+    if entry is not None and time.monotonic() - entry['cachedAt'] < QUIZ_CACHE_TTL_SECONDS:
+        return entry
+    return None
+
+def check_cached_quiz(quiz_id, entry, version_doc):
+    """Validate a cached entry against a version-fields read: 'hit', 'missing' or 'stale'"""
+    if not version_doc.exists:
+        invalidate_quiz_cache(quiz_id)
+        return 'missing'
+    if entry['version'] is not None and get_quiz_version(version_doc.to_dict() or {}, version_doc.update_time) == entry['version']:
+        with _quiz_cache_lock:
+            quiz_cache_stats['hits'] += 1
+            if quiz_id in _quiz_cache:
+                _quiz_cache.move_to_end(quiz_id)
+        annotate_request(quizCacheHit=True)
+        return 'hit'
+    return 'stale'
+
+def store_quiz_answer_key(quiz_id, entry):
+    """Count a cache miss and cache a freshly loaded answer key (None if the quiz is gone)"""
+    with _quiz_cache_lock:
+        quiz_cache_stats['misses'] += 1
+    annotate_request(quizCacheHit=False)
+
+    if entry is None:
+        invalidate_quiz_cache(quiz_id)
+        return None
+
+    # Quizzes without a version marker cannot be validated, so never cache them
+    if entry['version'] is not None and entry['questions']:
+        with _quiz_cache_lock:
+            _quiz_cache[quiz_id] = entry
+            _quiz_cache.move_to_end(quiz_id)
+            while len(_quiz_cache) > QUIZ_CACHE_MAX_ENTRIES:
+                _quiz_cache.popitem(last=False)
+                quiz_cache_stats['evictions'] += 1
+    return entry
+
+def get_quiz_answer_key(db, quiz_id):
+    """Return the answer key for a quiz, served from the instance cache when fresh.
+
+    A cached entry is reused only if it is younger than QUIZ_CACHE_TTL_SECONDS
+    and its version still matches the live quiz document. The version check
+    reads just the version fields, which skips the questions array and the
+    legacy subcollection. Returns None if the quiz does not exist.
+    """
+    entry = get_cached_quiz_entry(quiz_id)
+    if entry is not None:
+        version_doc = db.collection('quizzes').document(quiz_id).get(field_paths=QUIZ_VERSION_FIELDS)
+        state = check_cached_quiz(quiz_id, entry, version_doc)
+        if state == 'hit':
+            return entry
+        if state == 'missing':
+            return None
+    return store_quiz_answer_key(quiz_id, load_quiz_answer_key(db, quiz_id))
+
+async def async_get_quiz_answer_key(db, quiz_id):
+    """AsyncClient version of get_quiz_answer_key, sharing the same cache"""
+    entry = get_cached_quiz_entry(quiz_id)
+    if entry is not None:
+        version_doc = await db.collection('quizzes').document(quiz_id).get(field_paths=QUIZ_VERSION_FIELDS)
+        state = check_cached_quiz(quiz_id, entry, version_doc)
+        if state == 'hit':
+            return entry
+        if state == 'missing':
+            return None
+    return store_quiz_answer_key(quiz_id, await async_load_quiz_answer_key(db, quiz_id))
+
+def invalidate_quiz_cache(quiz_id=None):
+    """Drop one quiz (or every quiz when quiz_id is None) from the answer-key cache"""
+    with _quiz_cache_lock:
+        if quiz_id is None:
+            _quiz_cache.clear()
+        else:
+            _quiz_cache.pop(quiz_id, None)
+
+def build_quiz_snapshot(quiz_id, title, plan):
+    """Return (snapshot_id, data) for the review content of a compiled quiz.
+
+    The id is a SHA-256 of the canonical JSON content, so a snapshot never
+    changes once written and an edited quiz gets a new one. Version 3
+    attempts reference it instead of embedding question text and options.
+    """
+    data = {'quizId': quiz_id, 'title': title, 'questions': plan['display']}
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest(), data
+
+def get_quiz_snapshot(db, snapshot_id):
+    """Read a quiz snapshot, keeping it in an LRU since snapshots are immutable"""
+    with _quiz_snapshot_lock:
+        snapshot = _quiz_snapshot_cache.get(snapshot_id)
+        if snapshot is not None:
+            _quiz_snapshot_cache.move_to_end(snapshot_id)
+            return snapshot
+
+    snapshot_doc = db.collection('quiz-snapshots').document(snapshot_id).get()
+    if not snapshot_doc.exists:
+        return None
+    snapshot = snapshot_doc.to_dict()
+    with _quiz_snapshot_lock:
+        _quiz_snapshot_cache[snapshot_id] = snapshot
+        _persisted_snapshot_ids.add(snapshot_id)
+        while len(_quiz_snapshot_cache) > QUIZ_SNAPSHOT_CACHE_MAX_ENTRIES:
+            _quiz_snapshot_cache.popitem(last=False)
+    return snapshot
+
+def build_quiz_snapshot_writes(db, quiz_keys):
+    """Return (ref, data, merge) writes for snapshots this instance has not yet stored.
+
+    Rewriting a snapshot is harmless (same id, same content), so this only
+    avoids repeating the write once per instance.
+    """
+    if ATTEMPT_REPORT_VERSION != '3.0':
+        return []
+    with _quiz_snapshot_lock:
+        pending = {quiz_key['snapshotId']: quiz_key['snapshot'] for quiz_key in quiz_keys
+                   if quiz_key['snapshotId'] not in _persisted_snapshot_ids}
+    return [(db.collection('quiz-snapshots').document(snapshot_id), snapshot, False)
+            for snapshot_id, snapshot in pending.items()]
+
+def mark_quiz_snapshots_persisted(snapshot_writes):
+    """Remember snapshots whose write has been committed"""
+    with _quiz_snapshot_lock:
+        _persisted_snapshot_ids.update(ref.id for ref, _, _ in snapshot_writes)
+
+def rehydrate_question_breakdown(snapshot, answers, correct_mask, by_question_id=False):
+    """Rebuild a v2-style questionBreakdown from a snapshot and the stored vectors.
+
+    `answers` maps snapshot index to the submitted answer; `correct_mask`
+    holds one '1'/'0' per question. Version 3 attempts are keyed strictly by
+    index, since a question id can look like another question's index. Legacy
+    reports store the raw submission, so with by_question_id=True an answer
+    missing under the index is looked up by question id, as grading does.
+    """
+    breakdown = []
+    for i, question in enumerate(snapshot.get('questions', [])):
+        user_answer = answers.get(str(i))
+        if user_answer is None and by_question_id:
+            user_answer = answers.get(question.get('questionId'))
+        breakdown.append({
+            'questionId': question.get('questionId'),
+            'questionText': question.get('questionText'),
+            'topic': question.get('topic'),
+            'userAnswer': user_answer,
+            'correctAnswer': question.get('correctAnswer'),
+            'isCorrect': i < len(correct_mask) and correct_mask[i] == '1',
+            'options': question.get('options', [])
+        })
+    return breakdown
+
+def get_quiz_cache_stats():
+    """Return hit/miss counters and the current size of the answer-key cache"""
+    with _quiz_cache_lock:
+        lookups = quiz_cache_stats['hits'] + quiz_cache_stats['misses']
+        return {
+            **quiz_cache_stats,
+            'size': len(_quiz_cache),
+            'maxEntries': QUIZ_CACHE_MAX_ENTRIES,
+            'hitRatio': round(quiz_cache_stats['hits'] / lookups, 3) if lookups else 0.0
+        }
+
 def classify_topic_performance(correct, total, threshold_mastered=0.8, threshold_needs_revision=0.5):
     
     """Classify topic performance based on score percentage"""
@@ -54,126 +771,175 @@ def classify_topic_performance(correct, total, threshold_mastered=0.8, threshold
     else:
         return "Learn from Scratch"
 
-def analyze_quiz_performance(user_answers, quiz_questions):
-    """Analyze user performance and generate detailed topic-wise feedback"""
+def normalize_answer(value):
+    """Pre-compute the comparison forms of an answer value.
+
+    Returns (int_value, str_value): int_value is the int() conversion used for
+    numeric comparison (booleans are kept as-is) or None when the value cannot
+    be converted, str_value is the lowercase string used as a fallback.
+    """
     try:
-        # Get logger for detailed logging
-        logger = get_logger()
-        logger.info(f"Analyzing quiz performance with {len(quiz_questions)} questions")
-        logger.info(f"User answers: {user_answers}")
-        
-        # Topic tracking
-        topic_stats = {}
-        total_score = 0
-        total_questions = len(quiz_questions)
-        
-        # Question breakdown tracking for detailed review
-        question_breakdown = []
-        
-        # Process each question
-        for i, question in enumerate(quiz_questions):
-            # Log the question structure for debugging
-            logger.info(f"Processing question {i}: {question.get('question', 'Unknown question')}")
-            
-            # Get the user's answer for this question (could be indexed by position or question ID)
-            # Try different formats for backward compatibility
+        int_value = int(value) if not isinstance(value, bool) else value
+    except (ValueError, TypeError):
+        int_value = None
+    return (int_value, str(value).lower())
+
+def answers_match(user_answer, answer_key):
+    """Compare a raw user answer against a normalized answer key"""
+    if user_answer is None or answer_key is None:
+        return False
+    correct_int, correct_str = answer_key
+    if correct_int is not None:
+        try:
+            user_int = int(user_answer) if not isinstance(user_answer, bool) else user_answer
+            return user_int == correct_int
+        except (ValueError, TypeError):
+            pass
+    return str(user_answer).lower() == correct_str
+
+def get_question_topics(question):
+    """Topics of a question - it may have a single topic string or an array of topics"""
+    if 'topics' in question:
+        topics_value = question.get('topics')
+    elif 'topic' in question:
+        topics_value = question.get('topic')
+    else:
+        topics_value = ['General']
+    return topics_value if isinstance(topics_value, list) else [topics_value]
+
+def compile_quiz(quiz_questions):
+    """Compile quiz questions into a grading plan.
+
+    All per-question field probing (correct vs correctAnswer, topics vs topic,
+    answer normalization) happens here once per quiz version, so grading a
+    submission is a single pass over parallel arrays. Topics are interned into
+    a small integer table in order of first appearance.
+    """
+    topic_names = []
+    topic_index = {}
+    answer_keys = []
+    question_topics = []
+    index_keys = []
+    question_ids = []
+    display = []
+
+    for i, question in enumerate(quiz_questions):
+        # Check multiple fields for the correct answer (for compatibility)
+        correct_answer = None
+        if 'correct' in question:
+            correct_answer = question.get('correct')
+        elif 'correctAnswer' in question:
+            correct_answer = question.get('correctAnswer')
+
+        topics = get_question_topics(question)
+
+        topic_ids = []
+        for topic in topics:
+            if topic not in topic_index:
+                topic_index[topic] = len(topic_names)
+                topic_names.append(topic)
+            topic_ids.append(topic_index[topic])
+
+        answer_keys.append(normalize_answer(correct_answer) if correct_answer is not None else None)
+        question_topics.append(tuple(topic_ids))
+        index_keys.append(str(i))
+        question_ids.append(question.get('id'))
+        display.append({
+            'questionId': question.get('id', f'q_{i}'),
+            'questionText': question.get('question', question.get('text', 'Unknown question')),
+            'topic': topics[0] if topics else 'General',  # Use first topic for display
+            'correctAnswer': correct_answer,
+            'options': question.get('options', [])  # Include full options array
+        })
+
+    # Question counts per topic do not depend on the answers, so fix them now
+    topic_totals = [0] * len(topic_names)
+    for topic_ids in question_topics:
+        for topic_id in topic_ids:
+            topic_totals[topic_id] += 1
+
+    return {
+        'questionCount': len(quiz_questions),
+        'answerKeys': answer_keys,
+        'questionTopics': question_topics,
+        'indexKeys': index_keys,
+        'questionIds': question_ids,
+        'topicNames': topic_names,
+        'topicTotals': topic_totals,
+        'display': display
+    }
+
+def grade_compiled_quiz(user_answers, plan):
+    """Grade a submission against a plan built by compile_quiz"""
+    topic_correct = [0] * len(plan['topicNames'])
+    total_score = 0
+    question_breakdown = []
+
+    for index_key, question_id, answer_key, topic_ids, meta in zip(
+        plan['indexKeys'], plan['questionIds'], plan['answerKeys'],
+        plan['questionTopics'], plan['display']
+    ):
+        # Answers may be indexed by position or by question ID (backward compatibility)
+        if index_key in user_answers:
+            user_answer = user_answers.get(index_key)
+        elif question_id and question_id in user_answers:
+            user_answer = user_answers.get(question_id)
+        else:
             user_answer = None
-            if str(i) in user_answers:
-                user_answer = user_answers.get(str(i))
-                logger.info(f"Found user answer using numeric index {i}: {user_answer}")
-            elif question.get('id') and question.get('id') in user_answers:
-                user_answer = user_answers.get(question.get('id'))
-                logger.info(f"Found user answer using question id {question.get('id')}: {user_answer}")
-            
-            # Check multiple fields for the correct answer (for compatibility)
-            correct_answer = None
-            if 'correct' in question:
-                correct_answer = question.get('correct')
-                logger.info(f"Found correct answer in 'correct' field: {correct_answer}")
-            elif 'correctAnswer' in question:
-                correct_answer = question.get('correctAnswer')
-                logger.info(f"Found correct answer in 'correctAnswer' field: {correct_answer}")
-            else:
-                logger.warning(f"No correct answer field found in question {i}")
-            
-            # Get topics - could be a single topic string or an array of topics
-            topics_value = None
-            if 'topics' in question:
-                topics_value = question.get('topics')
-                logger.info(f"Found topics in 'topics' field: {topics_value}")
-            elif 'topic' in question:
-                topics_value = question.get('topic')
-                logger.info(f"Found topics in 'topic' field: {topics_value}")
-            else:
-                topics_value = ['General']
-                logger.info("No topics field found, using default 'General'")
-                
-            topics = topics_value if isinstance(topics_value, list) else [topics_value]
-            
-            # Determine if answer is correct - Convert to same type first
-            is_correct = False
-            if user_answer is not None and correct_answer is not None:
-                # Try to convert both to integers for comparison (handles string vs int issues)
-                try:
-                    user_answer_int = int(user_answer) if not isinstance(user_answer, bool) else user_answer
-                    correct_answer_int = int(correct_answer) if not isinstance(correct_answer, bool) else correct_answer
-                    is_correct = user_answer_int == correct_answer_int
-                    logger.info(f"Comparing answer values (as int): {user_answer_int} == {correct_answer_int} => {is_correct}")
-                except (ValueError, TypeError):
-                    # If conversion fails, compare as strings
-                    is_correct = str(user_answer).lower() == str(correct_answer).lower()
-                    logger.info(f"Comparing answer values (as string): {user_answer} == {correct_answer} => {is_correct}")
-            
-            if is_correct:
-                total_score += 1
-                logger.info(f"Question {i}: CORRECT ✅")
-            
-            # Track performance per topic
-            for topic in topics:
-                if topic not in topic_stats:
-                    topic_stats[topic] = {'correct': 0, 'total': 0}
-                
-                topic_stats[topic]['total'] += 1
-                if is_correct:
-                    topic_stats[topic]['correct'] += 1
-            
-            # Build question breakdown for detailed review
-            question_breakdown.append({
-                'questionId': question.get('id', f'q_{i}'),
-                'questionText': question.get('question', question.get('text', 'Unknown question')),
-                'topic': topics[0] if topics else 'General',  # Use first topic for display
-                'userAnswer': user_answer,
-                'correctAnswer': correct_answer,
-                'isCorrect': is_correct,
-                'options': question.get('options', [])  # Include full options array
-            })
-        
-        # Classify topics
-        classified_topics = {}
-        for topic, stats in topic_stats.items():
-            classification = classify_topic_performance(
-                stats['correct'], 
-                stats['total']
-            )
-            classified_topics[topic] = {
-                'classification': classification,
-                'correct': stats['correct'],
-                'total': stats['total'],
-                'percentage': round((stats['correct'] / stats['total']) * 100, 1)
-            }
-        
-        # Overall performance
-        overall_percentage = round((total_score / total_questions) * 100, 1)
-        
-        return {
-            'totalScore': total_score,
-            'totalQuestions': total_questions,
-            'overallPercentage': overall_percentage,
-            'classifiedTopics': classified_topics,
-            'questionBreakdown': question_breakdown,
-            'detailedAnswers': []  # Could be expanded for detailed answer analysis
+
+        is_correct = answers_match(user_answer, answer_key)
+        if is_correct:
+            total_score += 1
+            for topic_id in topic_ids:
+                topic_correct[topic_id] += 1
+
+        question_breakdown.append({
+            'questionId': meta['questionId'],
+            'questionText': meta['questionText'],
+            'topic': meta['topic'],
+            'userAnswer': user_answer,
+            'correctAnswer': meta['correctAnswer'],
+            'isCorrect': is_correct,
+            'options': meta['options']
+        })
+
+    # Classify topics
+    classified_topics = {}
+    for topic, correct, total in zip(plan['topicNames'], topic_correct, plan['topicTotals']):
+        classified_topics[topic] = {
+            'classification': classify_topic_performance(correct, total),
+            'correct': correct,
+            'total': total,
+            'percentage': round((correct / total) * 100, 1)
         }
-        
+
+    # Overall performance
+    total_questions = plan['questionCount']
+    overall_percentage = round((total_score / total_questions) * 100, 1)
+
+    return {
+        'totalScore': total_score,
+        'totalQuestions': total_questions,
+        'overallPercentage': overall_percentage,
+        'classifiedTopics': classified_topics,
+        'questionBreakdown': question_breakdown,
+        'detailedAnswers': []  # Could be expanded for detailed answer analysis
+    }
+
+def analyze_quiz_performance(user_answers, quiz_questions=None, plan=None):
+    """Analyze user performance and generate detailed topic-wise feedback
+
+    Pass a precompiled `plan` (see compile_quiz) to skip compilation; the
+    answer-key cache keeps one per quiz version.
+    """
+    try:
+        if plan is None:
+            plan = compile_quiz(quiz_questions)
+        log_detail("Analyzing quiz performance with %d questions", plan['questionCount'],
+                   userAnswers=user_answers)
+        with timed_span('grade'):
+            return grade_compiled_quiz(user_answers, plan)
+
     except Exception as e:
         logger = get_logger()
         logger.error(f"Error in analyze_quiz_performance: {str(e)}")
@@ -185,13 +951,31 @@ def analyze_quiz_performance(user_answers, quiz_questions):
 @https_fn.on_request()
 def know_map_api(req):
     """Firebase Cloud Function entry point"""
+    route = get_route_label(req.path)
+    cold_start = consume_cold_start()
+    begin_request_log(route, cold_start=cold_start)
+    with timed_span('request'):
+        response = route_request(req)
+    record_request(route, response[1], cold_start)
+    return response
+
+def get_route_label(path):
+    """Bounded route label for logs and metrics (ids in paths are collapsed)"""
+    if path in KNOWN_ROUTES:
+        return path
+    if path.startswith('/attempts/'):
+        return '/attempts/{id}'
+    return 'other'
+
+def route_request(req):
+    """Dispatch a request to its route handler"""
     try:
         # Handle CORS preflight requests
         if req.method == 'OPTIONS':
             headers = {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match',
                 'Access-Control-Max-Age': '3600'
             }
             return ('', 204, headers)
@@ -200,7 +984,7 @@ def know_map_api(req):
         headers = {
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+            'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match',
             'Content-Type': 'application/json'
         }
         
@@ -209,7 +993,9 @@ def know_map_api(req):
             response_data = {
                 'message': 'Know-Map API is running',
                 'version': '1.0',
-                'endpoints': ['/submitQuiz', '/health']
+                'endpoints': ['/submitQuiz', '/submitQuizBatch', '/attempts', '/attempts/{id}',
+                              '/recommendations', '/leaderboard', '/leaderboard/me', '/importQuestions',
+                              '/admin/stats', '/admin/users', '/health', '/metrics']
             }
             return (json.dumps(response_data), 200, headers)
         
@@ -217,13 +1003,51 @@ def know_map_api(req):
             response_data = {
                 'status': 'healthy',
                 'timestamp': datetime.utcnow().isoformat(),
-                'service': 'know-map-api'
+                'service': 'know-map-api',
+                'quizCache': get_quiz_cache_stats(),
+                'tokenCache': get_token_cache_stats(),
+                'topicIndex': get_topic_index_stats()
             }
             return (json.dumps(response_data), 200, headers)
         
+        elif req.path == '/metrics' and req.method == 'GET':
+            metrics_headers = {
+                **headers,
+                'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+                'Cache-Control': 'no-store'
+            }
+            return (render_prometheus_metrics(), 200, metrics_headers)
+        
         elif req.path == '/submitQuiz' and req.method == 'POST':
             return handle_submit_quiz(req, headers)
         
+        elif req.path == '/submitQuizBatch' and req.method == 'POST':
+            return handle_submit_quiz_batch(req, headers)
+        
+        elif req.path == '/importQuestions' and req.method in ('GET', 'POST'):
+            return handle_import_questions(req, headers)
+        
+        elif req.path == '/attempts' and req.method == 'GET':
+            return handle_list_attempts(req, headers)
+        
+        elif req.path.startswith('/attempts/') and req.method == 'GET':
+            return handle_get_attempt(req, headers, req.path[len('/attempts/'):])
+        
+        elif req.path == '/recommendations' and req.method == 'GET':
+            return handle_recommendations(req, headers)
+        
+        elif req.path == '/leaderboard' and req.method == 'GET':
+            return handle_leaderboard(req, headers)
+        
+        elif req.path == '/leaderboard/me' and req.method == 'GET':
+            return handle_leaderboard_me(req, headers)
+        
+        elif req.path == '/admin/stats' and req.method == 'GET':
+            return handle_admin_stats(req, headers)
+        
+        elif req.path == '/admin/users' and req.method == 'GET':
+            return handle_admin_users(req, headers)
+        
         else:
             response_data = {'error': 'Not found'}
             return (json.dumps(response_data), 404, headers)
@@ -238,228 +1062,2111 @@ def know_map_api(req):
         response_data = {'error': 'Internal server error'}
         return (json.dumps(response_data), 500, headers)
 
-def await_update_user_stats(db, user_id, attempt_data):
-    """Update user profile statistics after quiz completion"""
-    try:
-        logger = get_logger()
-        logger.info(f"Updating stats for user: {user_id}")
-        
-        # Get current user document
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            logger.warning(f"User document not found: {user_id}")
-            return
-        
-        user_data = user_doc.to_dict()
-        current_stats = user_data.get('stats', {})
-        
-        # Calculate new statistics
-        total_quizzes = current_stats.get('totalQuizzesTaken', 0) + 1
-        total_xp = current_stats.get('totalXP', 0) + attempt_data['xpEarned']
-        perfect_scores = current_stats.get('perfectScores', 0) + (1 if attempt_data['isPerfectScore'] else 0)
-        
-        # Calculate new average score
-        prev_avg = current_stats.get('averageScore', 0)
-        prev_count = current_stats.get('totalQuizzesTaken', 0)
-        new_avg = ((prev_avg * prev_count) + attempt_data['percentage']) / total_quizzes
-        
-        # Calculate level (simple: level = XP / 100)
-        level = max(1, total_xp // 100)
-        
-        # Prepare updated stats
-        updated_stats = {
-            'totalQuizzesTaken': total_quizzes,
-            'totalTimeSpent': current_stats.get('totalTimeSpent', 0) + (attempt_data.get('timeSpent', 0) / 60),  # Convert to minutes
-            'totalXP': total_xp,
-            'level': level,
-            'averageScore': round(new_avg, 1),
-            'perfectScores': perfect_scores
+def build_user_stats_increments(attempts):
+    """Build a users/{uid} merge-set that adds one or more attempts to the stats.
+
+    Only stored sums are written, as atomic Increment transforms, so the write
+    needs no prior read and concurrent submissions cannot lose counts. Apply it
+    with set(..., merge=True) so it can share a WriteBatch with the attempt.
+    averageScore and level are derived from the sums (see derive_user_stats).
+    """
+    quizzes = len(attempts)
+    xp = sum(attempt_data['xpEarned'] for attempt_data in attempts)
+    perfect = sum(1 for attempt_data in attempts if attempt_data['isPerfectScore'])
+    minutes = sum(attempt_data.get('timeSpent', 0) for attempt_data in attempts) / 60  # Convert to minutes
+    percentage_sum = sum(attempt_data['percentage'] for attempt_data in attempts)
+
+    firestore = get_firestore_module()
+    return {
+        'stats': {
+            'totalQuizzesTaken': firestore.Increment(quizzes),
+            'scoredQuizzes': firestore.Increment(quizzes),
+            'sumPercentage': firestore.Increment(percentage_sum),
+            'totalTimeSpent': firestore.Increment(minutes),
+            'totalXP': firestore.Increment(xp),
+            'perfectScores': firestore.Increment(perfect)
+        },
+        'lastActiveAt': max(attempt_data['completedAt'] for attempt_data in attempts)
+    }
+
+def get_topic_progress_id(topic):
+    """Map a topic name to a valid, stable topic-progress document id"""
+    topic = str(topic)
+    if (topic and '/' not in topic and topic not in ('.', '..')
+            and not re.fullmatch(r'__.*__', topic) and len(topic.encode('utf-8')) <= 500):
+        return topic
+    return 'h_' + hashlib.sha1(topic.encode('utf-8')).hexdigest()
+
+def build_topic_progress_writes(db, user_id, attempts, absolute=False):
+    """Build users/{uid}/topic-progress/{topic} writes for one or more attempts.
+
+    Counters are atomic increments (or plain values with absolute=True, used
+    by the backfill); the last* fields describe the most recent attempt that
+    covered the topic. Cumulative mastery is derived by readers with
+    classify_topic_performance(correct, total).
+    """
+    counter = (lambda value: value) if absolute else get_firestore_module().Increment
+    progress = {}
+    for attempt_data in sorted(attempts, key=lambda attempt: attempt['completedAt']):
+        for topic, stats in attempt_data['topicBreakdown'].items():
+            entry = progress.setdefault(topic, {'correct': 0, 'total': 0, 'attempts': 0})
+            entry['correct'] += stats['correct']
+            entry['total'] += stats['total']
+            entry['attempts'] += 1
+            entry['last'] = (attempt_data, stats)
+
+    topics_ref = db.collection('users').document(user_id).collection('topic-progress')
+    writes = []
+    for topic, entry in progress.items():
+        attempt_data, stats = entry['last']
+        writes.append((topics_ref.document(get_topic_progress_id(topic)), {
+            'topic': topic,
+            'userId': user_id,
+            'correct': counter(entry['correct']),
+            'total': counter(entry['total']),
+            'attempts': counter(entry['attempts']),
+            'lastSeenAt': attempt_data['completedAt'],
+            'lastQuizId': attempt_data['quizId'],
+            'lastClassification': stats['classification'],
+            'lastPercentage': stats['percentage']
+        }))
+    return writes
+
+def get_admin_stats_partition(key):
+    """Stable admin-stats-shards partition of a quiz or topic id"""
+    return int(hashlib.sha1(str(key).encode('utf-8')).hexdigest()[:8], 16) % ADMIN_STATS_PARTITIONS
+
+def build_admin_stats_writes(db, attempts, shard=None, absolute=False):
+    """Build the admin-stats-shards writes that add attempts to the global counters.
+
+    All writes go to one replica picked at random: global totals to its
+    partition 0 document, each quiz and topic to the partition its id hashes
+    to. Topic mastery counts each attempt's classification of the topic.
+    With absolute=True (backfill) the totals are written as plain values.
+    Returns (ref, data) pairs, one per partition touched.
+    """
+    counter = (lambda value: value) if absolute else get_firestore_module().Increment
+    totals = {'attempts': 0, 'sumPercentage': 0, 'perfectScores': 0, 'totalXP': 0}
+    quizzes = {}
+    topics = {}
+    for attempt_data in attempts:
+        perfect = 1 if attempt_data.get('isPerfectScore') else 0
+        totals['attempts'] += 1
+        totals['sumPercentage'] += attempt_data.get('percentage', 0)
+        totals['perfectScores'] += perfect
+        totals['totalXP'] += attempt_data.get('xpEarned', 0)
+
+        quiz = quizzes.setdefault(attempt_data['quizId'], {'attempts': 0, 'sumPercentage': 0, 'perfectScores': 0})
+        quiz['title'] = attempt_data.get('quizTitle')
+        quiz['attempts'] += 1
+        quiz['sumPercentage'] += attempt_data.get('percentage', 0)
+        quiz['perfectScores'] += perfect
+
+        for topic, stats in (attempt_data.get('topicBreakdown') or {}).items():
+            entry = topics.setdefault(get_topic_progress_id(topic), {
+                'topic': topic, 'attempts': 0, 'correct': 0, 'total': 0,
+                **{field: 0 for field in MASTERY_COUNTER_FIELDS.values()}
+            })
+            entry['attempts'] += 1
+            entry['correct'] += stats.get('correct', 0)
+            entry['total'] += stats.get('total', 0)
+            mastery_field = MASTERY_COUNTER_FIELDS.get(stats.get('classification'))
+            if mastery_field:
+                entry[mastery_field] += 1
+
+    def counters(values):
+        return {key: value if isinstance(value, str) or value is None else counter(value)
+                for key, value in values.items()}
+
+    if shard is None:
+        shard = random.randrange(ADMIN_STATS_SHARDS)
+    partitions = {0: {key: counter(value) for key, value in totals.items()}}
+    for field, entries in (('quizzes', quizzes), ('topics', topics)):
+        for key, values in entries.items():
+            data = partitions.setdefault(get_admin_stats_partition(key), {})
+            data.setdefault(field, {})[key] = counters(values)
+    updated_at = max((attempt_data['completedAt'] for attempt_data in attempts), default=datetime.utcnow())
+    shards_ref = db.collection('admin-stats-shards')
+    return [(shards_ref.document(f'{shard}-{partition}'), {**data, 'updatedAt': updated_at})
+            for partition, data in sorted(partitions.items())]
+
+def commit_writes(db, writes):
+    """Commit (ref, data, merge) writes in WriteBatches of at most 500 operations.
+
+    The first batch is committed atomically and its failure is raised, so
+    callers should put the writes that must land together first. Overflow
+    batches (only needed for very large topic sets) are best-effort.
+    """
+    for start in range(0, len(writes), FIRESTORE_MAX_BATCH_WRITES):
+        batch = db.batch()
+        for ref, data, merge in writes[start:start + FIRESTORE_MAX_BATCH_WRITES]:
+            batch.set(ref, data, merge=merge)
+        if start == 0:
+            with timed_span('commit'):
+                batch.commit()
+            continue
+        try:
+            with timed_span('commit'):
+                batch.commit()
+        except Exception as e:
+            get_logger().warning(f"Failed to commit overflow writes {start}-{start + FIRESTORE_MAX_BATCH_WRITES}: {str(e)}")
+
+async def async_commit_writes(db, writes):
+    """AsyncClient version of commit_writes (same batching and failure rules)"""
+    for start in range(0, len(writes), FIRESTORE_MAX_BATCH_WRITES):
+        batch = db.batch()
+        for ref, data, merge in writes[start:start + FIRESTORE_MAX_BATCH_WRITES]:
+            batch.set(ref, data, merge=merge)
+        if start == 0:
+            with timed_span('commit'):
+                await batch.commit()
+            continue
+        try:
+            with timed_span('commit'):
+                await batch.commit()
+        except Exception as e:
+            get_logger().warning(f"Failed to commit overflow writes {start}-{start + FIRESTORE_MAX_BATCH_WRITES}: {str(e)}")
+
+def derive_user_stats(stats):
+    """Return stats with averageScore and level derived from the stored sums.
+
+    Users created before the sums existed keep a frozen `averageScore` covering
+    the quizzes not counted in `scoredQuizzes`; it is blended in so averages
+    stay exact without a migration.
+    """
+    total_quizzes = stats.get('totalQuizzesTaken', 0)
+    scored_quizzes = stats.get('scoredQuizzes', 0)
+    legacy_quizzes = max(0, total_quizzes - scored_quizzes)
+    score_sum = stats.get('sumPercentage', 0) + stats.get('averageScore', 0) * legacy_quizzes
+
+    return {
+        **stats,
+        'averageScore': round(score_sum / total_quizzes, 1) if total_quizzes else 0,
+        'level': get_level(stats.get('totalXP', 0))
+    }
+
+def get_level(total_xp):
+    """Level for an XP total (simple: level = XP / 100, at least 1)"""
+    return max(1, int(total_xp) // 100)
+
+def get_request_user(req, use_cache=True, check_revoked=False):
+    """Verify the Bearer token on a request.
+
+    Returns (user_info, None) on success or (None, (error_message, status)).
+    See verify_firebase_token for the caching options.
+    """
+    auth_header = req.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, ('No valid authorization token provided', 401)
+
+    id_token = auth_header.split('Bearer ')[1]
+    with timed_span('auth'):
+        user_info = verify_firebase_token(id_token, use_cache=use_cache, check_revoked=check_revoked)
+
+    if not user_info:
+        return None, ('Invalid authentication token', 401)
+    return user_info, None
+
+
+def build_submission_records(user_info, quiz_id, quiz_key, submission, submission_time):
+    """Grade one submission and build its quiz-attempts and legacy reports documents"""
+    user_id = user_info['uid']
+    user_answers = submission.get('answers', {})
+
+    # Analyze performance
+    analysis_result = analyze_quiz_performance(user_answers, plan=quiz_key['plan'])
+
+    # Calculate additional metrics for profile tracking
+    total_questions = analysis_result['totalQuestions']
+    score = analysis_result['totalScore']
+    percentage = analysis_result['overallPercentage']
+    is_perfect_score = percentage == 100
+
+    # Calculate XP earned (example: base 10 XP + bonus for high scores)
+    xp_earned = 10 + (score * 2) + (50 if is_perfect_score else 0)
+
+    # Version 3 keeps only answer/correctness vectors and references the quiz
+    # snapshot for question text and options
+    question_breakdown = analysis_result['questionBreakdown']
+    report_analysis = analysis_result
+    if ATTEMPT_REPORT_VERSION == '3.0':
+        correct_mask = ''.join('1' if question['isCorrect'] else '0' for question in question_breakdown)
+        question_fields = {
+            'quizSnapshotId': quiz_key['snapshotId'],
+            'answers': {str(i): question['userAnswer'] for i, question in enumerate(question_breakdown)
+                        if question['userAnswer'] is not None},
+            'correctMask': correct_mask
         }
-        
-        # Update user document
-        user_ref.update({
-            'stats': updated_stats,
-            'lastActiveAt': attempt_data['completedAt']
-        })
-        
-        logger.info(f"Successfully updated stats for user {user_id}: Level {level}, XP {total_xp}")
-        
-    except Exception as e:
-        logger = get_logger()
-        logger.error(f"Error updating user stats: {str(e)}")
-        raise
+        report_analysis = {key: value for key, value in analysis_result.items() if key != 'questionBreakdown'}
+    else:
+        question_fields = {'questionBreakdown': question_breakdown}
+
+    # Create comprehensive quiz attempt record
+    attempt_data = {
+        'userId': user_id,
+        'quizId': quiz_id,
+        'quizTitle': quiz_key['title'],
+
+        # Timing
+        'startedAt': submission_time,  # Frontend could provide actual start time
+        'completedAt': submission_time,
+        'timeSpent': submission.get('timeSpent', 0),  # Frontend should provide this
+
+        # Results
+        'score': score,
+        'totalQuestions': total_questions,
+        'percentage': percentage,
+        'isPerfectScore': is_perfect_score,
 
+        # Detailed breakdown
+        'topicBreakdown': analysis_result['classifiedTopics'],
+        **question_fields,
+
+        # Analytics
+        'difficultyLevel': quiz_key['difficulty'],
+        'deviceType': submission.get('deviceType', 'unknown'),
+        'retryAttempt': 1,  # TODO: Calculate actual retry number
+
+        # Gamification
+        'xpEarned': xp_earned,
+        'badgesUnlocked': [],  # TODO: Implement badge system
+
+        # Metadata
+        'userEmail': user_info.get('email', 'Unknown'),
+        'reportVersion': ATTEMPT_REPORT_VERSION
+    }
+
+    # Legacy reports collection record for backward compatibility
+    legacy_report_data = {
+        'userId': user_id,
+        'quizId': quiz_id,
+        'submittedAt': submission_time,
+        'userAnswers': user_answers,
+        'analysis': report_analysis,
+        'quizTitle': quiz_key['title'],
+        'userEmail': user_info.get('email', 'Unknown'),
+        'reportVersion': '1.0'
+    }
+    if report_analysis is not analysis_result:
+        legacy_report_data['quizSnapshotId'] = question_fields['quizSnapshotId']
+        legacy_report_data['correctMask'] = question_fields['correctMask']
+
+    return analysis_result, attempt_data, legacy_report_data
+
+
+def check_submission_quiz(quiz_key, headers):
+    """Return an error response if the quiz is missing or has no questions, else None"""
+    if quiz_key is None:
+        log_request_summary("Quiz not found", level=logging.WARNING, status=404, errorClass='QuizNotFound')
+        response_data = {'error': 'Quiz not found'}
+        return (json.dumps(response_data), 404, headers)
+
+    quiz_questions = quiz_key['questions']
+
+    # Log the structure of the first question for debugging
+    if quiz_questions:
+        log_detail("First question structure", question=quiz_questions[0])
+
+    if not quiz_questions:
+        log_request_summary("No questions found in main document or subcollection",
+                            level=logging.ERROR, status=400, errorClass='EmptyQuiz')
+        response_data = {'error': 'No questions found in quiz'}
+        return (json.dumps(response_data), 400, headers)
+    return None
+
+def build_submission_writes(db, user_id, quiz_key, attempt_data, legacy_report_data):
+    """Return (writes, snapshot_writes, attempt_id, report_id) for one submission.
+
+    The quiz snapshot (first use on this instance), attempt, legacy report,
+    profile stats, topic progress and admin counters all go in one commit.
+    """
+    attempt_ref = db.collection('quiz-attempts').document()
+    snapshot_writes = build_quiz_snapshot_writes(db, [quiz_key])
+    writes = snapshot_writes + [(attempt_ref, attempt_data, False)]
+
+    # Also save to legacy reports collection for backward compatibility
+    report_id = None
+    if WRITE_LEGACY_REPORTS:
+        report_ref = db.collection('reports').document()
+        writes.append((report_ref, legacy_report_data, False))
+        report_id = report_ref.id
+
+    # Update user profile statistics and per-topic progress
+    user_ref = db.collection('users').document(user_id)
+    writes.append((user_ref, build_user_stats_increments([attempt_data]), True))
+    writes += [(ref, data, True) for ref, data in build_topic_progress_writes(db, user_id, [attempt_data])]
+    writes += [(ref, data, True) for ref, data in build_admin_stats_writes(db, [attempt_data])]
+    return writes, snapshot_writes, attempt_ref.id, report_id
+
+def build_submission_response(headers, request_json, analysis_result, attempt_data, attempt_id, report_id):
+    """Log the submission summary and build the /submitQuiz success response"""
+    log_request_summary(
+        "Quiz attempt recorded",
+        status=200,
+        attemptId=attempt_id,
+        reportId=report_id,
+        questionCount=attempt_data['totalQuestions'],
+        answeredCount=len(request_json.get('answers') or {}),
+        score=attempt_data['score'],
+        percentage=attempt_data['percentage']
+    )
+
+    # Return response with both IDs
+    response_data = {
+        'success': True,
+        'attemptId': attempt_id,
+        'reportId': report_id,
+        'analysis': analysis_result,
+        'xpEarned': attempt_data['xpEarned'],
+        'isPerfectScore': attempt_data['isPerfectScore'],
+        'message': 'Quiz submitted and analyzed successfully'
+    }
+    return (json.dumps(response_data), 200, headers)
 
 def handle_submit_quiz(req, headers):
-    """Handle quiz submission"""
-    logger = get_logger()
-    logger.info("--- CANARY LOG: handle_submit_quiz function entered ---")
+    """Handle quiz submission (sync pipeline unless SUBMIT_PIPELINE=async)"""
+    if SUBMIT_PIPELINE == 'async':
+        return run_async(handle_submit_quiz_async(req, headers))
+    return handle_submit_quiz_sync(req, headers)
+
+def handle_submit_quiz_sync(req, headers):
+    """Handle quiz submission with the blocking Firestore client"""
     try:
         db = get_firestore_client()
         
         # Verify authentication
-        auth_header = req.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            response_data = {'error': 'No valid authorization token provided'}
-            return (json.dumps(response_data), 401, headers)
-        
-        id_token = auth_header.split('Bearer ')[1]
-        user_info = verify_firebase_token(id_token)
-        
-        if not user_info:
-            response_data = {'error': 'Invalid authentication token'}
-            return (json.dumps(response_data), 401, headers)
+        user_info, auth_error = get_request_user(req)
+        if auth_error:
+            log_request_summary("Quiz submission rejected", level=logging.WARNING, status=auth_error[1],
+                                errorClass='Unauthenticated')
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
         
         user_id = user_info['uid']
-        logger.info(f"Processing quiz submission for user: {user_id}")
+        annotate_request(userId=user_id)
         
         # Parse request data
         request_json = req.get_json()
         if not request_json:
+            log_request_summary("Quiz submission rejected", level=logging.WARNING, status=400,
+                                errorClass='InvalidRequest', error='No JSON data provided')
             response_data = {'error': 'No JSON data provided'}
             return (json.dumps(response_data), 400, headers)
         
         quiz_id = request_json.get('quizId')
-        user_answers = request_json.get('answers', {})
         
         if not quiz_id:
+            log_request_summary("Quiz submission rejected", level=logging.WARNING, status=400,
+                                errorClass='InvalidRequest', error='Quiz ID is required')
             response_data = {'error': 'Quiz ID is required'}
             return (json.dumps(response_data), 400, headers)
         
-        # Fetch quiz questions from Firestore - with detailed logging
-        logger.info(f"Attempting to fetch quiz with ID: {quiz_id}")
-        quiz_ref = db.collection('quizzes').document(quiz_id)
-        quiz_doc = quiz_ref.get()
-        
-        if not quiz_doc.exists:
-            logger.error(f"Quiz document {quiz_id} not found in Firestore")
-            response_data = {'error': 'Quiz not found'}
-            return (json.dumps(response_data), 404, headers)
-        
-        logger.info(f"Quiz document found with ID: {quiz_id}")
-        quiz_data = quiz_doc.to_dict()
-        
-        # Try to get questions from the main document first (this is the new approach)
-        quiz_questions = quiz_data.get('questions', [])
-        logger.info(f"Found {len(quiz_questions)} questions in main document")
-        
-        # If no questions in main document, try the subcollection (old approach)
-        if not quiz_questions:
-            logger.info("No questions in main document, trying subcollection...")
-            questions_collection = db.collection('quizzes').document(quiz_id).collection('questions')
-            questions_docs = questions_collection.get()
-            
-            for doc in questions_docs:
-                question_data = doc.to_dict()
-                quiz_questions.append(question_data)
-                
-            logger.info(f"Found {len(quiz_questions)} questions in subcollection")
-        
-        # Log the structure of the first question for debugging
-        if quiz_questions:
-            logger.info(f"First question structure: {quiz_questions[0]}")
+        # Fetch quiz questions (served from the instance cache when still current)
+        annotate_request(quizId=quiz_id)
+        with timed_span('quiz_fetch'):
+            quiz_key = get_quiz_answer_key(db, quiz_id)
+
+        quiz_error = check_submission_quiz(quiz_key, headers)
+        if quiz_error:
+            return quiz_error
         
-        if not quiz_questions:
-            logger.error(f"No questions found for quiz {quiz_id} in either main document or subcollection")
-            response_data = {'error': 'No questions found in quiz'}
-            return (json.dumps(response_data), 400, headers)
+        # Grade and build the records to persist
+        submission_time = datetime.utcnow()
+        analysis_result, attempt_data, legacy_report_data = build_submission_records(
+            user_info, quiz_id, quiz_key, request_json, submission_time
+        )
         
-        # Analyze performance
-        analysis_result = analyze_quiz_performance(user_answers, quiz_questions)
+        writes, snapshot_writes, attempt_id, report_id = build_submission_writes(
+            db, user_id, quiz_key, attempt_data, legacy_report_data
+        )
+        commit_writes(db, writes)
+        mark_quiz_snapshots_persisted(snapshot_writes)
         
-        # Calculate additional metrics for profile tracking
-        total_questions = analysis_result['totalQuestions']
-        score = analysis_result['totalScore']
-        percentage = analysis_result['overallPercentage']
-        is_perfect_score = percentage == 100
+        return build_submission_response(headers, request_json, analysis_result, attempt_data, attempt_id, report_id)
         
-        # Calculate XP earned (example: base 10 XP + bonus for high scores)
-        xp_earned = 10 + (score * 2) + (50 if is_perfect_score else 0)
-        
-        # Get current timestamp
+    except Exception as e:
+        logger = get_logger()
+        logger.error(f"Error in handle_submit_quiz: {str(e)}")
+        log_request_summary("Quiz submission failed", level=logging.ERROR, status=500, errorClass=type(e).__name__)
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+async def handle_submit_quiz_async(req, headers):
+    """Handle quiz submission with the Firestore AsyncClient.
+
+    Token verification (on a worker thread, since it may fetch Google's
+    public keys) runs concurrently with the quiz fetch; everything is then
+    persisted in one WriteBatch commit as in the sync pipeline. Error
+    precedence matches the sync handler: auth, then the body, then the quiz.
+    """
+    try:
+        db = get_async_firestore_client()
+
+        request_json = req.get_json(silent=True)
+        quiz_id = request_json.get('quizId') if isinstance(request_json, dict) else None
+
+        async def fetch_quiz():
+            # Fetch quiz questions (served from the instance cache when still current)
+            annotate_request(quizId=quiz_id)
+            with timed_span('quiz_fetch'):
+                return await async_get_quiz_answer_key(db, quiz_id)
+
+        if quiz_id:
+            auth_result, quiz_key = await asyncio.gather(
+                asyncio.to_thread(get_request_user, req), fetch_quiz(), return_exceptions=True
+            )
+            if isinstance(auth_result, Exception):
+                raise auth_result
+            user_info, auth_error = auth_result
+        else:
+            user_info, auth_error = await asyncio.to_thread(get_request_user, req)
+            quiz_key = None
+
+        if auth_error:
+            log_request_summary("Quiz submission rejected", level=logging.WARNING, status=auth_error[1],
+                                errorClass='Unauthenticated')
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+
+        user_id = user_info['uid']
+        annotate_request(userId=user_id)
+
+        if not request_json:
+            log_request_summary("Quiz submission rejected", level=logging.WARNING, status=400,
+                                errorClass='InvalidRequest', error='No JSON data provided')
+            response_data = {'error': 'No JSON data provided'}
+            return (json.dumps(response_data), 400, headers)
+        if not quiz_id:
+            log_request_summary("Quiz submission rejected", level=logging.WARNING, status=400,
+                                errorClass='InvalidRequest', error='Quiz ID is required')
+            response_data = {'error': 'Quiz ID is required'}
+            return (json.dumps(response_data), 400, headers)
+        if isinstance(quiz_key, Exception):
+            raise quiz_key
+
+        quiz_error = check_submission_quiz(quiz_key, headers)
+        if quiz_error:
+            return quiz_error
+
+        # Grade and build the records to persist
         submission_time = datetime.utcnow()
-        
-        # Create comprehensive quiz attempt record
-        attempt_data = {
-            'userId': user_id,
-            'quizId': quiz_id,
-            'quizTitle': quiz_data.get('title', 'Unknown Quiz'),
-            
-            # Timing
-            'startedAt': submission_time,  # Frontend could provide actual start time
-            'completedAt': submission_time,
-            'timeSpent': request_json.get('timeSpent', 0),  # Frontend should provide this
-            
-            # Results
-            'score': score,
-            'totalQuestions': total_questions,
+        analysis_result, attempt_data, legacy_report_data = build_submission_records(
+            user_info, quiz_id, quiz_key, request_json, submission_time
+        )
+
+        writes, snapshot_writes, attempt_id, report_id = build_submission_writes(
+            db, user_id, quiz_key, attempt_data, legacy_report_data
+        )
+        await async_commit_writes(db, writes)
+        mark_quiz_snapshots_persisted(snapshot_writes)
+
+        return build_submission_response(headers, request_json, analysis_result, attempt_data, attempt_id, report_id)
+
+    except Exception as e:
+        logger = get_logger()
+        logger.error(f"Error in handle_submit_quiz_async: {str(e)}")
+        log_request_summary("Quiz submission failed", level=logging.ERROR, status=500, errorClass=type(e).__name__)
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+
+def handle_submit_quiz_batch(req, headers):
+    """Handle a batch of queued quiz submissions (offline/classroom sync).
+
+    The token is verified once and each distinct quiz is fetched once. Attempt
+    and legacy report documents are committed in WriteBatches of at most
+    FIRESTORE_MAX_BATCH_WRITES operations, each carrying one stats update, the
+    topic-progress and admin-counter updates for the attempts it contains and
+    any quiz snapshots not yet stored. Each submission gets its own entry in `results`, so
+    one bad item does not fail the whole batch.
+    """
+    logger = get_logger()
+    try:
+        db = get_firestore_client()
+
+        # Verify authentication once for the whole batch
+        user_info, auth_error = get_request_user(req)
+        if auth_error:
+            log_request_summary("Quiz batch rejected", level=logging.WARNING, status=auth_error[1],
+                                errorClass='Unauthenticated')
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+
+        user_id = user_info['uid']
+        annotate_request(userId=user_id)
+
+        # Parse request data
+        request_json = req.get_json(silent=True)
+        if not isinstance(request_json, dict):
+            log_request_summary("Quiz batch rejected", level=logging.WARNING, status=400,
+                                errorClass='InvalidRequest', error='No JSON data provided')
+            response_data = {'error': 'No JSON data provided'}
+            return (json.dumps(response_data), 400, headers)
+        submissions = request_json.get('submissions')
+        if not isinstance(submissions, list) or not submissions:
+            log_request_summary("Quiz batch rejected", level=logging.WARNING, status=400,
+                                errorClass='InvalidRequest', error='A non-empty submissions list is required')
+            response_data = {'error': 'A non-empty submissions list is required'}
+            return (json.dumps(response_data), 400, headers)
+
+        annotate_request(submissionCount=len(submissions))
+        if len(submissions) > MAX_BATCH_SUBMISSIONS:
+            log_request_summary("Quiz batch rejected", level=logging.WARNING, status=413,
+                                errorClass='PayloadTooLarge')
+            response_data = {'error': f'At most {MAX_BATCH_SUBMISSIONS} submissions are allowed per batch'}
+            return (json.dumps(response_data), 413, headers)
+
+        results = [None] * len(submissions)
+        pending = []  # (index, attempt_data, legacy_report_data, response entry)
+        quiz_keys = {}
+        submission_time = datetime.utcnow()
+
+        for index, submission in enumerate(submissions):
+            result = {'index': index, 'success': False}
+            if isinstance(submission, dict) and submission.get('clientSubmissionId') is not None:
+                result['clientSubmissionId'] = submission['clientSubmissionId']
+            results[index] = result
+
+            quiz_id = submission.get('quizId') if isinstance(submission, dict) else None
+            if not quiz_id:
+                result.update({'status': 400, 'error': 'Quiz ID is required'})
+                continue
+
+            try:
+                # Each distinct quiz is fetched once per batch
+                if quiz_id not in quiz_keys:
+                    with timed_span('quiz_fetch'):
+                        quiz_keys[quiz_id] = get_quiz_answer_key(db, quiz_id)
+                quiz_key = quiz_keys[quiz_id]
+
+                if quiz_key is None:
+                    result.update({'status': 404, 'error': 'Quiz not found'})
+                    continue
+                if not quiz_key['questions']:
+                    result.update({'status': 400, 'error': 'No questions found in quiz'})
+                    continue
+
+                analysis_result, attempt_data, legacy_report_data = build_submission_records(
+                    user_info, quiz_id, quiz_key, submission, submission_time
+                )
+            except Exception as e:
+                logger.error(f"Error grading batch item {index}: {str(e)}")
+                result.update({'status': 500, 'error': 'Failed to grade submission'})
+                continue
+
+            result.update({
+                'analysis': analysis_result,
+                'xpEarned': attempt_data['xpEarned'],
+                'isPerfectScore': attempt_data['isPerfectScore']
+            })
+            pending.append((index, attempt_data, legacy_report_data, result))
+
+        # Pack attempts (and legacy reports) into chunks that fit a single
+        # WriteBatch together with the stats write, the chunk's topic writes,
+        # (at most) one snapshot write per quiz and one admin counter write per
+        # partition
+        writes_per_item = 2 if WRITE_LEGACY_REPORTS else 1
+        chunks = []
+        chunk, chunk_topics, chunk_quizzes = [], set(), set()
+        for item in pending:
+            item_topics = set(item[1]['topicBreakdown'])
+            item_quizzes = chunk_quizzes | {item[1]['quizId']}
+            operations = (writes_per_item * (len(chunk) + 1) + 1 + len(chunk_topics | item_topics)
+                          + len(item_quizzes) + ADMIN_STATS_PARTITIONS)
+            if chunk and operations > FIRESTORE_MAX_BATCH_WRITES:
+                chunks.append(chunk)
+                chunk, chunk_topics, chunk_quizzes = [], set(), set()
+            chunk.append(item)
+            chunk_topics |= item_topics
+            chunk_quizzes.add(item[1]['quizId'])
+        if chunk:
+            chunks.append(chunk)
+
+        committed_attempts = []
+        user_ref = db.collection('users').document(user_id)
+        for chunk in chunks:
+            chunk_quiz_ids = {item[1]['quizId'] for item in chunk}
+            snapshot_writes = build_quiz_snapshot_writes(db, [quiz_keys[quiz_id] for quiz_id in chunk_quiz_ids])
+            writes = list(snapshot_writes)
+            refs = []
+            for index, attempt_data, legacy_report_data, result in chunk:
+                attempt_ref = db.collection('quiz-attempts').document()
+                writes.append((attempt_ref, attempt_data, False))
+                report_ref = None
+                if WRITE_LEGACY_REPORTS:
+                    report_ref = db.collection('reports').document()
+                    writes.append((report_ref, legacy_report_data, False))
+                refs.append((attempt_ref, report_ref))
+            chunk_attempts = [item[1] for item in chunk]
+            writes.append((user_ref, build_user_stats_increments(chunk_attempts), True))
+            writes += [(ref, data, True) for ref, data in build_topic_progress_writes(db, user_id, chunk_attempts)]
+            writes += [(ref, data, True) for ref, data in build_admin_stats_writes(db, chunk_attempts)]
+            try:
+                commit_writes(db, writes)
+            except Exception as e:
+                logger.error(f"Failed to commit batch items {chunk[0][0]}-{chunk[-1][0]}: {str(e)}")
+                for _, _, _, result in chunk:
+                    result.pop('analysis', None)
+                    result.update({'status': 500, 'error': 'Failed to save submission'})
+                continue
+            mark_quiz_snapshots_persisted(snapshot_writes)
+
+            for (index, attempt_data, _, result), (attempt_ref, report_ref) in zip(chunk, refs):
+                result.update({
+                    'success': True,
+                    'status': 200,
+                    'attemptId': attempt_ref.id,
+                    'reportId': report_ref.id if report_ref else None
+                })
+                committed_attempts.append(attempt_data)
+
+        succeeded = len(committed_attempts)
+        log_request_summary(
+            "Quiz batch processed",
+            status=200,
+            succeeded=succeeded,
+            failed=len(submissions) - succeeded,
+            quizCount=len(quiz_keys)
+        )
+
+        response_data = {
+            'success': succeeded == len(submissions),
+            'succeeded': succeeded,
+            'failed': len(submissions) - succeeded,
+            'results': results,
+            'message': 'Batch processed'
+        }
+        return (json.dumps(response_data), 200, headers)
+
+    except Exception as e:
+        logger = get_logger()
+        logger.error(f"Error in handle_submit_quiz_batch: {str(e)}")
+        log_request_summary("Quiz batch failed", level=logging.ERROR, status=500, errorClass=type(e).__name__)
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+
+
+def encode_attempts_cursor(source, completed_at, doc_id):
+    """Opaque startAfter cursor: the source collection plus the last row's sort key"""
+    payload = json.dumps({'s': source, 't': completed_at.isoformat(), 'id': doc_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_attempts_cursor(cursor):
+    """Inverse of encode_attempts_cursor; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return payload['s'], datetime.fromisoformat(payload['t']), str(payload['id'])
+    except (KeyError, TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def serialize_attempt_summary(doc_id, data, source):
+    """History-row fields of a quiz-attempts (v2) or legacy reports (v1) document"""
+    if source == 'reports':
+        analysis = data.get('analysis') or {}
+        percentage = analysis.get('overallPercentage', 0)
+        return {
+            'id': doc_id,
+            'source': source,
+            'quizId': data.get('quizId'),
+            'quizTitle': data.get('quizTitle'),
+            'completedAt': serialize_timestamp(data.get('submittedAt')),
+            'score': analysis.get('totalScore', 0),
+            'totalQuestions': analysis.get('totalQuestions', 0),
             'percentage': percentage,
-            'isPerfectScore': is_perfect_score,
-            
-            # Detailed breakdown
-            'topicBreakdown': analysis_result['classifiedTopics'],
-            'questionBreakdown': analysis_result['questionBreakdown'],
-            
-            # Analytics
-            'difficultyLevel': quiz_data.get('difficulty', 'medium'),
-            'deviceType': request_json.get('deviceType', 'unknown'),
-            'retryAttempt': 1,  # TODO: Calculate actual retry number
-            
-            # Gamification
-            'xpEarned': xp_earned,
-            'badgesUnlocked': [],  # TODO: Implement badge system
-            
-            # Metadata
-            'userEmail': user_info.get('email', 'Unknown'),
-            'reportVersion': '2.0'
+            'isPerfectScore': percentage == 100,
+            'reportVersion': data.get('reportVersion', '1.0')
         }
-        
-        # Save enhanced quiz attempt to new collection
-        attempt_ref = db.collection('quiz-attempts').document()
-        attempt_ref.set(attempt_data)
-        attempt_id = attempt_ref.id
-        
-        # Also save to legacy reports collection for backward compatibility
-        legacy_report_data = {
-            'userId': user_id,
-            'quizId': quiz_id,
-            'submittedAt': submission_time,
-            'userAnswers': user_answers,
-            'analysis': analysis_result,
-            'quizTitle': quiz_data.get('title', 'Unknown Quiz'),
-            'userEmail': user_info.get('email', 'Unknown'),
-            'reportVersion': '1.0'
+    return {
+        'id': doc_id,
+        'source': source,
+        'quizId': data.get('quizId'),
+        'quizTitle': data.get('quizTitle'),
+        'completedAt': serialize_timestamp(data.get('completedAt')),
+        'score': data.get('score', 0),
+        'totalQuestions': data.get('totalQuestions', 0),
+        'percentage': data.get('percentage', 0),
+        'isPerfectScore': data.get('isPerfectScore', False),
+        'xpEarned': data.get('xpEarned', 0),
+        'reportVersion': data.get('reportVersion', '2.0')
+    }
+
+def serialize_attempt_detail(doc_id, data, source, snapshot=None):
+    """Summary fields plus the full analysis, in the shape returned by /submitQuiz.
+
+    Compact (v3) records are rehydrated from their quiz `snapshot`; v1 and v2
+    records already embed the question breakdown.
+    """
+    detail = serialize_attempt_summary(doc_id, data, source)
+    if source == 'reports':
+        detail['analysis'] = data.get('analysis') or {}
+        detail['userAnswers'] = data.get('userAnswers') or {}
+        if 'questionBreakdown' not in detail['analysis'] and snapshot is not None:
+            detail['analysis'] = {**detail['analysis'], 'questionBreakdown': rehydrate_question_breakdown(
+                snapshot, detail['userAnswers'], data.get('correctMask', ''), by_question_id=True)}
+        return detail
+    question_breakdown = data.get('questionBreakdown')
+    if question_breakdown is None and snapshot is not None:
+        question_breakdown = rehydrate_question_breakdown(snapshot, data.get('answers') or {}, data.get('correctMask', ''))
+    detail['timeSpent'] = data.get('timeSpent', 0)
+    detail['analysis'] = {
+        'totalScore': detail['score'],
+        'totalQuestions': detail['totalQuestions'],
+        'overallPercentage': detail['percentage'],
+        'classifiedTopics': data.get('topicBreakdown') or {},
+        'questionBreakdown': question_breakdown or []
+    }
+    return detail
+
+def query_attempt_summaries(db, user_id, source, limit, after=None):
+    """One page of a user's attempts, newest first, projected to the summary fields.
+
+    Served by the userId/completedAt (quiz-attempts) and userId/submittedAt
+    (reports) composite indexes; ties are broken by document id.
+    """
+    time_field = 'submittedAt' if source == 'reports' else 'completedAt'
+    fields = REPORT_SUMMARY_FIELDS if source == 'reports' else ATTEMPT_SUMMARY_FIELDS
+    descending = get_firestore_module().Query.DESCENDING
+    query = (db.collection(source)
+             .where('userId', '==', user_id)
+             .order_by(time_field, direction=descending)
+             .order_by('__name__', direction=descending)
+             .select(fields))
+    if after:
+        query = query.start_after({time_field: after[0], '__name__': after[1]})
+    with timed_span('attempts_read'):
+        docs = list(query.limit(limit).stream())
+    return [(doc.id, doc.to_dict() or {}) for doc in docs], time_field
+
+def handle_list_attempts(req, headers):
+    """List the caller's attempts, newest first, as compact summaries.
+
+    `?limit=` sets the page size (default ATTEMPTS_PAGE_SIZE, at most
+    ATTEMPTS_MAX_PAGE_SIZE) and `?startAfter=` takes the previous page's
+    `nextCursor`. Users with no quiz-attempts are served from the legacy
+    reports collection.
+    """
+    try:
+        db = get_firestore_client()
+        user_info, auth_error = get_request_user(req)
+        if auth_error:
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+        user_id = user_info['uid']
+
+        try:
+            limit = int(req.args.get('limit', ATTEMPTS_PAGE_SIZE))
+        except ValueError:
+            response_data = {'error': 'limit must be an integer'}
+            return (json.dumps(response_data), 400, headers)
+        limit = max(1, min(limit, ATTEMPTS_MAX_PAGE_SIZE))
+
+        cursor = req.args.get('startAfter')
+        source, after = 'quiz-attempts', None
+        if cursor:
+            try:
+                source, completed_at, doc_id = decode_attempts_cursor(cursor)
+            except ValueError as e:
+                response_data = {'error': str(e)}
+                return (json.dumps(response_data), 400, headers)
+            if source not in ('quiz-attempts', 'reports'):
+                response_data = {'error': 'Invalid cursor'}
+                return (json.dumps(response_data), 400, headers)
+            after = (completed_at, doc_id)
+
+        rows, time_field = query_attempt_summaries(db, user_id, source, limit, after)
+        if not rows and not cursor:
+            # Accounts that only have pre-v2 history
+            source = 'reports'
+            rows, time_field = query_attempt_summaries(db, user_id, source, limit)
+
+        next_cursor = None
+        if len(rows) == limit and rows[-1][1].get(time_field):
+            next_cursor = encode_attempts_cursor(source, rows[-1][1][time_field], rows[-1][0])
+
+        annotate_request(userId=user_id, source=source, count=len(rows))
+        response_data = {
+            'attempts': [serialize_attempt_summary(doc_id, data, source) for doc_id, data in rows],
+            'nextCursor': next_cursor
         }
-        
-        report_ref = db.collection('reports').document()
-        report_ref.set(legacy_report_data)
-        report_id = report_ref.id
-        
-        # Update user profile statistics
+        return (json.dumps(response_data, default=str), 200, headers)
+
+    except Exception as e:
+        get_logger().error(f"Error in handle_list_attempts: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+def handle_get_attempt(req, headers, attempt_id):
+    """Return one attempt (quiz-attempts id or legacy reports id) with its full analysis.
+
+    Only the owner or an admin can read it; other callers get a 404.
+    """
+    try:
+        db = get_firestore_client()
+        user_info, auth_error = get_request_user(req)
+        if auth_error:
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+
+        if not attempt_id or '/' in attempt_id:
+            response_data = {'error': 'Attempt not found'}
+            return (json.dumps(response_data), 404, headers)
+
+        data = None
+        for source in ('quiz-attempts', 'reports'):
+            with timed_span('attempts_read'):
+                doc = db.collection(source).document(attempt_id).get()
+            if doc.exists:
+                data = doc.to_dict() or {}
+                break
+
+        if data is None or (data.get('userId') != user_info['uid'] and not is_admin_user(db, user_info)):
+            response_data = {'error': 'Attempt not found'}
+            return (json.dumps(response_data), 404, headers)
+
+        snapshot = None
+        if data.get('quizSnapshotId'):
+            with timed_span('snapshot_read'):
+                snapshot = get_quiz_snapshot(db, data['quizSnapshotId'])
+            if snapshot is None:
+                get_logger().warning(f"Quiz snapshot {data['quizSnapshotId']} missing for attempt {attempt_id}")
+
+        annotate_request(userId=user_info['uid'], attemptId=attempt_id, source=source)
+        detail = serialize_attempt_detail(attempt_id, data, source, snapshot=snapshot)
+        return (json.dumps(detail, default=str), 200, headers)
+
+    except Exception as e:
+        get_logger().error(f"Error in handle_get_attempt: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+
+def is_admin_user(db, user_info):
+    """Check the admin custom claim, falling back to users/{uid}.isAdmin (as in firestore.rules)"""
+    if user_info.get('admin') is True:
+        return True
+    user_doc = db.collection('users').document(user_info['uid']).get(field_paths=['isAdmin'])
+    return user_doc.exists and (user_doc.to_dict() or {}).get('isAdmin') is True
+
+
+def validate_import_question(question, index):
+    """Validate one imported question with the rules of src/utils/jsonValidator.js.
+
+    Returns (errors, warnings) as lists of messages.
+    """
+    prefix = f'Question {index + 1}:'
+    errors = []
+    warnings = []
+
+    if not isinstance(question, dict):
+        return [f'{prefix} Must be an object'], warnings
+
+    # Validate question text
+    text = question.get('question')
+    if not text:
+        errors.append(f'{prefix} Missing "question" field')
+    elif not isinstance(text, str):
+        errors.append(f'{prefix} Question text must be a string')
+    elif not text.strip():
+        errors.append(f'{prefix} Question text cannot be empty')
+    elif len(text) > 500:
+        warnings.append(f'{prefix} Question text is very long (>500 characters)')
+
+    # Validate options array
+    options = question.get('options')
+    if not options and options != []:
+        errors.append(f'{prefix} Missing "options" field')
+    elif not isinstance(options, list):
+        errors.append(f'{prefix} Options must be an array')
+    else:
+        if len(options) < 2:
+            errors.append(f'{prefix} Must have at least 2 options')
+        elif len(options) > 6:
+            warnings.append(f'{prefix} Has many options ({len(options)}) - consider reducing for better UX')
+        for option_index, option in enumerate(options):
+            if not isinstance(option, str):
+                errors.append(f'{prefix} Option {option_index + 1} must be a string')
+            elif not option.strip():
+                errors.append(f'{prefix} Option {option_index + 1} cannot be empty')
+            elif len(option) > 200:
+                warnings.append(f'{prefix} Option {option_index + 1} is very long (>200 characters)')
+        if all(isinstance(option, str) for option in options):
+            if len({option.strip().lower() for option in options}) != len(options):
+                warnings.append(f'{prefix} Has duplicate or very similar options')
+
+    # Validate correct answer (JS Number.isInteger accepts 1.0 but not booleans)
+    correct = question.get('correct')
+    if correct is None:
+        errors.append(f'{prefix} Missing "correct" field')
+    elif isinstance(correct, bool) or not (isinstance(correct, int)
+                                           or (isinstance(correct, float) and correct.is_integer())):
+        errors.append(f'{prefix} Correct answer must be an integer')
+    elif isinstance(options, list) and (correct < 0 or correct >= len(options)):
+        errors.append(f'{prefix} Correct answer index ({int(correct)}) is out of range')
+
+    # Validate topic (optional but recommended)
+    topic = question.get('topic')
+    if not topic:
+        warnings.append(f'{prefix} Missing topic - will be assigned "General"')
+    elif not isinstance(topic, str):
+        errors.append(f'{prefix} Topic must be a string')
+    elif not topic.strip():
+        warnings.append(f'{prefix} Empty topic - will be assigned "General"')
+
+    # Validate optional ID field
+    if question.get('id') and not isinstance(question.get('id'), str):
+        errors.append(f'{prefix} ID must be a string if provided')
+
+    return errors, warnings
+
+
+def iter_jsonl_questions(stream):
+    """Yield (index, question) from a JSON Lines upload, one line at a time.
+
+    Lines that are not valid JSON are yielded as (index, ValueError).
+    """
+    index = 0
+    for raw_line in stream:
+        line = raw_line.decode('utf-8') if isinstance(raw_line, bytes) else raw_line
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as e:
+            yield index, ValueError(f'Question {index + 1}: Invalid JSON line ({str(e)})')
+        index += 1
+
+
+def iter_json_questions(stream, metadata):
+    """Yield (index, question) from a JSON upload without loading it whole.
+
+    Accepts a root array of questions or an object with a "questions" array.
+    Fields of the root object that precede "questions" are stored in
+    `metadata`; the array itself is decoded one element at a time.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    exhausted = False
+
+    def read_more():
+        nonlocal buffer, exhausted
+        chunk = stream.read(IMPORT_READ_CHUNK_BYTES)
+        if not chunk:
+            exhausted = True
+            buffer += text_decoder.decode(b'', final=True)
+            return False
+        buffer += text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        return True
+
+    # Locate the start of the questions array
+    array_start = re.compile(r'"questions"\s*:\s*\[')
+    while True:
+        stripped = buffer.lstrip()
+        if stripped.startswith('['):
+            position = len(buffer) - len(stripped) + 1
+            break
+        match = array_start.search(buffer)
+        if match:
+            prefix = buffer[:match.start()].strip().rstrip(',')
+            try:
+                metadata.update(json.loads(prefix + '}') if prefix != '{' else {})
+            except ValueError:
+                pass
+            position = match.end()
+            break
+        if not read_more():
+            raise ValueError('Expected a JSON array or an object with a "questions" array')
+
+    index = 0
+    while True:
+        # Skip separators between elements
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or not read_more():
+                break
+        if position >= len(buffer):
+            raise ValueError('Unexpected end of upload inside the questions array')
+        if buffer[position] == ']':
+            return
+
+        try:
+            question, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if read_more():
+                continue
+            raise ValueError(f'Question {index + 1}: Invalid JSON')
+
+        yield index, question
+        index += 1
+        # Drop consumed text so the buffer only ever holds a partial element
+        buffer = buffer[end:]
+        position = 0
+
+
+def commit_with_retry(batch):
+    """Commit a WriteBatch, retrying transient errors with exponential backoff.
+
+    Returns the number of retries that were needed.
+    """
+    from google.api_core import exceptions as api_exceptions
+    retryable = (
+        api_exceptions.Aborted,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.InternalServerError,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable
+    )
+    for attempt in range(IMPORT_COMMIT_RETRIES + 1):
+        try:
+            with timed_span('commit'):
+                batch.commit()
+            return attempt
+        except retryable as e:
+            if attempt == IMPORT_COMMIT_RETRIES:
+                raise
+            delay = min(8.0, 0.25 * (2 ** attempt)) * (0.5 + random.random())
+            get_logger().warning(f"Import commit failed ({str(e)}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def import_questions(db, records, job_ref, job, created_by, default_topic=None, metadata=None, deadline=None):
+    """Validate and write streamed questions in retried, adaptive WriteBatches.
+
+    `records` yields (index, question) pairs. Records at or below
+    job['processedThrough'] were handled by an earlier run of the same job
+    (written up to job['committedThrough'], counted as skipped after it) and
+    are passed over, which makes re-sending an upload resume it without
+    counting anything twice. Question document ids are derived from the job
+    id and index, so a retried batch overwrites instead of duplicating. Each
+    batch also adds the questions to the topic index shards and stores the
+    job's new cursor and counters, so progress is exactly what has been
+    committed.
+
+    Questions without a topic get `default_topic`, then the upload's own
+    metadata topic (filled in by the parser), then "General". Parsing pauses
+    while a batch commits (backpressure), and the batch size halves whenever
+    a commit needed retries and grows back as commits succeed.
+
+    `job` is only updated with state that has been stored, so after an
+    exception it still describes the last committed batch and the caller
+    can record the failure without saving an uncommitted cursor.
+    Returns the updated job dict.
+    """
+    firestore = get_firestore_module()
+    questions_ref = db.collection('questions')
+    batch_size = IMPORT_MAX_BATCH_QUESTIONS
+    pending = []
+    job_id = job_ref.id
+    # Counters run ahead of the stored job until the next batch commits
+    progress = {**job, 'errors': list(job.get('errors', []))}
+    processed_through = job.get('processedThrough', job.get('committedThrough', -1))
+    resume_after = processed_through
+
+    def checkpoint(**changes):
+        """The job as it will be stored once everything through processed_through is written"""
+        return {**progress, 'errors': list(progress['errors']), 'processedThrough': processed_through,
+                'updatedAt': datetime.utcnow(), **changes}
+
+    def flush():
+        nonlocal batch_size, pending
+        if not pending:
+            return
+        batch = db.batch()
+        index_entries = []
+        for index, question in pending:
+            question_id = f'{job_id}-{index:07d}'
+            batch.set(questions_ref.document(question_id), question)
+            index_entries.append((question_id, [question['topic']]))
+        for ref, data, merge in build_topic_index_writes(db, index_entries):
+            batch.set(ref, data, merge=merge)
+        saved = checkpoint(committedThrough=pending[-1][0], imported=progress['imported'] + len(pending))
+        batch.set(job_ref, saved)
+        retries = commit_with_retry(batch)
+        progress.update(committedThrough=saved['committedThrough'], imported=saved['imported'])
+        job.update(saved)
+        add_questions_to_topic_index(index_entries)
+        if retries:
+            batch_size = max(IMPORT_MIN_BATCH_QUESTIONS, batch_size // 2)
+        else:
+            batch_size = min(IMPORT_MAX_BATCH_QUESTIONS, batch_size + IMPORT_MIN_BATCH_QUESTIONS)
+        pending = []
+
+    def finish(status):
+        flush()
+        # Persist the end state too: received/skipped/errors may have moved
+        # past the last flushed batch
+        saved = checkpoint(status=status)
+        job_ref.set(saved)
+        job.update(saved)
+        return job
+
+    for index, question in records:
+        if index <= resume_after:
+            continue
+        if deadline is not None and time.monotonic() > deadline:
+            return finish('paused')
+
+        progress['received'] = index + 1
+        processed_through = index
+        if isinstance(question, ValueError):
+            errors, warnings = [str(question)], []
+        else:
+            errors, warnings = validate_import_question(question, index)
+        progress['warnings'] += len(warnings)
+        if errors:
+            progress['skipped'] += 1
+            if len(progress['errors']) < IMPORT_MAX_REPORTED_ERRORS:
+                progress['errors'].extend(errors[:IMPORT_MAX_REPORTED_ERRORS - len(progress['errors'])])
+            continue
+
+        topic = question.get('topic') if isinstance(question.get('topic'), str) and question['topic'].strip() else None
+        pending.append((index, {
+            'question': question['question'],
+            'options': question['options'],
+            'correct': int(question['correct']),
+            'topic': topic or default_topic or (metadata or {}).get('topic') or 'General',
+            'createdAt': firestore.SERVER_TIMESTAMP,
+            'createdBy': created_by,
+            'importJobId': job_id
+        }))
+        if len(pending) >= batch_size:
+            flush()
+
+    return finish('completed')
+
+
+def serialize_import_job(job_id, job):
+    """Progress fields of an import job for API responses"""
+    return {
+        'jobId': job_id,
+        'status': job.get('status'),
+        'received': job.get('received', 0),
+        'imported': job.get('imported', 0),
+        'skipped': job.get('skipped', 0),
+        'warnings': job.get('warnings', 0),
+        'committedThrough': job.get('committedThrough', -1),
+        'errors': job.get('errors', [])
+    }
+
+
+def handle_import_questions(req, headers):
+    """Handle bulk question import (POST) and import job progress (GET).
+
+    POST streams a JSON (`{"questions": [...]}` or a bare array) or JSON Lines
+    body (`?format=jsonl` or an x-ndjson/jsonl content type) into the
+    `questions` collection. Pass `?jobId=` to resume a paused or failed job by
+    re-sending the same upload. GET `?jobId=` returns the job's progress.
+    Admin only.
+    """
+    logger = get_logger()
+    try:
+        db = get_firestore_client()
+
+        # Admin writes are revocation-sensitive, so never use cached claims
+        user_info, auth_error = get_request_user(req, use_cache=False, check_revoked=True)
+        if auth_error:
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+        if not is_admin_user(db, user_info):
+            response_data = {'error': 'Admin privileges required'}
+            return (json.dumps(response_data), 403, headers)
+
+        job_id = req.args.get('jobId')
+        job_ref = db.collection('import-jobs').document(job_id) if job_id else db.collection('import-jobs').document()
+        job_doc = job_ref.get() if job_id else None
+
+        if req.method == 'GET':
+            if not job_id or not job_doc.exists:
+                response_data = {'error': 'Import job not found'}
+                return (json.dumps(response_data), 404, headers)
+            return (json.dumps(serialize_import_job(job_id, job_doc.to_dict())), 200, headers)
+
+        if job_doc is not None and job_doc.exists:
+            job = job_doc.to_dict()
+            if job.get('status') == 'completed':
+                return (json.dumps(serialize_import_job(job_ref.id, job)), 200, headers)
+        else:
+            job = {
+                'status': 'running',
+                'createdBy': user_info['uid'],
+                'createdAt': datetime.utcnow(),
+                'updatedAt': datetime.utcnow(),
+                'received': 0,
+                'imported': 0,
+                'skipped': 0,
+                'warnings': 0,
+                'committedThrough': -1,
+                'processedThrough': -1,
+                'errors': []
+            }
+            job_ref.set(job)
+        job['status'] = 'running'
+
+        content_type = (req.headers.get('Content-Type') or '').lower()
+        is_jsonl = req.args.get('format') == 'jsonl' or 'ndjson' in content_type or 'jsonl' in content_type
+        metadata = {}
+        records = iter_jsonl_questions(req.stream) if is_jsonl else iter_json_questions(req.stream, metadata)
+
+        annotate_request(jobId=job_ref.id, userId=user_info['uid'])
+        deadline = time.monotonic() + IMPORT_TIME_BUDGET_SECONDS
         try:
-            await_update_user_stats(db, user_id, attempt_data)
+            job = import_questions(db, records, job_ref, job, user_info['uid'],
+                                   default_topic=req.args.get('topic'), metadata=metadata, deadline=deadline)
+        except ValueError as e:
+            job['status'] = 'failed'
+            job['errors'] = (job['errors'] + [str(e)])[:IMPORT_MAX_REPORTED_ERRORS + 1]
+            job_ref.set(job)
+            log_request_summary("Question import failed", level=logging.WARNING, status=400,
+                                imported=job['imported'], skipped=job['skipped'])
+            return (json.dumps(serialize_import_job(job_ref.id, job)), 400, headers)
         except Exception as e:
-            logger.warning(f"Failed to update user stats: {str(e)}")
-        
-        logger.info(f"Quiz attempt recorded: {attempt_id}, Legacy report: {report_id}")
-        
-        # Return response with both IDs
+            # e.g. a commit that ran out of retries: record the failure so the
+            # stored job never claims to still be running. `job` only holds
+            # committed progress, so a resume picks up after the last batch.
+            logger.error(f"Question import {job_ref.id} failed: {str(e)}")
+            job['status'] = 'failed'
+            job['updatedAt'] = datetime.utcnow()
+            try:
+                job_ref.set(job)
+            except Exception as set_error:
+                logger.error(f"Failed to record import job {job_ref.id} as failed: {str(set_error)}")
+            response_data = {**serialize_import_job(job_ref.id, job), 'error': 'Internal server error'}
+            return (json.dumps(response_data), 500, headers)
+
+        status = 202 if job['status'] == 'paused' else 200
+        log_request_summary("Question import processed", status=status, importStatus=job['status'],
+                            received=job['received'], imported=job['imported'], skipped=job['skipped'])
+        return (json.dumps(serialize_import_job(job_ref.id, job)), status, headers)
+
+    except Exception as e:
+        logger.error(f"Error in handle_import_questions: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+
+def merge_counter_shards(shards):
+    """Sum counter shard documents field by field, including nested maps.
+
+    Numbers are added, timestamps keep the latest value and labels (quiz
+    titles, topic names) keep whichever shard supplied one.
+    """
+    def merge(target, source):
+        for key, value in source.items():
+            if isinstance(value, dict):
+                merge(target.setdefault(key, {}), value)
+            elif isinstance(value, datetime):
+                target[key] = max(target.get(key, value), value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                target[key] = target.get(key, 0) + value
+            elif value is not None:
+                target[key] = value
+
+    totals = {}
+    for shard in shards:
+        merge(totals, shard)
+    return totals
+
+def serialize_timestamp(value):
+    """ISO-8601 string for a Firestore timestamp (None stays None)"""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def load_admin_stats(db):
+    """Build the /admin/stats payload from the counter shards and a users count"""
+    with timed_span('admin_stats_read'):
+        shards = [doc.to_dict() or {} for doc in db.collection('admin-stats-shards').stream()]
+        # count() is billed one read per 1,000 index entries, not per user
+        users_total = db.collection('users').count().get()[0][0].value
+    totals = merge_counter_shards(shards)
+
+    def average(score_sum, count):
+        return round(score_sum / count, 1) if count else 0
+
+    quizzes = [{
+        'quizId': quiz_id,
+        'title': quiz.get('title'),
+        'attempts': quiz.get('attempts', 0),
+        'averageScore': average(quiz.get('sumPercentage', 0), quiz.get('attempts', 0)),
+        'perfectScores': quiz.get('perfectScores', 0)
+    } for quiz_id, quiz in totals.get('quizzes', {}).items()]
+    quizzes.sort(key=lambda quiz: quiz['attempts'], reverse=True)
+
+    topics = [{
+        'topic': topic.get('topic', topic_id),
+        'attempts': topic.get('attempts', 0),
+        'accuracy': average(topic.get('correct', 0) * 100, topic.get('total', 0)),
+        'mastery': {field: topic.get(field, 0) for field in MASTERY_COUNTER_FIELDS.values()}
+    } for topic_id, topic in totals.get('topics', {}).items()]
+    topics.sort(key=lambda topic: topic['attempts'], reverse=True)
+
+    return {
+        'users': users_total,
+        'attempts': totals.get('attempts', 0),
+        'averageScore': average(totals.get('sumPercentage', 0), totals.get('attempts', 0)),
+        'perfectScores': totals.get('perfectScores', 0),
+        'totalXP': totals.get('totalXP', 0),
+        'quizzes': quizzes,
+        'topics': topics,
+        'shards': len(shards),
+        'updatedAt': serialize_timestamp(totals.get('updatedAt')),
+        'generatedAt': datetime.utcnow().isoformat()
+    }
+
+def get_admin_stats(db, refresh=False):
+    """Return the /admin/stats payload, reusing it for ADMIN_STATS_CACHE_TTL_SECONDS"""
+    now = time.monotonic()
+    with _admin_stats_lock:
+        if not refresh and _admin_stats_cache['data'] is not None and now < _admin_stats_cache['expiresAt']:
+            annotate_request(adminStatsCacheHit=True)
+            return _admin_stats_cache['data']
+
+    data = load_admin_stats(db)
+    with _admin_stats_lock:
+        _admin_stats_cache['data'] = data
+        _admin_stats_cache['expiresAt'] = now + ADMIN_STATS_CACHE_TTL_SECONDS
+    annotate_request(adminStatsCacheHit=False)
+    return data
+
+def get_admin_request_user(req, headers, db):
+    """Verify the caller is an admin; returns (user_info, None) or (None, error response)"""
+    user_info, auth_error = get_request_user(req)
+    if auth_error:
+        return None, (json.dumps({'error': auth_error[0]}), auth_error[1], headers)
+    if not is_admin_user(db, user_info):
+        return None, (json.dumps({'error': 'Admin privileges required'}), 403, headers)
+    return user_info, None
+
+def handle_admin_stats(req, headers):
+    """Serve global counters: users, attempts, per-quiz averages and per-topic mastery.
+
+    Pass `?refresh=1` to skip the instance cache. Admin only.
+    """
+    try:
+        db = get_firestore_client()
+        user_info, error_response = get_admin_request_user(req, headers, db)
+        if error_response:
+            return error_response
+
+        refresh = req.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        stats = get_admin_stats(db, refresh=refresh)
+        log_request_summary("Admin stats served", status=200, userId=user_info['uid'])
+        return (json.dumps(stats), 200, {**headers, 'Cache-Control': 'private, no-store'})
+
+    except Exception as e:
+        get_logger().error(f"Error in handle_admin_stats: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+def encode_admin_users_cursor(user_id):
+    """Opaque startAfter cursor for /admin/users: the last row's uid"""
+    return base64.urlsafe_b64encode(user_id.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_admin_users_cursor(cursor):
+    """Inverse of encode_admin_users_cursor; raises ValueError unless it holds a valid document id"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        user_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if (not user_id or '/' in user_id or user_id in ('.', '..') or len(user_id.encode('utf-8')) > 1500
+            or (user_id.startswith('__') and user_id.endswith('__'))):
+        raise ValueError('Invalid cursor')
+    return user_id
+
+def handle_admin_users(req, headers):
+    """List users one page at a time, ordered by uid.
+
+    `?limit=` sets the page size (default ADMIN_USERS_PAGE_SIZE, at most
+    ADMIN_USERS_MAX_PAGE_SIZE) and `?startAfter=` takes the previous page's
+    `nextCursor`, which is None on the last page. Admin only.
+    """
+    try:
+        db = get_firestore_client()
+        user_info, error_response = get_admin_request_user(req, headers, db)
+        if error_response:
+            return error_response
+
+        try:
+            limit = int(req.args.get('limit', ADMIN_USERS_PAGE_SIZE))
+        except ValueError:
+            response_data = {'error': 'limit must be an integer'}
+            return (json.dumps(response_data), 400, headers)
+        limit = max(1, min(limit, ADMIN_USERS_MAX_PAGE_SIZE))
+        after = None
+        if req.args.get('startAfter'):
+            try:
+                after = decode_admin_users_cursor(req.args['startAfter'])
+            except ValueError as e:
+                response_data = {'error': str(e)}
+                return (json.dumps(response_data), 400, headers)
+
+        query = db.collection('users').order_by('__name__').select(ADMIN_USER_FIELDS)
+        if after:
+            query = query.start_after({'__name__': after})
+        with timed_span('admin_users_read'):
+            docs = list(query.limit(limit).stream())
+
+        users = []
+        for doc in docs:
+            data = doc.to_dict() or {}
+            users.append({
+                'id': doc.id,
+                'email': data.get('email'),
+                'displayName': data.get('displayName'),
+                'isAdmin': data.get('isAdmin') is True,
+                'createdAt': serialize_timestamp(data.get('createdAt')),
+                'lastLoginAt': serialize_timestamp(data.get('lastLoginAt')),
+                'stats': derive_user_stats(data['stats']) if isinstance(data.get('stats'), dict) else None
+            })
+
         response_data = {
-            'success': True,
-            'attemptId': attempt_id,
-            'reportId': report_id,
-            'analysis': analysis_result,
-            'xpEarned': xp_earned,
-            'isPerfectScore': is_perfect_score,
-            'message': 'Quiz submitted and analyzed successfully'
+            'users': users,
+            'nextCursor': encode_admin_users_cursor(users[-1]['id']) if len(users) == limit else None
         }
-        return (json.dumps(response_data), 200, headers)
-        
+        log_request_summary("Admin user page served", status=200, userId=user_info['uid'], count=len(users))
+        return (json.dumps(response_data, default=str), 200, headers)
+
     except Exception as e:
-        logger = get_logger()
-        logger.error(f"Error in handle_submit_quiz: {str(e)}")
+        get_logger().error(f"Error in handle_admin_users: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+
+def get_topic_index_shard(question_id):
+    """Stable topic-index-shards document for a question id (the same on every instance)"""
+    return int(hashlib.sha1(str(question_id).encode('utf-8')).hexdigest()[:8], 16) % TOPIC_INDEX_SHARDS
+
+def build_topic_index_writes(db, entries, absolute=False):
+    """Build topic-index-shards writes for (question_id, topics) entries.
+
+    Ids are added with ArrayUnion under merge, so a retried import batch
+    cannot list a question twice. With absolute=True (rebuild) every shard is
+    written whole, empty ones included, replacing what was stored.
+    """
+    shards = {shard: {} for shard in range(TOPIC_INDEX_SHARDS)} if absolute else {}
+    for question_id, topics in entries:
+        shard = shards.setdefault(get_topic_index_shard(question_id), {})
+        for topic in topics:
+            shard.setdefault(str(topic), []).append(question_id)
+
+    firestore = get_firestore_module()
+    shards_ref = db.collection('topic-index-shards')
+    writes = []
+    for shard, topics in sorted(shards.items()):
+        questions = topics if absolute else {topic: firestore.ArrayUnion(ids) for topic, ids in topics.items()}
+        writes.append((shards_ref.document(str(shard)), {
+            'questions': questions,
+            'updatedAt': firestore.SERVER_TIMESTAMP
+        }, not absolute))
+    return writes
+
+def summarize_quiz_topics(quiz_data):
+    """Title, difficulty and per-topic question counts of a quiz document"""
+    questions = quiz_data.get('questions') or []
+    topics = {}
+    for question in questions:
+        if isinstance(question, dict):
+            for topic in get_question_topics(question):
+                topics[str(topic)] = topics.get(str(topic), 0) + 1
+    if not topics:
+        # Quizzes with questions in the legacy subcollection only list their topics
+        topics = {str(topic): 0 for topic in quiz_data.get('topics') or []}
+    return {
+        'title': quiz_data.get('title'),
+        'difficulty': quiz_data.get('difficulty'),
+        'questionCount': len(questions),
+        'topics': topics
+    }
+
+def new_topic_index():
+    return {
+        'questions': {}, 'shards': {}, 'quizzes': {}, 'quizzesByTopic': {},
+        'shardWatermark': None, 'quizWatermark': None, 'checkedAt': None, 'loadedAt': None
+    }
+
+def apply_topic_index_shard(index, shard_id, shard_data):
+    """Replace one shard's question ids in an index (hold _topic_index_lock for the live one)"""
+    questions = index['questions']
+    for topic in index['shards'].get(shard_id, {}):
+        by_shard = questions.get(topic)
+        if by_shard is not None:
+            by_shard.pop(shard_id, None)
+            if not by_shard:
+                del questions[topic]
+
+    shard_topics = {topic: ids for topic, ids in (shard_data.get('questions') or {}).items() if ids}
+    index['shards'][shard_id] = shard_topics
+    for topic, ids in shard_topics.items():
+        questions.setdefault(topic, {})[shard_id] = ids
+
+def apply_topic_index_quiz(index, quiz_id, summary):
+    """Replace one quiz in an index (hold _topic_index_lock for the live one)"""
+    by_topic = index['quizzesByTopic']
+    previous = index['quizzes'].pop(quiz_id, None)
+    for topic in (previous or {}).get('topics', {}):
+        entries = [entry for entry in by_topic.get(topic, []) if entry[1] != quiz_id]
+        if entries:
+            by_topic[topic] = entries
+        else:
+            by_topic.pop(topic, None)
+
+    index['quizzes'][quiz_id] = summary
+    for topic, count in summary['topics'].items():
+        entries = by_topic.setdefault(topic, [])
+        entries.append((count, quiz_id))
+        entries.sort(key=lambda entry: (-entry[0], entry[1]))
+
+def latest_timestamp(current, values):
+    """Newest of a watermark and some document timestamps (non-timestamps are ignored)"""
+    candidates = [value for value in values if isinstance(value, datetime)]
+    if current is not None:
+        candidates.append(current)
+    return max(candidates) if candidates else None
+
+def load_topic_index(db, full=False):
+    """Bring this instance's topic index up to date.
+
+    A full load reads every shard and quiz and swaps in a new index.
+    Otherwise only shards and quizzes updated since the last load are read,
+    which costs one read per query when nothing changed. The quiz watermark
+    also advances to the load's start time, so quizzes without an updatedAt
+    are not re-read by every refresh.
+    """
+    started_at = datetime.now(timezone.utc)
+    with _topic_index_lock:
+        shard_watermark = None if full else _topic_index['shardWatermark']
+        quiz_watermark = None if full else _topic_index['quizWatermark']
+
+    shards_query = db.collection('topic-index-shards')
+    quizzes_query = db.collection('quizzes')
+    if shard_watermark is not None:
+        shards_query = shards_query.where('updatedAt', '>', shard_watermark)
+    if quiz_watermark is not None:
+        quizzes_query = quizzes_query.where(
+            'updatedAt', '>', quiz_watermark - timedelta(seconds=TOPIC_INDEX_QUIZ_CLOCK_SKEW_SECONDS)
+        )
+    with timed_span('topic_index_read'):
+        shards = {doc.id: doc.to_dict() or {} for doc in shards_query.stream()}
+        quizzes = {doc.id: doc.to_dict() or {} for doc in quizzes_query.stream()}
+    summaries = {quiz_id: summarize_quiz_topics(quiz_data) for quiz_id, quiz_data in quizzes.items()}
+
+    def apply(index):
+        for shard_id, shard_data in shards.items():
+            apply_topic_index_shard(index, shard_id, shard_data)
+        for quiz_id, summary in summaries.items():
+            apply_topic_index_quiz(index, quiz_id, summary)
+        index['shardWatermark'] = latest_timestamp(
+            index['shardWatermark'], [shard_data.get('updatedAt') for shard_data in shards.values()])
+        index['quizWatermark'] = latest_timestamp(
+            index['quizWatermark'], [started_at] + [quiz_data.get('updatedAt') for quiz_data in quizzes.values()])
+        index['checkedAt'] = time.monotonic()
+
+    if full:
+        # Build the replacement outside the lock so lookups are not held up
+        index = new_topic_index()
+        apply(index)
+        index['loadedAt'] = index['checkedAt']
+        with _topic_index_lock:
+            _topic_index.update(index)
+    else:
+        with _topic_index_lock:
+            apply(_topic_index)
+    annotate_request(topicIndexRefresh='full' if full else 'incremental', topicIndexDocs=len(shards) + len(quizzes))
+
+def refresh_topic_index(db):
+    """Load the topic index on first use and refresh it when it is due.
+
+    One request refreshes at a time; the others keep serving the current
+    index, and a failed refresh keeps it too. Only the very first load
+    makes requests wait (and raises on failure).
+    """
+    now = time.monotonic()
+    with _topic_index_lock:
+        loaded_at, checked_at = _topic_index['loadedAt'], _topic_index['checkedAt']
+    full = loaded_at is None or now - loaded_at >= TOPIC_INDEX_FULL_REFRESH_SECONDS
+    if not full and now - checked_at < TOPIC_INDEX_REFRESH_SECONDS:
+        return
+    if not _topic_index_refresh_lock.acquire(blocking=loaded_at is None):
+        return
+    try:
+        with _topic_index_lock:
+            if loaded_at is None and _topic_index['loadedAt'] is not None:
+                return
+        load_topic_index(db, full=full)
+    except Exception as e:
+        if loaded_at is None:
+            raise
+        get_logger().warning(f"Topic index refresh failed, serving the previous index: {str(e)}")
+    finally:
+        _topic_index_refresh_lock.release()
+
+def add_questions_to_topic_index(entries):
+    """Add just-committed (question_id, topics) entries to this instance's index"""
+    with _topic_index_lock:
+        if _topic_index['loadedAt'] is None:
+            return
+        for question_id, topics in entries:
+            shard_id = str(get_topic_index_shard(question_id))
+            shard_topics = _topic_index['shards'].setdefault(shard_id, {})
+            for topic in topics:
+                topic = str(topic)
+                ids = shard_topics.get(topic)
+                if ids is None:
+                    ids = shard_topics[topic] = []
+                    _topic_index['questions'].setdefault(topic, {})[shard_id] = ids
+                ids.append(question_id)
+
+def pick_topic_questions(topic, start, count):
+    """Up to `count` question ids of a topic, from position `start` of its ids (wrapping).
+
+    Costs O(shards + count) whatever the size of the topic.
+    """
+    with _topic_index_lock:
+        by_shard = _topic_index['questions'].get(topic)
+        if not by_shard or count <= 0:
+            return []
+        id_lists = [by_shard[shard_id] for shard_id in sorted(by_shard)]
+        total = sum(len(ids) for ids in id_lists)
+        count = min(count, total)
+        position = start % total
+        list_index = 0
+        while position >= len(id_lists[list_index]):
+            position -= len(id_lists[list_index])
+            list_index += 1
+
+        picked = []
+        while len(picked) < count:
+            ids = id_lists[list_index]
+            picked.extend(ids[position:position + count - len(picked)])
+            list_index = (list_index + 1) % len(id_lists)
+            position = 0
+        return picked
+
+def pick_topic_quizzes(topic, count, exclude=None):
+    """Quizzes with the most questions on a topic, skipping `exclude` (the quiz just taken)"""
+    with _topic_index_lock:
+        picked = []
+        for topic_questions, quiz_id in _topic_index['quizzesByTopic'].get(topic, []):
+            if len(picked) == count:
+                break
+            if quiz_id == exclude:
+                continue
+            quiz = _topic_index['quizzes'][quiz_id]
+            picked.append({
+                'quizId': quiz_id,
+                'title': quiz['title'],
+                'difficulty': quiz['difficulty'],
+                'questionCount': quiz['questionCount'],
+                'topicQuestions': topic_questions
+            })
+        return picked
+
+def get_topic_index_stats():
+    """Size and age of this instance's topic index"""
+    with _topic_index_lock:
+        loaded_at = _topic_index['loadedAt']
+        return {
+            'topics': len(_topic_index['questions']),
+            'questions': sum(len(ids) for shard in _topic_index['shards'].values() for ids in shard.values()),
+            'quizzes': len(_topic_index['quizzes']),
+            'ageSeconds': round(time.monotonic() - loaded_at, 1) if loaded_at is not None else None
+        }
+
+def rank_weak_topics(progress):
+    """Topics to work on, weakest first.
+
+    "Learn from Scratch" comes before "Needs Revision", then lower cumulative
+    accuracy; mastered topics are left out.
+    """
+    priority = {'Learn from Scratch': 0, 'Needs Revision': 1}
+    ranked = []
+    for entry in progress:
+        correct, total = entry.get('correct', 0), entry.get('total', 0)
+        classification = classify_topic_performance(correct, total)
+        if classification in priority:
+            ranked.append({**entry, 'classification': classification, 'percentage': round(correct / total * 100, 1)})
+    ranked.sort(key=lambda entry: (priority[entry['classification']], entry['percentage'], str(entry['topic'])))
+    return ranked
+
+def handle_recommendations(req, headers):
+    """Recommend questions and quizzes for the caller's weakest topics.
+
+    Topics come from the caller's topic-progress documents, classified with
+    classify_topic_performance; candidates are in-memory lookups in the
+    topic index. The picked questions (text and options, never the answer)
+    are then fetched by id in one batched read. `?topics=` sets how many
+    topics to return (default RECOMMENDATION_TOPICS) and `?questions=` the
+    questions per topic (default RECOMMENDATION_QUESTIONS). Questions rotate
+    as the user keeps practising a topic.
+    """
+    try:
+        db = get_firestore_client()
+        user_info, auth_error = get_request_user(req)
+        if auth_error:
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+        user_id = user_info['uid']
+
+        try:
+            topic_limit = int(req.args.get('topics', RECOMMENDATION_TOPICS))
+            question_limit = int(req.args.get('questions', RECOMMENDATION_QUESTIONS))
+        except ValueError:
+            response_data = {'error': 'topics and questions must be integers'}
+            return (json.dumps(response_data), 400, headers)
+        topic_limit = max(1, min(topic_limit, RECOMMENDATION_MAX_TOPICS))
+        question_limit = max(0, min(question_limit, RECOMMENDATION_MAX_QUESTIONS))
+
+        refresh_topic_index(db)
+
+        query = (db.collection('users').document(user_id).collection('topic-progress')
+                 .select(TOPIC_PROGRESS_FIELDS)
+                 .order_by('lastSeenAt', direction=get_firestore_module().Query.DESCENDING)
+                 .limit(RECOMMENDATION_MAX_PROGRESS_DOCS))
+        with timed_span('topic_progress_read'):
+            progress = [doc.to_dict() or {} for doc in query.stream()]
+
+        recommendations = []
+        picked_ids = []
+        for entry in rank_weak_topics(entry for entry in progress if entry.get('topic') is not None):
+            topic = str(entry['topic'])
+            # Start where the previous practice left off (per-user offset, so
+            # users on the same topic see different questions)
+            start = int(hashlib.sha1(f'{user_id}:{topic}'.encode('utf-8')).hexdigest()[:8], 16)
+            start += entry.get('attempts', 0) * question_limit
+            question_ids = pick_topic_questions(topic, start, question_limit)
+            quizzes = pick_topic_quizzes(topic, RECOMMENDATION_QUIZZES, exclude=entry.get('lastQuizId'))
+            if not question_ids and not quizzes:
+                continue
+            picked_ids.append(question_ids)
+            recommendations.append({
+                'topic': topic,
+                'classification': entry['classification'],
+                'correct': entry.get('correct', 0),
+                'total': entry.get('total', 0),
+                'percentage': entry['percentage'],
+                'quizzes': quizzes
+            })
+            if len(recommendations) == topic_limit:
+                break
+
+        questions_ref = db.collection('questions')
+        unique_ids = dict.fromkeys(question_id for question_ids in picked_ids for question_id in question_ids)
+        refs = [questions_ref.document(question_id) for question_id in unique_ids]
+        questions = {}
+        if refs:
+            with timed_span('questions_read'):
+                for doc in db.get_all(refs, field_paths=RECOMMENDED_QUESTION_FIELDS):
+                    if doc.exists:
+                        questions[doc.id] = {'questionId': doc.id, **doc.to_dict()}
+        # Ids of questions deleted since the index was built are skipped
+        for recommendation, question_ids in zip(recommendations, picked_ids):
+            recommendation['questions'] = [questions[question_id] for question_id in question_ids
+                                           if question_id in questions]
+
+        log_request_summary("Recommendations served", status=200, userId=user_id,
+                            progressTopics=len(progress), count=len(recommendations), questions=len(questions))
+        response_data = {
+            'recommendations': recommendations,
+            'generatedAt': datetime.utcnow().isoformat()
+        }
+        return (json.dumps(response_data), 200, {**headers, 'Cache-Control': 'private, no-store'})
+
+    except Exception as e:
+        get_logger().error(f"Error in handle_recommendations: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+
+def get_user_stats(user_doc):
+    """The stats map of a users/{uid} snapshot ({} for a new user)"""
+    data = user_doc.to_dict() if user_doc is not None and user_doc.exists else None
+    return (data or {}).get('stats') or {}
+
+def seconds_since(timestamp):
+    """Age in seconds of a stored timestamp (naive values are taken as UTC)"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - timestamp).total_seconds()
+
+def assign_competition_ranks(entries, score_field):
+    """Number entries sorted best-first 1, 2, 2, 4... (ties share a rank)"""
+    for position, entry in enumerate(entries):
+        tied = position and entry[score_field] == entries[position - 1][score_field]
+        entry['rank'] = entries[position - 1]['rank'] if tied else position + 1
+    return entries
+
+def build_global_leaderboard(db):
+    """Top LEADERBOARD_SIZE users by totalXP, read with one ordered, limited query"""
+    query = (db.collection('users')
+             .order_by('stats.totalXP', direction=get_firestore_module().Query.DESCENDING)
+             .select(['displayName', 'stats.totalXP'])
+             .limit(LEADERBOARD_SIZE))
+    entries = []
+    for doc in query.stream():
+        data = doc.to_dict() or {}
+        total_xp = (data.get('stats') or {}).get('totalXP', 0)
+        entries.append({
+            'userId': doc.id,
+            'displayName': data.get('displayName') or 'Anonymous',
+            'totalXP': total_xp,
+            'level': get_level(total_xp)
+        })
+    return {'entries': assign_competition_ranks(entries, 'totalXP')}
+
+def build_quiz_leaderboard(db, quiz_id):
+    """Best attempt of the top LEADERBOARD_SIZE users on a quiz (None if the quiz is gone).
+
+    Reads the QUIZ_LEADERBOARD_SCAN_FACTOR * LEADERBOARD_SIZE best attempts
+    and keeps each user's best (earliest on ties), so the board can list
+    fewer users when a few users hold most of the top attempts.
+    """
+    quiz_doc = db.collection('quizzes').document(quiz_id).get(field_paths=['title'])
+    if not quiz_doc.exists:
+        return None
+
+    firestore = get_firestore_module()
+    query = (db.collection('quiz-attempts')
+             .where('quizId', '==', quiz_id)
+             .order_by('percentage', direction=firestore.Query.DESCENDING)
+             .order_by('completedAt')
+             .select(['userId', 'percentage', 'score', 'totalQuestions', 'completedAt'])
+             .limit(LEADERBOARD_SIZE * QUIZ_LEADERBOARD_SCAN_FACTOR))
+    best = {}
+    for doc in query.stream():
+        data = doc.to_dict() or {}
+        if data.get('userId') and data['userId'] not in best:
+            best[data['userId']] = data
+            if len(best) == LEADERBOARD_SIZE:
+                break
+
+    users_ref = db.collection('users')
+    names = {}
+    if best:
+        for doc in db.get_all([users_ref.document(user_id) for user_id in best], field_paths=['displayName']):
+            names[doc.id] = (doc.to_dict() or {}).get('displayName') if doc.exists else None
+
+    entries = [{
+        'userId': user_id,
+        'displayName': names.get(user_id) or 'Anonymous',
+        'percentage': data.get('percentage', 0),
+        'score': data.get('score', 0),
+        'totalQuestions': data.get('totalQuestions', 0),
+        'completedAt': serialize_timestamp(data.get('completedAt'))
+    } for user_id, data in best.items()]
+    return {'quizId': quiz_id, 'quizTitle': (quiz_doc.to_dict() or {}).get('title'),
+            'entries': assign_competition_ranks(entries, 'percentage')}
+
+def get_leaderboard(db, board_id, build_board, refresh_seconds=None):
+    """Return a leaderboard snapshot, rebuilding it when it is stale.
+
+    Served from the instance cache for LEADERBOARD_CACHE_TTL_SECONDS, then
+    from leaderboards/{board_id}; only a snapshot older than refresh_seconds
+    (default LEADERBOARD_REFRESH_SECONDS) is rebuilt with build_board() and
+    stored. Returns None when build_board does (nothing to rank).
+    """
+    if refresh_seconds is None:
+        refresh_seconds = LEADERBOARD_REFRESH_SECONDS
+    now = time.monotonic()
+    with _leaderboard_lock:
+        entry = _leaderboard_cache.get(board_id)
+        if entry is not None and now < entry['expiresAt']:
+            _leaderboard_cache.move_to_end(board_id)
+            annotate_request(leaderboardCacheHit=True)
+            return entry['data']
+    annotate_request(leaderboardCacheHit=False)
+
+    board_ref = db.collection('leaderboards').document(board_id)
+    with timed_span('leaderboard_read'):
+        board_doc = board_ref.get()
+    board = board_doc.to_dict() if board_doc.exists else None
+    if board is None or seconds_since(board['generatedAt']) >= refresh_seconds:
+        with timed_span('leaderboard_build'):
+            board = build_board()
+        if board is None:
+            return None
+        board['generatedAt'] = datetime.now(timezone.utc)
+        board_ref.set(board)
+        annotate_request(leaderboardRebuilt=True)
+
+    data = {**board, 'generatedAt': serialize_timestamp(board['generatedAt'])}
+    with _leaderboard_lock:
+        _leaderboard_cache[board_id] = {'data': data, 'expiresAt': now + LEADERBOARD_CACHE_TTL_SECONDS}
+        _leaderboard_cache.move_to_end(board_id)
+        while len(_leaderboard_cache) > LEADERBOARD_CACHE_MAX_ENTRIES:
+            _leaderboard_cache.popitem(last=False)
+    return data
+
+def get_xp_thresholds(max_xp):
+    """XP thresholds for the histogram: 0, then steps growing by LEADERBOARD_BUCKET_GROWTH.
+
+    Thresholds are multiples of LEADERBOARD_BUCKET_XP, so the crowded low
+    end is finely resolved, and the last one lies above max_xp; ~50
+    thresholds cover a million XP.
+    """
+    thresholds = [0]
+    while thresholds[-1] <= max_xp:
+        step = thresholds[-1] * LEADERBOARD_BUCKET_GROWTH
+        step = -(-step // LEADERBOARD_BUCKET_XP) * LEADERBOARD_BUCKET_XP
+        thresholds.append(int(max(step, thresholds[-1] + LEADERBOARD_BUCKET_XP)))
+    return thresholds
+
+def build_xp_histogram(db):
+    """Count users between consecutive XP thresholds with count() aggregations.
+
+    Nothing on the submission path maintains the histogram; it is rebuilt
+    from the users collection every LEADERBOARD_HISTOGRAM_REFRESH_SECONDS.
+    count() is billed one read per 1,000 index entries and the ranges do
+    not overlap, so a rebuild costs about users / 1,000 reads plus one per
+    threshold.
+    """
+    users_ref = db.collection('users')
+    top = list(users_ref.order_by('stats.totalXP', direction=get_firestore_module().Query.DESCENDING)
+               .select(['stats.totalXP']).limit(1).stream())
+    max_xp = ((top[0].to_dict() or {}).get('stats') or {}).get('totalXP', 0) if top else 0
+    thresholds = get_xp_thresholds(max_xp)
+    counts = []
+    for lower, upper in zip(thresholds, thresholds[1:] + [None]):
+        query = users_ref.where('stats.totalXP', '>=', lower)
+        if upper is not None:
+            query = query.where('stats.totalXP', '<', upper)
+        counts.append(query.count().get()[0][0].value)
+    return {'thresholds': thresholds, 'counts': counts}
+
+def estimate_rank(histogram, total_xp):
+    """Return (rank, ranked_users) for an XP total from the XP histogram.
+
+    rank is 1 + the users with more XP: those in higher ranges are counted
+    exactly, and the others in the user's own range are assumed to be spread
+    evenly over it.
+    """
+    thresholds, counts = histogram['thresholds'], histogram['counts']
+    position = max(index for index, threshold in enumerate(thresholds) if threshold <= max(0, total_xp))
+    above = sum(counts[position + 1:])
+    if position + 1 < len(thresholds):
+        upper, lower = thresholds[position + 1], thresholds[position]
+        share_above = min(1.0, max(0.0, (upper - total_xp) / (upper - lower)))
+    else:
+        share_above = 0.0
+    ahead_in_range = round(max(0, counts[position] - 1) * share_above)
+    rank = above + ahead_in_range + 1
+    return rank, max(rank, sum(counts))
+
+def etag_json_response(req, headers, response_data, cache_control):
+    """JSON response with an ETag; a matching If-None-Match gets an empty 304"""
+    body = json.dumps(response_data, default=str)
+    etag = '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+    response_headers = {**headers, 'ETag': etag, 'Cache-Control': cache_control}
+    if_none_match = {tag.strip().removeprefix('W/') for tag in (req.headers.get('If-None-Match') or '').split(',')}
+    if etag in if_none_match or '*' in if_none_match:
+        return ('', 304, response_headers)
+    return (body, 200, response_headers)
+
+def handle_leaderboard(req, headers):
+    """Serve the global XP leaderboard, or with `?quizId=` a quiz's best scores.
+
+    The global board is public and identical for every caller, so clients
+    and the CDN may cache it for LEADERBOARD_MAX_AGE_SECONDS and revalidate
+    with the ETag. Quiz boards require a signed-in user, so anonymous traffic
+    cannot make the function query arbitrary quiz ids. Entries carry display
+    names only, never user ids. `?limit=` trims the list (at most
+    LEADERBOARD_SIZE).
+    """
+    try:
+        db = get_firestore_client()
+        try:
+            limit = int(req.args.get('limit', LEADERBOARD_SIZE))
+        except ValueError:
+            response_data = {'error': 'limit must be an integer'}
+            return (json.dumps(response_data), 400, headers)
+        limit = max(1, min(limit, LEADERBOARD_SIZE))
+
+        quiz_id = req.args.get('quizId')
+        if quiz_id:
+            user_info, auth_error = get_request_user(req)
+            if auth_error:
+                response_data = {'error': auth_error[0]}
+                return (json.dumps(response_data), auth_error[1], headers)
+            if '/' in quiz_id:
+                response_data = {'error': 'Invalid quizId'}
+                return (json.dumps(response_data), 400, headers)
+            board = get_leaderboard(db, f'quiz-{quiz_id}', lambda: build_quiz_leaderboard(db, quiz_id))
+            if board is None:
+                response_data = {'error': 'Quiz not found'}
+                return (json.dumps(response_data), 404, headers)
+            cache_control = f'private, max-age={int(LEADERBOARD_MAX_AGE_SECONDS)}'
+        else:
+            board = get_leaderboard(db, 'global', lambda: build_global_leaderboard(db))
+            cache_control = f'public, max-age={int(LEADERBOARD_MAX_AGE_SECONDS)}'
+
+        annotate_request(quizId=quiz_id)
+        entries = [{key: value for key, value in entry.items() if key != 'userId'}
+                   for entry in board['entries'][:limit]]
+        response_data = {**board, 'entries': entries}
+        return etag_json_response(req, headers, response_data, cache_control)
+
+    except Exception as e:
+        get_logger().error(f"Error in handle_leaderboard: {str(e)}")
+        response_data = {'error': 'Internal server error'}
+        return (json.dumps(response_data), 500, headers)
+
+def handle_leaderboard_me(req, headers):
+    """Return the caller's global XP rank.
+
+    Users in the global top LEADERBOARD_SIZE get their exact rank from the
+    snapshot; everyone else gets an estimate from the XP histogram.
+    """
+    try:
+        db = get_firestore_client()
+        user_info, auth_error = get_request_user(req)
+        if auth_error:
+            response_data = {'error': auth_error[0]}
+            return (json.dumps(response_data), auth_error[1], headers)
+        user_id = user_info['uid']
+
+        with timed_span('user_read'):
+            stats = get_user_stats(db.collection('users').document(user_id).get(field_paths=LEADERBOARD_USER_FIELDS))
+        total_xp = stats.get('totalXP', 0)
+        board = get_leaderboard(db, 'global', lambda: build_global_leaderboard(db))
+        histogram = get_leaderboard(db, 'xp-histogram', lambda: build_xp_histogram(db),
+                                    LEADERBOARD_HISTOGRAM_REFRESH_SECONDS)
+
+        rank, ranked_users = None, sum(histogram['counts'])
+        rank_is_exact = False
+        if stats.get('totalQuizzesTaken', 0) > 0:
+            top_entry = next((entry for entry in board['entries'] if entry['userId'] == user_id), None)
+            if top_entry is not None:
+                rank, rank_is_exact = top_entry['rank'], True
+                ranked_users = max(ranked_users, len(board['entries']))
+            else:
+                rank, ranked_users = estimate_rank(histogram, total_xp)
+                if len(board['entries']) == LEADERBOARD_SIZE:
+                    # Not on the board, so at least just below it
+                    rank = max(rank, LEADERBOARD_SIZE + 1)
+                    ranked_users = max(ranked_users, rank)
+
+        annotate_request(userId=user_id)
+        response_data = {
+            'userId': user_id,
+            'totalXP': total_xp,
+            'level': get_level(total_xp),
+            'rank': rank,
+            'rankIsExact': rank_is_exact,
+            'rankedUsers': ranked_users,
+            'percentile': round(100 * (1 - (rank - 1) / ranked_users), 1) if rank else None,
+            'leaderboardGeneratedAt': board['generatedAt'],
+            'histogramGeneratedAt': histogram['generatedAt']
+        }
+        return etag_json_response(req, headers, response_data, f'private, max-age={int(LEADERBOARD_MAX_AGE_SECONDS) // 2}')
+
+    except Exception as e:
+        get_logger().error(f"Error in handle_leaderboard_me: {str(e)}")
         response_data = {'error': 'Internal server error'}
         return (json.dumps(response_data), 500, headers)
 
+if FIRESTORE_WARMUP == 'eager':
+    warm_up_firestore()
+elif FIRESTORE_WARMUP == 'background':
+    threading.Thread(target=warm_up_firestore, name='firestore-warmup', daemon=True).start()
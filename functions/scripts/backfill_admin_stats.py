@@ -0,0 +1,68 @@
+"""Rebuild the admin-stats-shards counters from existing quiz-attempts.
+
+/submitQuiz increments the shards from the moment they were introduced; run
+this once to fold in earlier attempts. The recomputed totals are written to
+the partitions of replica 0 and every other shard document (including ones
+from the older one-document-per-replica layout) is deleted, so run it while
+submissions are quiet (an attempt recorded during the rebuild would be
+counted twice or lost).
+
+Usage (from the functions/ directory, with application default credentials):
+    python -m scripts.backfill_admin_stats --dry-run
+    python -m scripts.backfill_admin_stats
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import (  # noqa: E402
+    FIRESTORE_MAX_BATCH_WRITES, build_admin_stats_writes, commit_writes, get_firestore_client, get_logger
+)
+
+ATTEMPT_FIELDS = ['quizId', 'quizTitle', 'completedAt', 'percentage', 'isPerfectScore', 'xpEarned', 'topicBreakdown']
+
+
+def stream_attempts(db):
+    """Yield the fields of quiz-attempts needed to rebuild the admin counters"""
+    for doc in db.collection('quiz-attempts').select(ATTEMPT_FIELDS).stream():
+        attempt = doc.to_dict()
+        if attempt.get('quizId') and attempt.get('completedAt'):
+            yield attempt
+
+
+def backfill(db, dry_run=False):
+    attempts = list(stream_attempts(db))
+    writes = build_admin_stats_writes(db, attempts, shard=0, absolute=True)
+    quizzes = sum(len(data.get('quizzes', {})) for _, data in writes)
+    topics = sum(len(data.get('topics', {})) for _, data in writes)
+
+    logger = get_logger()
+    if dry_run:
+        logger.info(f"[dry run] {len(attempts)} attempts -> {quizzes} quizzes, {topics} topics "
+                    f"in {len(writes)} partitions")
+        return
+
+    commit_writes(db, [(ref, data, False) for ref, data in writes])
+    written = {ref.id for ref, _ in writes}
+    stale = [doc.reference for doc in db.collection('admin-stats-shards').select([]).stream()
+             if doc.id not in written]
+    for start in range(0, len(stale), FIRESTORE_MAX_BATCH_WRITES):
+        batch = db.batch()
+        for ref in stale[start:start + FIRESTORE_MAX_BATCH_WRITES]:
+            batch.delete(ref)
+        batch.commit()
+    logger.info(f"Backfill finished: {len(attempts)} attempts, {quizzes} quizzes, {topics} topics; "
+                f"{len(stale)} old shard documents removed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='report what would be written')
+    args = parser.parse_args()
+    backfill(get_firestore_client(), dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
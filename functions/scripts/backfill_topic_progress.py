@@ -0,0 +1,65 @@
+"""Rebuild users/{uid}/topic-progress documents from existing quiz-attempts.
+
+Topic progress is maintained incrementally by /submitQuiz from the moment it
+was introduced; run this once to fold in attempts made before that. Each
+topic document is overwritten with totals recomputed from quiz-attempts, so
+run it while submissions are quiet (an attempt recorded between the read and
+the write for the same user would be counted twice or lost).
+
+Usage (from the functions/ directory, with application default credentials):
+    python -m scripts.backfill_topic_progress --dry-run
+    python -m scripts.backfill_topic_progress --user <uid>
+    python -m scripts.backfill_topic_progress
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import build_topic_progress_writes, commit_writes, get_firestore_client, get_logger  # noqa: E402
+
+ATTEMPT_FIELDS = ['userId', 'quizId', 'completedAt', 'topicBreakdown']
+
+
+def stream_attempts(db, user_id=None):
+    """Yield the fields of quiz-attempts needed to rebuild topic progress"""
+    query = db.collection('quiz-attempts')
+    if user_id:
+        query = query.where('userId', '==', user_id)
+    for doc in query.select(ATTEMPT_FIELDS).stream():
+        attempt = doc.to_dict()
+        if attempt.get('userId') and attempt.get('completedAt') and attempt.get('topicBreakdown'):
+            yield attempt
+
+
+def backfill(db, user_id=None, dry_run=False):
+    attempts_by_user = {}
+    for attempt in stream_attempts(db, user_id):
+        attempts_by_user.setdefault(attempt['userId'], []).append(attempt)
+
+    logger = get_logger()
+    topic_documents = 0
+    for uid, attempts in attempts_by_user.items():
+        writes = build_topic_progress_writes(db, uid, attempts, absolute=True)
+        topic_documents += len(writes)
+        if dry_run:
+            logger.info(f"[dry run] {uid}: {len(attempts)} attempts -> {len(writes)} topic documents")
+            continue
+        commit_writes(db, [(ref, data, False) for ref, data in writes])
+        logger.info(f"{uid}: rebuilt {len(writes)} topic documents from {len(attempts)} attempts")
+
+    logger.info(f"Backfill finished: {len(attempts_by_user)} users, {topic_documents} topic documents"
+                + (" (dry run)" if dry_run else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--user', help='only rebuild this uid')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be written')
+    args = parser.parse_args()
+    backfill(get_firestore_client(), user_id=args.user, dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Rebuild the topic-index-shards documents from the questions collection.
+
+/importQuestions adds the questions it writes to the index; run this once to
+index questions that existed before, or after questions were deleted or
+edited outside an import. Every shard is rewritten whole, so run it while no
+import is in progress (questions imported during the rebuild could be
+dropped from the index until the next rebuild). Instances pick the new
+shards up on their next refresh.
+
+Usage (from the functions/ directory, with application default credentials):
+    python -m scripts.build_topic_index --dry-run
+    python -m scripts.build_topic_index
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import (  # noqa: E402
+    build_topic_index_writes, get_firestore_client, get_logger, get_question_topics
+)
+
+QUESTION_FIELDS = ['topic', 'topics']
+
+
+def stream_question_topics(db):
+    """Yield (question_id, topics) for every document in the questions collection"""
+    for doc in db.collection('questions').select(QUESTION_FIELDS).stream():
+        yield doc.id, get_question_topics(doc.to_dict() or {})
+
+
+def build(db, dry_run=False):
+    entries = list(stream_question_topics(db))
+    writes = build_topic_index_writes(db, entries, absolute=True)
+    topics = {topic for _, question_topics in entries for topic in question_topics}
+    largest = max(sum(len(ids) for ids in data['questions'].values()) for _, data, _ in writes)
+
+    logger = get_logger()
+    if dry_run:
+        logger.info(f"[dry run] {len(entries)} questions, {len(topics)} topics -> {len(writes)} shards "
+                    f"(largest holds {largest} ids)")
+        return
+
+    # Shards are written one at a time: together they can exceed the 10 MiB
+    # request limit of a single WriteBatch
+    for ref, data, merge in writes:
+        ref.set(data, merge=merge)
+    logger.info(f"Topic index rebuilt: {len(entries)} questions, {len(topics)} topics, {len(writes)} shards")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='report what would be written')
+    args = parser.parse_args()
+    build(get_firestore_client(), dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
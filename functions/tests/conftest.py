@@ -0,0 +1,54 @@
+"""Shared fixtures: the in-memory Firestore stand-in, a Firebase app and locally signed ID tokens."""
+from collections import OrderedDict
+
+import firebase_admin
+import pytest
+
+import main
+from benchmarks.memory_firestore import MemoryAsyncFirestore, MemoryFirestore
+from benchmarks.token_cache_check import PROJECT_ID, make_credential, make_key, make_signer
+
+
+@pytest.fixture(scope='session')
+def rsa_key():
+    """Throwaway RSA key for signing ID tokens (generating one takes a moment, so share it)"""
+    return make_key()
+
+
+@pytest.fixture(scope='session')
+def firebase_app(rsa_key):
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    return firebase_admin.initialize_app(make_credential(rsa_key), options={'projectId': PROJECT_ID})
+
+
+@pytest.fixture(scope='session')
+def signer(rsa_key):
+    return make_signer(rsa_key)
+
+
+@pytest.fixture
+def auth_emulator(monkeypatch, firebase_app):
+    """Auth-emulator mode: locally minted tokens verify without a signature check"""
+    monkeypatch.setenv('FIREBASE_AUTH_EMULATOR_HOST', 'localhost:9099')
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """Point main at a fresh in-memory Firestore with empty instance caches"""
+    db = MemoryFirestore()
+    monkeypatch.setattr(main, 'db', db)
+    monkeypatch.setattr(main, 'async_db', MemoryAsyncFirestore(db))
+    monkeypatch.setattr(main, '_quiz_snapshot_cache', OrderedDict())
+    monkeypatch.setattr(main, '_persisted_snapshot_ids', set())
+    main.invalidate_quiz_cache()
+    main.evict_token_cache()
+    yield db
+    main.invalidate_quiz_cache()
+    main.evict_token_cache()
+
+
+@pytest.fixture
+def app():
+    from benchmarks.load_harness import build_app
+    return build_app()
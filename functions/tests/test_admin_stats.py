@@ -0,0 +1,51 @@
+"""Admin counters ride in the submission's single commit."""
+import pytest
+
+import main
+from benchmarks.grading_benchmark import make_quiz
+from benchmarks.token_cache_check import mint_token
+
+QUESTIONS = 10
+
+
+@pytest.fixture(params=['sync', 'async'])
+def client(request, app, memory_db, auth_emulator, signer, monkeypatch):
+    monkeypatch.setattr(main, 'SUBMIT_PIPELINE', request.param)
+    for quiz_id in ('quiz-1', 'quiz-2'):
+        memory_db.collection('quizzes').document(quiz_id).set({
+            'title': f'Quiz {quiz_id}', 'questions': make_quiz(QUESTIONS, num_topics=40)
+        })
+    headers = {'Authorization': f'Bearer {mint_token(signer, "student-1")}'}
+    test_client = app.test_client()
+    return lambda path, body: test_client.post(path, json=body, headers=headers)
+
+
+def submission(quiz_id, answer):
+    return {'quizId': quiz_id, 'answers': {str(i): answer for i in range(QUESTIONS)}, 'timeSpent': 60}
+
+
+def test_single_submission_is_one_commit(client, memory_db):
+    # Warm the quiz cache and store the quiz snapshot first
+    client('/submitQuiz', submission('quiz-1', 0))
+    commits = memory_db.commits
+
+    response = client('/submitQuiz', submission('quiz-1', 1))
+
+    assert response.status_code == 200
+    assert memory_db.commits - commits == 1
+    stats = main.get_admin_stats(memory_db, refresh=True)
+    assert stats['attempts'] == 2
+    assert [(quiz['quizId'], quiz['attempts']) for quiz in stats['quizzes']] == [('quiz-1', 2)]
+
+
+def test_batch_counters_commit_with_their_chunk(client, memory_db):
+    body = {'submissions': [submission(quiz_id, answer) for quiz_id in ('quiz-1', 'quiz-2') for answer in range(3)]}
+    commits = memory_db.commits
+
+    response = client('/submitQuizBatch', body)
+
+    assert response.get_json()['succeeded'] == 6
+    assert memory_db.commits - commits == 1
+    stats = main.get_admin_stats(memory_db, refresh=True)
+    assert stats['attempts'] == 6
+    assert sorted((quiz['quizId'], quiz['attempts']) for quiz in stats['quizzes']) == [('quiz-1', 3), ('quiz-2', 3)]
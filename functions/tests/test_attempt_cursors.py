@@ -0,0 +1,81 @@
+"""Opaque /attempts page cursors and keyset paging over them."""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main
+from benchmarks.token_cache_check import mint_token
+
+START = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def encode_payload(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('source', ['quiz-attempts', 'reports'])
+@pytest.mark.parametrize('completed_at', [START, START.replace(microsecond=123456), datetime(2023, 1, 1, 0, 0)])
+def test_cursor_round_trip(source, completed_at):
+    cursor = main.encode_attempts_cursor(source, completed_at, 'abc-123')
+
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert main.decode_attempts_cursor(cursor) == (source, completed_at, 'abc-123')
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not a cursor!',
+    'é',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'),
+    encode_payload([1, 2, 3]),
+    encode_payload({'s': 'quiz-attempts', 'id': 'x'}),
+    encode_payload({'s': 'quiz-attempts', 't': 'yesterday', 'id': 'x'}),
+])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        main.decode_attempts_cursor(cursor)
+
+
+@pytest.fixture
+def client(app, memory_db, auth_emulator, signer):
+    # Three attempts share each completedAt, so paging has to tie-break on the document id
+    for i in range(12):
+        memory_db.collection('quiz-attempts').document(f'attempt-{i:02d}').set({
+            'userId': 'student-1',
+            'quizId': 'quiz-1',
+            'completedAt': START + timedelta(minutes=i // 3),
+            'score': i
+        })
+    memory_db.collection('quiz-attempts').document('other-user').set({
+        'userId': 'student-2', 'quizId': 'quiz-1', 'completedAt': START, 'score': 0
+    })
+    headers = {'Authorization': f'Bearer {mint_token(signer, "student-1")}'}
+    test_client = app.test_client()
+    return lambda path: test_client.get(path, headers=headers)
+
+
+def test_paging_returns_every_attempt_once_newest_first(client):
+    seen, cursor = [], None
+    while True:
+        response = client('/attempts?limit=5' + (f'&startAfter={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        page = response.get_json()
+        seen.extend(attempt['id'] for attempt in page['attempts'])
+        cursor = page['nextCursor']
+        if not cursor:
+            break
+
+    assert seen == [f'attempt-{i:02d}' for i in reversed(range(12))]
+
+
+@pytest.mark.parametrize('cursor', [
+    'garbage',
+    encode_payload({'s': 'users', 't': START.isoformat(), 'id': 'x'}),
+])
+def test_bad_cursor_is_a_client_error(client, cursor):
+    response = client(f'/attempts?startAfter={cursor}')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
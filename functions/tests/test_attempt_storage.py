@@ -0,0 +1,93 @@
+"""Compact (reportVersion 3) attempts read back exactly like the full v2 records."""
+import pytest
+
+import main
+from benchmarks.grading_benchmark import make_quiz
+from benchmarks.token_cache_check import mint_token
+
+QUESTIONS = 8
+# Unanswered, string and out-of-range answers all have to survive the round trip
+ANSWERS = {'0': 1, '1': '2', '3': 'Option 0', '4': 9, '5': 0, '7': '3'}
+
+
+@pytest.fixture
+def client(app, memory_db, auth_emulator, signer):
+    memory_db.collection('quizzes').document('quiz-1').set({'title': 'Storage quiz', 'questions': make_quiz(QUESTIONS)})
+    headers = {'Authorization': f'Bearer {mint_token(signer, "student-1")}'}
+    test_client = app.test_client()
+    return lambda method, path, **kwargs: test_client.open(path, method=method, headers=headers, **kwargs)
+
+
+def submit(client):
+    response = client('POST', '/submitQuiz', json={'quizId': 'quiz-1', 'answers': ANSWERS, 'timeSpent': 120})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.mark.parametrize('version', ['2.0', '3.0'])
+def test_attempt_detail_matches_the_submit_response(client, monkeypatch, version):
+    monkeypatch.setattr(main, 'ATTEMPT_REPORT_VERSION', version)
+    submitted = submit(client)
+
+    attempt = client('GET', f'/attempts/{submitted["attemptId"]}').get_json()
+    report = client('GET', f'/attempts/{submitted["reportId"]}').get_json()
+
+    assert attempt['reportVersion'] == version
+    assert attempt['analysis']['questionBreakdown'] == submitted['analysis']['questionBreakdown']
+    assert attempt['analysis']['classifiedTopics'] == submitted['analysis']['classifiedTopics']
+    assert attempt['score'] == submitted['analysis']['totalScore']
+    assert report['analysis']['questionBreakdown'] == submitted['analysis']['questionBreakdown']
+
+
+def test_v3_attempts_store_vectors_and_one_shared_snapshot(client, memory_db, monkeypatch):
+    monkeypatch.setattr(main, 'ATTEMPT_REPORT_VERSION', '3.0')
+    first, second = submit(client), submit(client)
+
+    stored = memory_db.collection('quiz-attempts').document(first['attemptId']).get().to_dict()
+    breakdown = first['analysis']['questionBreakdown']
+    assert 'questionBreakdown' not in stored
+    assert stored['correctMask'] == ''.join('1' if question['isCorrect'] else '0' for question in breakdown)
+    assert stored['answers'] == ANSWERS
+    assert len(list(memory_db.collection('quiz-snapshots').stream())) == 1
+    assert (memory_db.collection('quiz-attempts').document(second['attemptId']).get().to_dict()['quizSnapshotId']
+            == stored['quizSnapshotId'])
+
+
+def test_missing_snapshot_degrades_to_an_empty_breakdown(client, memory_db, monkeypatch):
+    monkeypatch.setattr(main, 'ATTEMPT_REPORT_VERSION', '3.0')
+    submitted = submit(client)
+    for doc in memory_db.collection('quiz-snapshots').stream():
+        doc.reference.delete()
+    main._quiz_snapshot_cache.clear()
+
+    response = client('GET', f'/attempts/{submitted["attemptId"]}')
+
+    assert response.status_code == 200
+    assert response.get_json()['analysis']['questionBreakdown'] == []
+
+
+def test_rehydrate_reads_legacy_answers_keyed_by_question_id():
+    snapshot = {'questions': [
+        {'questionId': 'q1', 'questionText': 'One?', 'topic': 't', 'correctAnswer': 1, 'options': ['a', 'b']},
+        {'questionId': 'q2', 'questionText': 'Two?', 'topic': 't', 'correctAnswer': 0, 'options': ['a', 'b']},
+        {'questionId': 'q3', 'questionText': 'Three?', 'topic': 't', 'correctAnswer': 0},
+    ]}
+
+    breakdown = main.rehydrate_question_breakdown(snapshot, {'q1': 1, '1': 0}, '11', by_question_id=True)
+
+    assert [question['userAnswer'] for question in breakdown] == [1, 0, None]
+    # A mask shorter than the snapshot marks the remaining questions incorrect
+    assert [question['isCorrect'] for question in breakdown] == [True, True, False]
+    assert breakdown[2]['options'] == []
+
+
+def test_v3_rehydrate_uses_snapshot_indexes_only():
+    # Question ids that look like indexes must not pick up another question's answer
+    snapshot = {'questions': [
+        {'questionId': '1', 'questionText': 'First?', 'correctAnswer': 0, 'options': ['a', 'b']},
+        {'questionId': '0', 'questionText': 'Second?', 'correctAnswer': 1, 'options': ['a', 'b']},
+    ]}
+
+    breakdown = main.rehydrate_question_breakdown(snapshot, {'0': 0}, '10')
+
+    assert [question['userAnswer'] for question in breakdown] == [0, None]
@@ -0,0 +1,114 @@
+"""Resumable /importQuestions jobs: stored progress is exactly what was committed."""
+import io
+import json
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+import main
+from benchmarks.memory_firestore import MemoryWriteBatch
+
+TOTAL = 120
+# Every tenth record is invalid (an empty question) and every fifteenth is not JSON
+INVALID = {i for i in range(TOTAL) if i % 10 == 3}
+BROKEN = {i for i in range(TOTAL) if i % 15 == 7}
+VALID = TOTAL - len(INVALID | BROKEN)
+
+
+def make_upload():
+    lines = []
+    for i in range(TOTAL):
+        if i in BROKEN:
+            lines.append('{"question": ')
+        else:
+            lines.append(json.dumps({'question': '' if i in INVALID else f'Question {i}?',
+                                     'options': ['a', 'b', 'c'], 'correct': i % 3}))
+    return '\n'.join(lines).encode('utf-8')
+
+
+def new_job():
+    return {'status': 'running', 'received': 0, 'imported': 0, 'skipped': 0, 'warnings': 0,
+            'committedThrough': -1, 'processedThrough': -1, 'errors': []}
+
+
+def stored_questions(db):
+    return len(list(db.collection('questions').stream()))
+
+
+class PauseAfter:
+    """A deadline that passes once `checks` records have been started"""
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def __lt__(self, now):
+        self.checks -= 1
+        return self.checks < 0
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(main, 'IMPORT_MAX_BATCH_QUESTIONS', 20)
+    monkeypatch.setattr(main, 'IMPORT_MIN_BATCH_QUESTIONS', 10)
+
+
+def run_import(db, job_ref, deadline=None):
+    job = job_ref.get().to_dict() if job_ref.get().exists else new_job()
+    records = main.iter_jsonl_questions(io.BytesIO(make_upload()))
+    return main.import_questions(db, records, job_ref, job, 'admin-1', deadline=deadline)
+
+
+def test_resumed_pauses_count_each_record_once(memory_db, small_batches):
+    job_ref = memory_db.collection('import-jobs').document('job-1')
+    # Record 43 is invalid, so the first pause lands after the last committed
+    # question and the resume has to pass over it without counting it again
+    job = run_import(memory_db, job_ref, deadline=PauseAfter(44))
+    assert job['status'] == 'paused'
+    assert job_ref.get().to_dict() == job
+
+    while job['status'] == 'paused':
+        job = run_import(memory_db, job_ref, deadline=PauseAfter(37))
+
+    assert job['status'] == 'completed'
+    assert job['received'] == TOTAL
+    assert job['imported'] == stored_questions(memory_db) == VALID
+    assert job['skipped'] == len(INVALID | BROKEN)
+    assert len(job['errors']) == len(INVALID | BROKEN)
+
+
+@pytest.fixture
+def client(app, memory_db, monkeypatch, small_batches):
+    monkeypatch.setattr(main, 'get_request_user', lambda req, **kwargs: ({'uid': 'admin-1', 'admin': True}, None))
+    test_client = app.test_client()
+    return lambda job_id=None: test_client.post(
+        '/importQuestions?format=jsonl' + (f'&jobId={job_id}' if job_id else ''), data=make_upload())
+
+
+def test_failed_commit_never_stores_an_uncommitted_cursor(client, memory_db, monkeypatch):
+    monkeypatch.setattr(main, 'IMPORT_COMMIT_RETRIES', 0)
+    commit = MemoryWriteBatch.commit
+    calls = []
+
+    def failing_commit(batch):
+        calls.append(len(batch))
+        # The second question batch fails; job-only writes go through
+        if len(calls) == 2:
+            raise api_exceptions.ServiceUnavailable('unavailable')
+        return commit(batch)
+
+    monkeypatch.setattr(MemoryWriteBatch, 'commit', failing_commit)
+    response = client()
+    assert response.status_code == 500
+    failed = response.get_json()
+    stored = memory_db.collection('import-jobs').document(failed['jobId']).get().to_dict()
+
+    assert stored['status'] == 'failed'
+    assert stored['imported'] == failed['imported'] == stored_questions(memory_db) == 20
+    assert stored['committedThrough'] == failed['committedThrough'] <= stored['processedThrough']
+
+    monkeypatch.setattr(MemoryWriteBatch, 'commit', commit)
+    resumed = client(failed['jobId']).get_json()
+
+    assert resumed['status'] == 'completed'
+    assert resumed['imported'] == stored_questions(memory_db) == VALID
+    assert resumed['skipped'] == len(INVALID | BROKEN)
@@ -0,0 +1,85 @@
+"""Streaming upload parsers behind /importQuestions."""
+import io
+import json
+
+import pytest
+
+import main
+
+QUESTIONS = [
+    {'question': 'Qué es π?', 'options': ['3.14', 'e'], 'correct': 0, 'topic': 'Matemáticas'},
+    {'question': 'Brackets ] and braces } in "strings", {"questions": [}', 'options': ['a', 'b'], 'correct': 1},
+    {'question': 'Nested', 'options': [['x'], {'y': [1, 2]}], 'correct': 0, 'topic': '日本語'},
+]
+
+CHUNK_SIZES = [1, 2, 3, 7, 64, 64 * 1024]
+
+
+def parse(body, chunk_size, monkeypatch):
+    monkeypatch.setattr(main, 'IMPORT_READ_CHUNK_BYTES', chunk_size)
+    metadata = {}
+    questions = list(main.iter_json_questions(io.BytesIO(body.encode('utf-8')), metadata))
+    return questions, metadata
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_root_array_survives_any_chunk_boundary(chunk_size, monkeypatch):
+    body = json.dumps(QUESTIONS, ensure_ascii=False, indent=2)
+
+    questions, metadata = parse(body, chunk_size, monkeypatch)
+
+    assert questions == list(enumerate(QUESTIONS))
+    assert metadata == {}
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_object_upload_collects_leading_metadata(chunk_size, monkeypatch):
+    body = json.dumps({'topic': 'Física', 'source': 'ACME', 'questions': QUESTIONS, 'trailing': True},
+                      ensure_ascii=False)
+
+    questions, metadata = parse(body, chunk_size, monkeypatch)
+
+    assert questions == list(enumerate(QUESTIONS))
+    assert metadata == {'topic': 'Física', 'source': 'ACME'}
+
+
+@pytest.mark.parametrize('body', ['[]', ' \n [ ] ', '{"questions": []}'])
+def test_empty_uploads_yield_nothing(body, monkeypatch):
+    assert parse(body, 2, monkeypatch)[0] == []
+
+
+@pytest.mark.parametrize('body', [
+    '[{"question": "a"}, {"question": "b"',
+    '{"questions": [{"question": "a"},',
+    '[{"question": "a"} {"question": "b"}',
+])
+def test_truncated_or_malformed_uploads_raise(body, monkeypatch):
+    with pytest.raises(ValueError):
+        parse(body, 3, monkeypatch)
+
+
+def test_upload_without_a_questions_array_raises(monkeypatch):
+    with pytest.raises(ValueError, match='questions'):
+        parse('{"items": [1, 2, 3]}', 4, monkeypatch)
+
+
+def test_questions_are_yielded_before_the_upload_is_fully_read(monkeypatch):
+    monkeypatch.setattr(main, 'IMPORT_READ_CHUNK_BYTES', 16)
+    stream = io.BytesIO(json.dumps(QUESTIONS * 50).encode('utf-8'))
+
+    records = main.iter_json_questions(stream, {})
+    next(records)
+
+    assert stream.tell() < len(stream.getvalue()) // 10
+
+
+def test_jsonl_skips_blank_lines_and_reports_bad_ones():
+    lines = [json.dumps(QUESTIONS[0]), '', '{"question": "broken"', '  ', json.dumps(QUESTIONS[1])]
+    stream = io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+    records = list(main.iter_jsonl_questions(stream))
+
+    assert [index for index, _ in records] == [0, 1, 2]
+    assert records[0][1] == QUESTIONS[0]
+    assert isinstance(records[1][1], ValueError) and 'Question 2' in str(records[1][1])
+    assert records[2][1] == QUESTIONS[1]
@@ -0,0 +1,86 @@
+"""Every submission request, failed or not, emits exactly one summary record."""
+import pytest
+
+import main
+from benchmarks.grading_benchmark import make_quiz
+from benchmarks.token_cache_check import mint_token
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    records = []
+    log_request_summary = main.log_request_summary
+
+    def recording_summary(message, level=main.logging.INFO, **fields):
+        records.append(fields)
+        return log_request_summary(message, level=level, **fields)
+
+    monkeypatch.setattr(main, 'log_request_summary', recording_summary)
+    return records
+
+
+@pytest.fixture
+def post(app, memory_db, auth_emulator, signer):
+    memory_db.collection('quizzes').document('quiz-1').set({'title': 'Quiz', 'questions': make_quiz(5)})
+    token = mint_token(signer, 'student-1')
+    test_client = app.test_client()
+
+    def post(path, body, authenticated=True):
+        headers = {'Authorization': f'Bearer {token}'} if authenticated else {}
+        return test_client.post(path, json=body, headers=headers)
+    return post
+
+
+def fail_commits(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('commit failed')
+    monkeypatch.setattr(main, 'commit_writes', fail)
+    monkeypatch.setattr(main, 'async_commit_writes', fail)
+
+
+@pytest.mark.parametrize('pipeline', ['sync', 'async'])
+@pytest.mark.parametrize('body, authenticated, status, error_class', [
+    ({'quizId': 'quiz-1', 'answers': {}}, True, 200, None),
+    ({'quizId': 'quiz-1'}, False, 401, 'Unauthenticated'),
+    ({}, True, 400, 'InvalidRequest'),
+    ({'answers': {}}, True, 400, 'InvalidRequest'),
+    ({'quizId': 'missing'}, True, 404, 'QuizNotFound'),
+    ({'quizId': 'quiz-1', 'answers': {}}, True, 500, 'RuntimeError'),
+])
+def test_submit_quiz_summaries(post, summaries, monkeypatch, pipeline, body, authenticated, status, error_class):
+    monkeypatch.setattr(main, 'SUBMIT_PIPELINE', pipeline)
+    if status == 500:
+        fail_commits(monkeypatch)
+
+    response = post('/submitQuiz', body, authenticated)
+
+    assert response.status_code == status
+    assert len(summaries) == 1
+    assert summaries[0]['status'] == status
+    assert summaries[0].get('errorClass') == error_class
+
+
+@pytest.mark.parametrize('body, authenticated, status, error_class', [
+    ({'submissions': [{'quizId': 'quiz-1', 'answers': {}}]}, True, 200, None),
+    ({'submissions': []}, False, 401, 'Unauthenticated'),
+    ({'submissions': []}, True, 400, 'InvalidRequest'),
+    ({'submissions': [{'quizId': 'quiz-1'}] * (main.MAX_BATCH_SUBMISSIONS + 1)}, True, 413, 'PayloadTooLarge'),
+])
+def test_submit_quiz_batch_summaries(post, summaries, body, authenticated, status, error_class):
+    response = post('/submitQuizBatch', body, authenticated)
+
+    assert response.status_code == status
+    assert len(summaries) == 1
+    assert summaries[0]['status'] == status
+    assert summaries[0].get('errorClass') == error_class
+
+
+def test_submit_quiz_batch_failure_summary(post, summaries, monkeypatch):
+    def fail(attempts):
+        raise RuntimeError('stats failed')
+    monkeypatch.setattr(main, 'build_user_stats_increments', fail)
+
+    response = post('/submitQuizBatch', {'submissions': [{'quizId': 'quiz-1', 'answers': {}}]})
+
+    assert response.status_code == 500
+    assert summaries == [{'status': 500, 'errorClass': 'RuntimeError'}]
@@ -0,0 +1,30 @@
+"""/submitQuizBatch request validation."""
+import pytest
+
+from benchmarks.token_cache_check import mint_token
+
+
+@pytest.fixture
+def post(app, memory_db, auth_emulator, signer):
+    headers = {'Authorization': f'Bearer {mint_token(signer, "student-1")}'}
+    test_client = app.test_client()
+    return lambda **kwargs: test_client.post('/submitQuizBatch', headers=headers, **kwargs)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'data': 'not json', 'content_type': 'text/plain'},
+    {'data': '{"submissions": [', 'content_type': 'application/json'},
+    {'json': ['a', 'list']},
+])
+def test_non_object_body_is_a_client_error(post, kwargs):
+    response = post(**kwargs)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'No JSON data provided'}
+
+
+def test_missing_submissions_list_is_a_client_error(post):
+    response = post(json={'submissions': {}})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'A non-empty submissions list is required'}
@@ -0,0 +1,108 @@
+"""verify_firebase_token and its claims cache, with real RS256 signature checks.
+
+Tokens are signed with a throwaway key whose public half stands in for
+Google's securetoken certificates, so nothing is fetched over the network.
+"""
+import google.oauth2.id_token
+import pytest
+from firebase_admin import auth
+
+import main
+from benchmarks.token_cache_check import fetch_local_certs, make_key, make_signer, mint_token
+
+
+@pytest.fixture
+def verifications(monkeypatch, firebase_app, rsa_key):
+    """Verify against the local key (not the emulator) and count Admin SDK verifications"""
+    monkeypatch.delenv('FIREBASE_AUTH_EMULATOR_HOST', raising=False)
+    monkeypatch.setattr(google.oauth2.id_token, '_fetch_certs', fetch_local_certs(rsa_key))
+    calls = []
+    verify_id_token = auth.verify_id_token
+
+    def counting_verify(*args, **kwargs):
+        calls.append(args[0])
+        return verify_id_token(*args, **kwargs)
+
+    monkeypatch.setattr(auth, 'verify_id_token', counting_verify)
+    main.evict_token_cache()
+    yield calls
+    main.evict_token_cache()
+
+
+def test_signed_token_verifies_once_then_hits_the_cache(verifications, signer):
+    token = mint_token(signer, 'student-1')
+    before = dict(main.token_cache_stats)
+
+    first = main.verify_firebase_token(token)
+    second = main.verify_firebase_token(token)
+
+    assert first['uid'] == 'student-1'
+    assert second == first
+    assert len(verifications) == 1
+    assert main.token_cache_stats['misses'] - before['misses'] == 1
+    assert main.token_cache_stats['hits'] - before['hits'] == 1
+
+
+def test_token_signed_by_another_key_is_rejected(verifications):
+    forged = mint_token(make_signer(make_key()), 'student-1')
+
+    assert main.verify_firebase_token(forged) is None
+    assert main.get_token_cache_stats()['size'] == 0
+
+
+def test_tampered_token_is_rejected(verifications, signer):
+    header, payload, signature = mint_token(signer, 'student-1').split('.')
+    other_payload = mint_token(signer, 'admin').split('.')[1]
+
+    assert main.verify_firebase_token('.'.join([header, other_payload, signature])) is None
+    assert main.verify_firebase_token('.'.join([header, payload, signature[:-4] + 'AAAA'])) is None
+
+
+def test_expired_token_is_rejected(verifications, signer):
+    assert main.verify_firebase_token(mint_token(signer, 'student-1', lifetime=-60)) is None
+
+
+def test_tokens_about_to_expire_are_not_cached(verifications, signer):
+    token = mint_token(signer, 'student-2', lifetime=main.TOKEN_CACHE_EXPIRY_SKEW_SECONDS // 2)
+
+    assert main.verify_firebase_token(token)['uid'] == 'student-2'
+    assert main.get_token_cache_stats()['size'] == 0
+
+
+def test_use_cache_false_always_verifies(verifications, signer):
+    token = mint_token(signer, 'student-1')
+    main.verify_firebase_token(token)
+    main.verify_firebase_token(token, use_cache=False)
+
+    assert len(verifications) == 2
+
+
+def test_cached_claims_cannot_be_mutated_by_callers(verifications, signer):
+    token = mint_token(signer, 'student-1')
+    main.verify_firebase_token(token)['uid'] = 'admin'
+
+    assert main.verify_firebase_token(token)['uid'] == 'student-1'
+
+
+def test_eviction_by_token_and_uid(verifications, signer):
+    first, second = mint_token(signer, 'student-1'), mint_token(signer, 'student-1', lifetime=1800)
+    other = mint_token(signer, 'student-2')
+    for token in (first, second, other):
+        main.verify_firebase_token(token)
+
+    main.evict_token_cache(id_token=other)
+    assert main.get_token_cache_stats()['size'] == 2
+    main.evict_token_cache(uid='student-1')
+    assert main.get_token_cache_stats()['size'] == 0
+
+
+def test_cache_stays_within_its_size_bound(verifications, signer, monkeypatch):
+    monkeypatch.setattr(main, 'TOKEN_CACHE_MAX_ENTRIES', 4)
+    tokens = [mint_token(signer, f'bulk-{i}') for i in range(10)]
+    for token in tokens:
+        main.verify_firebase_token(token)
+
+    assert main.get_token_cache_stats()['size'] == 4
+    # Least recently used tokens were evicted first
+    main.verify_firebase_token(tokens[-1])
+    assert len(verifications) == 10
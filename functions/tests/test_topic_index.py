@@ -0,0 +1,69 @@
+"""Question picking from the sharded topic index behind /recommendations."""
+import pytest
+
+import main
+
+TOPIC_SIZES = {'algebra': 150, 'geometry': 7, 'probability': 1}
+
+
+def topic_of(number):
+    return 'algebra' if number < 150 else 'geometry' if number < 157 else 'probability'
+
+
+@pytest.fixture
+def topic_index(memory_db, monkeypatch):
+    """Index the synthetic topics into the in-memory store and load them into a fresh instance index"""
+    monkeypatch.setattr(main, '_topic_index', main.new_topic_index())
+    entries = [(f'question-{n:03d}', [topic_of(n)]) for n in range(sum(TOPIC_SIZES.values()))]
+    main.commit_writes(memory_db, main.build_topic_index_writes(memory_db, entries, absolute=True))
+    main.load_topic_index(memory_db, full=True)
+    return {topic: [question_id for question_id, topics in entries if topic in topics] for topic in TOPIC_SIZES}
+
+
+def full_order(topic):
+    return main.pick_topic_questions(topic, 0, TOPIC_SIZES[topic])
+
+
+@pytest.mark.parametrize('topic', sorted(TOPIC_SIZES))
+def test_full_pick_lists_each_question_once(topic_index, topic):
+    assert sorted(full_order(topic)) == topic_index[topic]
+
+
+@pytest.mark.parametrize('topic', sorted(TOPIC_SIZES))
+def test_start_rotates_through_the_topic_and_wraps(topic_index, topic):
+    order = full_order(topic)
+    total = len(order)
+
+    for start in range(0, 2 * total + 3, max(1, total // 20)):
+        position = start % total
+        assert main.pick_topic_questions(topic, start, total) == order[position:] + order[:position]
+        assert main.pick_topic_questions(topic, start, 5) == (order * 2)[position:position + min(5, total)]
+
+
+def test_consecutive_pages_do_not_overlap(topic_index):
+    pages = [main.pick_topic_questions('algebra', start, 10) for start in range(0, 150, 10)]
+
+    assert [question_id for page in pages for question_id in page] == full_order('algebra')
+
+
+def test_count_is_capped_at_the_topic_size(topic_index):
+    picked = main.pick_topic_questions('geometry', 3, 50)
+
+    assert len(picked) == len(set(picked)) == 7
+
+
+@pytest.mark.parametrize('topic, count', [('algebra', 0), ('algebra', -1), ('unknown', 5)])
+def test_nothing_to_pick(topic_index, topic, count):
+    assert main.pick_topic_questions(topic, 0, count) == []
+
+
+def test_incremental_load_adds_new_questions_once(topic_index, memory_db):
+    entries = [('question-new-1', ['geometry']), ('question-new-2', ['geometry', 'statistics'])]
+    # A retried import batch writes the same entries again
+    for _ in range(2):
+        main.commit_writes(memory_db, main.build_topic_index_writes(memory_db, entries))
+    main.load_topic_index(memory_db)
+
+    assert sorted(main.pick_topic_questions('geometry', 0, 100)) == sorted(
+        topic_index['geometry'] + ['question-new-1', 'question-new-2'])
+    assert main.pick_topic_questions('statistics', 4, 10) == ['question-new-2']
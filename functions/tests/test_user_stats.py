@@ -0,0 +1,84 @@
+"""Profile stats stay exact when one user's submissions commit concurrently.
+
+Runs the real /submitQuiz path (atomic Increment transforms in the
+submission's WriteBatch, no read-modify-write) against the in-memory
+stand-in and, when FIRESTORE_EMULATOR_HOST is set, the Firestore emulator:
+
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=demo-know-map python -m pytest tests/test_user_stats.py
+"""
+import os
+import random
+import threading
+import uuid
+
+import pytest
+
+import main
+from benchmarks.grading_benchmark import make_quiz
+from benchmarks.token_cache_check import mint_token
+
+SUBMISSIONS = 100
+QUESTIONS = 10
+
+@pytest.fixture(params=['memory', 'emulator'])
+def db(request, monkeypatch, memory_db):
+    if request.param == 'memory':
+        return memory_db
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        pytest.skip('FIRESTORE_EMULATOR_HOST is not set')
+    monkeypatch.setattr(main, 'db', None)
+    monkeypatch.setattr(main, 'SUBMIT_PIPELINE', 'sync')
+    return main.get_firestore_client()
+
+
+def submit_concurrently(app, token, quiz_id):
+    """Send SUBMISSIONS requests from as many threads, released together by a barrier.
+
+    Returns (status, request body, response body) per request.
+    """
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(SUBMISSIONS)
+
+    def worker(seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        body = {
+            'quizId': quiz_id,
+            'answers': {str(i): rng.randrange(4) for i in range(QUESTIONS)},
+            'timeSpent': rng.randint(30, 900)
+        }
+        barrier.wait()
+        response = client.post('/submitQuiz', json=body, headers={'Authorization': f'Bearer {token}'})
+        with lock:
+            results.append((response.status_code, body, response.get_json()))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(SUBMISSIONS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_submissions_keep_exact_stats(db, app, signer, auth_emulator):
+    user_id = f'stats-{uuid.uuid4().hex[:8]}'
+    quiz_ref = db.collection('quizzes').document(f'stats-quiz-{user_id}')
+    quiz_ref.set({'title': 'Stats quiz', 'questions': make_quiz(QUESTIONS)})
+
+    results = submit_concurrently(app, mint_token(signer, user_id), quiz_ref.id)
+    assert [status for status, _, _ in results] == [200] * SUBMISSIONS
+
+    # Expected totals come from what each request sent and was told, not from
+    # what was stored, so a lost update cannot hide behind a lost attempt
+    graded = [response for _, _, response in results]
+    attempts = list(db.collection('quiz-attempts').where('userId', '==', user_id).stream())
+    stats = main.derive_user_stats(db.collection('users').document(user_id).get().to_dict()['stats'])
+    assert len(attempts) == SUBMISSIONS
+    assert stats['totalQuizzesTaken'] == SUBMISSIONS
+    assert stats['totalXP'] == sum(response['xpEarned'] for response in graded)
+    assert stats['perfectScores'] == sum(1 for response in graded if response['isPerfectScore'])
+    assert stats['averageScore'] == round(
+        sum(response['analysis']['overallPercentage'] for response in graded) / SUBMISSIONS, 1)
+    assert stats['totalTimeSpent'] == pytest.approx(sum(body['timeSpent'] for _, body, _ in results) / 60)
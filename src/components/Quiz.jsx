@@ -210,13 +210,15 @@ export default function Quiz({ items, onComplete, quizData, onBack }) {
           logger.log("Backend response:", result);
           
           // Navigate to results page with report ID and full analysis
+          // (reportId is null when the legacy reports dual-write is disabled)
+          const resultId = result.reportId || result.attemptId;
           console.log("🧭 Navigating to results with:", {
-            reportId: result.reportId,
+            reportId: resultId,
             analysis: result.analysis
           });
-          navigate(`/results/${result.reportId}`, { 
+          navigate(`/results/${resultId}`, { 
             state: { 
-              reportId: result.reportId,
+              reportId: resultId,
               analysis: result.analysis,
               report: result,
               isBackendResult: true,
@@ -4,6 +4,7 @@ import { db } from '../firebase/config';
 import { useAuth } from '../auth/AuthContext';
 import QuizJSONValidator from '../utils/jsonValidator';
 import { setAdminRole, deleteUser } from '../utils/adminUtils';
+import { fetchApi, requestApi } from '../utils/api';
 import { RefreshCw } from 'lucide-react';
 import { toast, ToastContainer } from 'react-toastify';
 import 'react-toastify/dist/ReactToastify.css';
@@ -20,6 +21,9 @@ const AdminDashboard = () => {
   const [editingQuiz, setEditingQuiz] = useState(null);
   const [successMessage, setSuccessMessage] = useState('');
   const [adminUsers, setAdminUsers] = useState(new Set()); // Track users with admin claims
+  const [adminStats, setAdminStats] = useState(null); // Precomputed totals from /admin/stats
+  const [userCursor, setUserCursor] = useState(null); // nextCursor for the next /admin/users page
+  const [loadingMoreUsers, setLoadingMoreUsers] = useState(false);
   
   // Confirmation modal states
   const [confirmationModal, setConfirmationModal] = useState({
@@ -185,29 +189,57 @@ const AdminDashboard = () => {
     }
   }, [user]);
 
+  // Fetch one page of users; the API pages by uid so load time no longer
+  // grows with the size of the users collection
+  const fetchUsersPage = async (cursor = null) => {
+    const params = cursor ? { startAfter: cursor } : {};
+    const page = await fetchApi(user, '/admin/users', params);
+    const usersData = page.users.map(userData => ({
+      ...userData,
+      createdAt: userData.createdAt ? new Date(userData.createdAt) : null,
+      lastLoginAt: userData.lastLoginAt ? new Date(userData.lastLoginAt) : null,
+    }));
+    setUserCursor(page.nextCursor);
+    return usersData;
+  };
+
+  const handleLoadMoreUsers = async () => {
+    if (!userCursor) return;
+    try {
+      setLoadingMoreUsers(true);
+      const usersData = await fetchUsersPage(userCursor);
+      setUsers(prev => [...prev, ...usersData]);
+    } catch (userError) {
+      console.error('💥 Error loading more users:', userError);
+      toast.error('Failed to load more users: ' + userError.message);
+    } finally {
+      setLoadingMoreUsers(false);
+    }
+  };
+
   const fetchData = async () => {
+    if (!user) return;
+    
     try {
       setLoading(true);
       setError(null);
 
-      // Fetch users with error handling
+      // Totals are precomputed server-side from sharded counters
       try {
-        console.log('📊 AdminDashboard: Fetching users from Firestore...');
-        const usersSnapshot = await getDocs(collection(db, 'users'));
-        const usersData = usersSnapshot.docs.map(doc => {
-          const data = doc.data();
-          console.log('Raw user data:', data); // Debug log
-          
-          return {
-            id: doc.id,
-            ...data,
-            // Ensure date fields are properly formatted
-            createdAt: data.createdAt?.toDate?.() || (data.createdAt ? new Date(data.createdAt) : new Date()),
-            lastLoginAt: data.lastLoginAt?.toDate?.() || (data.lastLoginAt ? new Date(data.lastLoginAt) : new Date()),
-          };
-        });
+        const stats = await fetchApi(user, '/admin/stats');
+        console.log('📊 AdminDashboard: Admin stats:', stats);
+        setAdminStats(stats);
+      } catch (statsError) {
+        console.error('💥 Error fetching admin stats:', statsError);
+        setAdminStats(null);
+      }
+
+      // Fetch the first page of users with error handling
+      try {
+        console.log('📊 AdminDashboard: Fetching users from /admin/users...');
+        const usersData = await fetchUsersPage();
         
-        console.log(`📊 AdminDashboard: Found ${usersData.length} users:`, usersData);
+        console.log(`📊 AdminDashboard: Loaded ${usersData.length} users`);
         
         if (usersData.length === 0) {
           console.log('⚠️ No users found in Firestore, using sample data');
@@ -219,6 +251,7 @@ const AdminDashboard = () => {
         console.error('💥 Error fetching users, using sample data:', userError);
         setError('Error loading users from database. Showing sample data.');
         setUsers(sampleUsers);
+        setUserCursor(null);
       }
 
       // Fetch quizzes with error handling
@@ -468,10 +501,12 @@ const AdminDashboard = () => {
 
       if (editingQuiz) {
         // Update existing quiz
+        // Bump updatedAt so the grading API drops its cached answer key
         const quizRef = doc(db, 'quizzes', editingQuiz.id);
-        await updateDoc(quizRef, quizForm);
+        const quizUpdate = { ...quizForm, updatedAt: Timestamp.now() };
+        await updateDoc(quizRef, quizUpdate);
         setQuizzes(quizzes.map(quiz => 
-          quiz.id === editingQuiz.id ? { ...quiz, ...quizForm } : quiz
+          quiz.id === editingQuiz.id ? { ...quiz, ...quizUpdate } : quiz
         ));
         
         toast.success('Quiz updated successfully!', {
@@ -484,8 +519,9 @@ const AdminDashboard = () => {
         });
       } else {
         // Create new quiz
-        const docRef = await addDoc(collection(db, 'quizzes'), quizForm);
-        setQuizzes([...quizzes, { id: docRef.id, ...quizForm }]);
+        const newQuiz = { ...quizForm, updatedAt: Timestamp.now() };
+        const docRef = await addDoc(collection(db, 'quizzes'), newQuiz);
+        setQuizzes([...quizzes, { id: docRef.id, ...newQuiz }]);
         
         toast.success('Quiz created successfully!', {
           position: "top-right",
@@ -725,6 +761,7 @@ const AdminDashboard = () => {
           topic: q.topic || fileData.topic || 'General'
         })),
         createdAt: Timestamp.now(),
+        updatedAt: Timestamp.now(),
         createdBy: user.uid,
         isImported: true
       };
@@ -790,77 +827,49 @@ const AdminDashboard = () => {
     try {
       const questions = fileData.questions;
       const total = questions.length;
-      let imported = 0;
-      let skipped = 0;
+      // The API validates and writes the questions server-side in batched
+      // commits; it stops at its time budget and we resume with the job id
+      const body = questions.map(question => JSON.stringify(question)).join('\n');
+      const params = new URLSearchParams({ format: 'jsonl', topic: fileData.topic || 'General' });
+      let job = null;
       
-      console.log(`📝 Processing ${total} questions...`);
-      
-      // Set up timeout
-      const timeoutId = setTimeout(() => {
-        console.error('⏰ Import timeout after 30 seconds');
-        importCancelledRef.current = true;
-        setUploadStatus('error');
-        setValidationResult({
-          isValid: false,
-          errors: ['Import timeout - please try again or contact support'],
-          warnings: [],
-          summary: 'Import timed out'
-        });
-        setIsImporting(false);
-      }, 30000);
+      console.log(`📝 Uploading ${total} questions to /importQuestions...`);
       
-      // Process in batches to avoid overwhelming Firebase
-      const batchSize = 5;
-      for (let i = 0; i < questions.length; i += batchSize) {
-        // Check cancellation using ref (more reliable than state)
+      do {
         if (importCancelledRef.current) {
           console.log('🛑 Import cancelled by user');
-          clearTimeout(timeoutId);
           return;
         }
         
-        const batch = questions.slice(i, i + batchSize);
-        console.log(`📦 Processing batch ${Math.floor(i/batchSize) + 1}/${Math.ceil(questions.length/batchSize)}`);
+        if (job?.jobId) {
+          params.set('jobId', job.jobId);
+        }
+        const { response, data } = await requestApi(user, '/importQuestions', {
+          method: 'POST',
+          params,
+          headers: { 'Content-Type': 'application/x-ndjson' },
+          body
+        });
+        job = data;
         
-        await Promise.all(batch.map(async (questionData) => {
-          try {
-            console.log(`➕ Adding question: ${questionData.question.substring(0, 30)}...`);
-            await addDoc(collection(db, 'questions'), {
-              question: questionData.question,
-              options: questionData.options,
-              correct: questionData.correct,
-              topic: questionData.topic || fileData.topic || 'General',
-              createdAt: Timestamp.now(),
-              createdBy: user.uid
-            });
-            imported++;
-            console.log(`✅ Question added successfully (${imported}/${total})`);
-          } catch (error) {
-            console.error('❌ Error adding question:', error);
-            skipped++;
-          }
-        }));
+        if (!response.ok) {
+          throw new Error(job.errors?.slice(-1)[0] || job.error || `Import failed (${response.status})`);
+        }
         
-        // Update progress
-        const progress = Math.round(((i + batch.length) / total) * 100);
+        const progress = Math.round(((job.committedThrough + 1) / total) * 100);
         setUploadProgress(progress);
-        console.log(`📈 Progress: ${progress}% (${imported} imported, ${skipped} skipped)`);
-        
-        // Small delay between batches
-        await new Promise(resolve => setTimeout(resolve, 200));
-      }
-      
-      clearTimeout(timeoutId);
+        console.log(`📈 Progress: ${progress}% (${job.imported} imported, ${job.skipped} skipped)`);
+      } while (job.status === 'paused');
       
       console.log('🎉 Bulk import completed!');
-      console.log(`📊 Final results: ${imported} imported, ${skipped} skipped`);
+      console.log(`📊 Final results: ${job.imported} imported, ${job.skipped} skipped`);
       
       setUploadStatus('completed');
       setValidationResult({
         isValid: true,
         errors: [],
-        warnings: skipped > 0 ? [`${skipped} questions were skipped due to errors`] : [],
-        summary: `Successfully imported ${imported} out of ${total} questions`
+        warnings: job.skipped > 0 ? [`${job.skipped} questions were skipped due to errors`, ...job.errors] : [],
+        summary: `Successfully imported ${job.imported} out of ${total} questions`
       });
       
       // Note: Individual questions are now in the 'questions' collection
@@ -922,12 +931,21 @@ const AdminDashboard = () => {
         </div> */}
       </div>
 
+      {adminStats && (
+        <div className="admin-stats-summary">
+          <div><strong>{adminStats.users}</strong> users</div>
+          <div><strong>{adminStats.attempts}</strong> quiz attempts</div>
+          <div><strong>{adminStats.averageScore}%</strong> average score</div>
+          <div><strong>{adminStats.perfectScores}</strong> perfect scores</div>
+        </div>
+      )}
+
       <div className="admin-tabs">
         <button 
           className={activeTab === 'users' ? 'active' : ''} 
           onClick={() => setActiveTab('users')}
         >
-          Users ({users.length})
+          Users ({adminStats?.users ?? users.length})
         </button>
         <button 
           className={activeTab === 'quizzes' ? 'active' : ''} 
@@ -994,6 +1012,17 @@ const AdminDashboard = () => {
               </tbody>
             </table>
           </div>
+          {userCursor && (
+            <div className="load-more">
+              <button 
+                className="btn btn-outline btn-sm" 
+                onClick={handleLoadMoreUsers}
+                disabled={loadingMoreUsers}
+              >
+                {loadingMoreUsers ? 'Loading...' : 'Load More Users'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
@@ -1129,15 +1158,21 @@ const AdminDashboard = () => {
                   <th>Title</th>
                   <th>Description</th>
                   <th>Questions</th>
+                  <th>Attempts</th>
+                  <th>Avg. Score</th>
                   <th>Actions</th>
                 </tr>
               </thead>
               <tbody>
-                {quizzes.map((quiz) => (
+                {quizzes.map((quiz) => {
+                  const quizStats = adminStats?.quizzes?.find(entry => entry.quizId === quiz.id);
+                  return (
                   <tr key={quiz.id}>
                     <td>{quiz.title}</td>
                     <td>{quiz.description}</td>
                     <td>{quiz.questions?.length || 0}</td>
+                    <td>{quizStats?.attempts ?? 0}</td>
+                    <td>{quizStats ? `${quizStats.averageScore}%` : 'N/A'}</td>
                     <td className="actions">
                       <button 
                         className="btn btn-sm btn-secondary" 
@@ -1153,7 +1188,8 @@ const AdminDashboard = () => {
                       </button>
                     </td>
                   </tr>
-                ))}
+                  );
+                })}
               </tbody>
             </table>
           </div>
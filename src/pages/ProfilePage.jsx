@@ -1,16 +1,23 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../auth/AuthContext';
 import { useNavigate } from 'react-router-dom';
-import { doc, getDoc, collection, query, where, orderBy, limit, getDocs } from 'firebase/firestore';
+import { doc, getDoc, collection, getDocs } from 'firebase/firestore';
 import { db } from '../firebase/config';
+import { fetchApi } from '../utils/api';
 import './ProfilePage.css';
 
+const RECENT_ATTEMPTS_PAGE_SIZE = 5;
+
 const ProfilePage = () => {
   const { user } = useAuth();
   const navigate = useNavigate();
   const [userProfile, setUserProfile] = useState(null);
   const [recentAttempts, setRecentAttempts] = useState([]);
+  const [attemptsCursor, setAttemptsCursor] = useState(null);
+  const [loadingMoreAttempts, setLoadingMoreAttempts] = useState(false);
   const [topicProgress, setTopicProgress] = useState({});
+  const [recommendations, setRecommendations] = useState([]);
+  const [leaderboard, setLeaderboard] = useState(null);
   const [achievements, setAchievements] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -20,6 +27,8 @@ const ProfilePage = () => {
       fetchUserProfile();
       fetchRecentAttempts();
       fetchTopicProgress();
+      fetchRecommendations();
+      fetchLeaderboard();
       fetchAchievements();
     }
   }, [user]);
@@ -40,9 +49,19 @@ const ProfilePage = () => {
           perfectScores: 0
         };
         
+        // The API stores running sums; averageScore and level are derived here.
+        // averageScore on older profiles covers quizzes not in scoredQuizzes.
+        const stats = { ...defaultStats, ...(userData.stats || {}) };
+        const legacyQuizzes = Math.max(0, stats.totalQuizzesTaken - (stats.scoredQuizzes || 0));
+        const scoreSum = (stats.sumPercentage || 0) + stats.averageScore * legacyQuizzes;
+        stats.averageScore = stats.totalQuizzesTaken
+          ? Math.round((scoreSum / stats.totalQuizzesTaken) * 10) / 10
+          : 0;
+        stats.level = Math.max(1, Math.floor(stats.totalXP / 100));
+        
         setUserProfile({
           ...userData,
-          stats: { ...defaultStats, ...(userData.stats || {}) }
+          stats
         });
       }
     } catch (error) {
@@ -51,112 +70,95 @@ const ProfilePage = () => {
     }
   };
 
-  const fetchRecentAttempts = async () => {
+  const fetchRecentAttempts = async (cursor = null) => {
     try {
       console.log('📊 Fetching recent attempts for user:', user.uid);
       
-      // First, try to get ALL quiz-attempts for this user (without orderBy to avoid index issues)
-      const attemptsQuery = query(
-        collection(db, 'quiz-attempts'),
-        where('userId', '==', user.uid)
-      );
-      
-      const snapshot = await getDocs(attemptsQuery);
-      console.log('📊 Found', snapshot.size, 'quiz attempts in quiz-attempts collection');
-      
-      let attempts = snapshot.docs.map(doc => {
-        const data = doc.data();
-        console.log('📊 Quiz attempt data:', data);
-        return {
-          id: doc.id,
-          ...data
-        };
-      });
-      
-      // Sort manually and limit to 5
-      attempts = attempts
-        .sort((a, b) => {
-          const dateA = a.completedAt?.toDate ? a.completedAt.toDate() : new Date(a.completedAt);
-          const dateB = b.completedAt?.toDate ? b.completedAt.toDate() : new Date(b.completedAt);
-          return dateB - dateA;
-        })
-        .slice(0, 5);
+      // /attempts returns compact summaries, newest first; the API falls back
+      // to the legacy reports collection for accounts without quiz-attempts
+      const params = { limit: RECENT_ATTEMPTS_PAGE_SIZE };
+      if (cursor) {
+        params.startAfter = cursor;
+      }
+      const page = await fetchApi(user, '/attempts', params);
       
-      console.log('📊 Sorted recent attempts:', attempts);
-      setRecentAttempts(attempts);
+      setRecentAttempts(prev => cursor ? [...prev, ...page.attempts] : page.attempts);
+      setAttemptsCursor(page.nextCursor);
       
     } catch (error) {
-      console.error('❌ Error fetching quiz-attempts:', error);
-      // Fallback to legacy reports collection
-      try {
-        console.log('📊 Trying legacy reports collection...');
-        
-        // Try without orderBy first to avoid index issues
-        const reportsQuery = query(
-          collection(db, 'reports'),
-          where('userId', '==', user.uid)
-        );
-        
-        const snapshot = await getDocs(reportsQuery);
-        console.log('📊 Found', snapshot.size, 'reports in legacy collection');
-        
-        let reports = snapshot.docs.map(doc => {
-          const data = doc.data();
-          console.log('📊 Report data:', data);
-          return {
-            id: doc.id,
-            quizTitle: data.quizTitle,
-            completedAt: data.submittedAt,
-            score: data.analysis?.totalScore || 0,
-            totalQuestions: data.analysis?.totalQuestions || 0,
-            percentage: data.analysis?.overallPercentage || 0,
-            isPerfectScore: (data.analysis?.overallPercentage || 0) === 100
-          };
-        });
-        
-        // Sort manually and limit to 5
-        reports = reports
-          .sort((a, b) => {
-            const dateA = a.completedAt?.toDate ? a.completedAt.toDate() : new Date(a.completedAt);
-            const dateB = b.completedAt?.toDate ? b.completedAt.toDate() : new Date(b.completedAt);
-            return dateB - dateA;
-          })
-          .slice(0, 5);
-        
-        console.log('📊 Sorted legacy reports:', reports);
-        setRecentAttempts(reports);
-        
-      } catch (legacyError) {
-        console.error('❌ Error fetching legacy reports:', legacyError);
+      console.error('❌ Error fetching attempts:', error);
+      if (!cursor) {
         setRecentAttempts([]); // Set empty array instead of leaving undefined
       }
     }
   };
 
-  const fetchTopicProgress = async () => {
+  const handleLoadMoreAttempts = async () => {
+    setLoadingMoreAttempts(true);
+    await fetchRecentAttempts(attemptsCursor);
+    setLoadingMoreAttempts(false);
+  };
+
+  // Full question-by-question detail is only fetched when an attempt is opened
+  const handleOpenAttempt = async (attemptId) => {
     try {
-      // This would fetch from topic-progress collection in a real implementation
-      // For now, analyze recent attempts to show topic breakdown
-      const topicStats = {};
-      
-      recentAttempts.forEach(attempt => {
-        if (attempt.topicBreakdown) {
-          Object.entries(attempt.topicBreakdown).forEach(([topic, stats]) => {
-            if (!topicStats[topic]) {
-              topicStats[topic] = { correct: 0, total: 0, attempts: 0 };
-            }
-            topicStats[topic].correct += stats.correct;
-            topicStats[topic].total += stats.total;
-            topicStats[topic].attempts += 1;
-          });
+      const detail = await fetchApi(user, `/attempts/${encodeURIComponent(attemptId)}`);
+      navigate(`/results/${attemptId}`, {
+        state: {
+          reportId: attemptId,
+          analysis: detail.analysis,
+          message: `${detail.quizTitle || 'Quiz'} · ${formatDate(detail.completedAt)}`
         }
       });
+    } catch (error) {
+      console.error('❌ Error fetching attempt detail:', error);
+    }
+  };
+
+  // Weakest topics first, with quizzes and questions to practise them
+  const fetchRecommendations = async () => {
+    try {
+      const data = await fetchApi(user, '/recommendations');
+      setRecommendations(data.recommendations);
+    } catch (error) {
+      console.error('❌ Error fetching recommendations:', error);
+      setRecommendations([]);
+    }
+  };
+
+  // Global top 10 plus the user's own (possibly estimated) rank
+  const fetchLeaderboard = async () => {
+    try {
+      const [board, me] = await Promise.all([
+        fetchApi(user, '/leaderboard', { limit: 10 }),
+        fetchApi(user, '/leaderboard/me')
+      ]);
+      setLeaderboard({ entries: board.entries, me });
+    } catch (error) {
+      console.error('❌ Error fetching leaderboard:', error);
+      setLeaderboard(null);
+    }
+  };
+
+  const fetchTopicProgress = async () => {
+    try {
+      // Topic progress is materialized by the API in users/{uid}/topic-progress,
+      // one small document per topic
+      const snapshot = await getDocs(collection(db, 'users', user.uid, 'topic-progress'));
+      const topicStats = {};
       
-      // Calculate percentages and skill levels
-      Object.keys(topicStats).forEach(topic => {
-        const stats = topicStats[topic];
-        stats.percentage = Math.round((stats.correct / stats.total) * 100);
-        stats.skillLevel = getSkillLevel(stats.percentage);
+      snapshot.docs.forEach(topicDoc => {
+        const data = topicDoc.data();
+        if (!data.total) return;
+        const percentage = Math.round((data.correct / data.total) * 100);
+        topicStats[data.topic || topicDoc.id] = {
+          correct: data.correct,
+          total: data.total,
+          attempts: data.attempts || 0,
+          percentage,
+          skillLevel: getSkillLevel(percentage),
+          lastClassification: data.lastClassification
+        };
       });
       
       setTopicProgress(topicStats);
@@ -353,7 +355,12 @@ const ProfilePage = () => {
         {recentAttempts.length > 0 ? (
           <div className="recent-attempts">
             {recentAttempts.map((attempt) => (
-              <div key={attempt.id} className="attempt-card">
+              <div 
+                key={attempt.id} 
+                className="attempt-card"
+                onClick={() => handleOpenAttempt(attempt.id)}
+                style={{ cursor: 'pointer' }}
+              >
                 <div className="attempt-header">
                   <h4>{attempt.quizTitle}</h4>
                   <span className={`score ${attempt.isPerfectScore ? 'perfect' : ''}`}>
@@ -367,6 +374,15 @@ const ProfilePage = () => {
                 </div>
               </div>
             ))}
+            {attemptsCursor && (
+              <button 
+                className="back-button" 
+                onClick={handleLoadMoreAttempts}
+                disabled={loadingMoreAttempts}
+              >
+                {loadingMoreAttempts ? 'Loading...' : 'Show More'}
+              </button>
+            )}
           </div>
         ) : (
           <div className="empty-state">
@@ -400,6 +416,61 @@ const ProfilePage = () => {
         </div>
       )}
 
+      {/* Recommendations */}
+      {recommendations.length > 0 && (
+        <div className="section">
+          <h2>Recommended Next</h2>
+          <div className="topic-grid">
+            {recommendations.map((recommendation) => (
+              <div key={recommendation.topic} className="topic-card">
+                <h4>{recommendation.topic}</h4>
+                <div className="topic-stats">
+                  <div className="topic-percentage">{recommendation.percentage}%</div>
+                  <div className="topic-skill-level">{recommendation.classification}</div>
+                </div>
+                {recommendation.quizzes.length > 0 && (
+                  <p className="topic-attempts">
+                    Try: {recommendation.quizzes.map(quiz => quiz.title).join(', ')}
+                  </p>
+                )}
+                {recommendation.questions.length > 0 && (
+                  <p className="topic-attempts">
+                    {recommendation.questions.length} practice questions, e.g. "{recommendation.questions[0].question}"
+                  </p>
+                )}
+                <button className="back-button" onClick={() => navigate('/quiz')}>
+                  Practice
+                </button>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
+      {/* Leaderboard */}
+      {leaderboard && leaderboard.entries.length > 0 && (
+        <div className="section">
+          <h2>Leaderboard</h2>
+          {leaderboard.me.rank && (
+            <p className="topic-attempts">
+              You are {leaderboard.me.rankIsExact ? '' : 'about '}#{leaderboard.me.rank} of{' '}
+              {leaderboard.me.rankedUsers} (top {Math.max(1, Math.round(100 - leaderboard.me.percentile))}%)
+            </p>
+          )}
+          <div className="topic-grid">
+            {leaderboard.entries.map((entry, index) => (
+              <div key={index} className="topic-card">
+                <h4>#{entry.rank} {entry.displayName}</h4>
+                <div className="topic-stats">
+                  <div className="topic-percentage">{entry.totalXP} XP</div>
+                  <div className="topic-skill-level">Level {entry.level}</div>
+                </div>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Achievements */}
       {achievements.length > 0 && (
         <div className="section">
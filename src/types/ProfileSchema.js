@@ -35,8 +35,10 @@ export const UserProfileSchema = {
       currentStreak: 'number',
       longestStreak: 'number',
       totalXP: 'number',
-      level: 'number',
-      averageScore: 'number',
+      level: 'number', // derived: max(1, floor(totalXP / 100))
+      averageScore: 'number', // derived from sumPercentage (frozen on pre-sum profiles)
+      sumPercentage: 'number', // running sum of attempt percentages
+      scoredQuizzes: 'number', // attempts included in sumPercentage
       perfectScores: 'number'
     }
   }
@@ -72,7 +74,16 @@ export const QuizAttemptSchema = {
     }
   },
   
-  // Individual answers for review
+  // Individual answers for review (reportVersion '3.0'): answers keyed by
+  // question index, a '1'/'0' correctness character per question, and the id
+  // of the immutable 'quiz-snapshots' document holding question text and
+  // options. GET /attempts/{id} rehydrates these into questionBreakdown.
+  reportVersion: 'string', // '3.0' compact, '2.0' embeds questionBreakdown
+  quizSnapshotId: 'string',
+  answers: { questionIndex: 'number|string' },
+  correctMask: 'string',
+  
+  // Embedded review data (reportVersion '2.0' only)
   questionBreakdown: [{
     questionId: 'string',
     questionText: 'string',
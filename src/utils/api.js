@@ -0,0 +1,45 @@
+/**
+ * Base URL of the Python API (VITE_FIREBASE_FUNCTION_URL) without trailing slashes
+ * @returns {string}
+ */
+export const getApiBaseUrl = () => {
+  const backendUrl = (import.meta.env.VITE_FIREBASE_FUNCTION_URL || '').replace(/\/+$/, '');
+  if (!backendUrl) {
+    throw new Error('VITE_FIREBASE_FUNCTION_URL is not configured');
+  }
+  return backendUrl;
+};
+
+/**
+ * Call a route of the Python API with the user's ID token
+ * @param {Object} user - Firebase Auth user object
+ * @param {string} path - Route such as '/attempts'
+ * @param {Object} options - Query `params`, `method`, extra `headers` and `body`
+ * @returns {Promise<{response: Response, data: Object}>} - The response and its parsed JSON body
+ */
+export const requestApi = async (user, path, { params = {}, method = 'GET', headers = {}, body } = {}) => {
+  const query = new URLSearchParams(params).toString();
+  const url = `${getApiBaseUrl()}${path}${query ? `?${query}` : ''}`;
+  const idToken = await user.getIdToken();
+  const response = await fetch(url, {
+    method,
+    headers: { ...headers, 'Authorization': `Bearer ${idToken}` },
+    body
+  });
+  return { response, data: await response.json() };
+};
+
+/**
+ * GET a route of the Python API
+ * @param {Object} user - Firebase Auth user object
+ * @param {string} path - Route such as '/attempts'
+ * @param {Object} params - Query string parameters
+ * @returns {Promise<Object>} - The parsed JSON body; throws with the API's error message on failure
+ */
+export const fetchApi = async (user, path, params = {}) => {
+  const { response, data } = await requestApi(user, path, { params });
+  if (!response.ok) {
+    throw new Error(data.error || `Request failed with status ${response.status}`);
+  }
+  return data;
+};